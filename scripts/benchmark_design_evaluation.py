@@ -0,0 +1,104 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the evaluation of designs with the previous, per-design approach.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_design_evaluation.py --designs 50
+
+By default, designs are evaluated on the genome-scale E. coli model iJO1366;
+pass, for example, ``--model textbook --biomass Biomass_Ecoli_core`` for the
+core model. Designs are random sets of reaction knockouts. The previous
+approach sets the objective and solves with `Model.optimize` and `pfba` for
+every design, which is what the design evaluation did before
+`DesignEvaluator` was introduced.
+"""
+
+import argparse
+import random
+import time
+
+from cobra.exceptions import OptimizationError
+from cobra.flux_analysis import pfba
+from cobra.test import create_test_model
+
+from metabolic_ninja.worker.evaluate import DesignEvaluator
+
+
+def previous(model, designs, product_id, carbon_source_id, biomass_id):
+    for knockouts in designs:
+        with model:
+            for reaction_id in knockouts:
+                model.reactions.get_by_id(reaction_id).knock_out()
+            with model:
+                model.objective = product_id
+                model.optimize()
+            with model:
+                model.objective = biomass_id
+                try:
+                    pfba(model)
+                except OptimizationError:
+                    pass
+
+
+def current(model, designs, product_id, carbon_source_id, biomass_id):
+    evaluator = DesignEvaluator(model, product_id, carbon_source_id, biomass_id)
+    for knockouts in designs:
+        with model:
+            for reaction_id in knockouts:
+                model.reactions.get_by_id(reaction_id).knock_out()
+            evaluator.evaluate()
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="ecoli")
+    parser.add_argument("--biomass", default="BIOMASS_Ec_iJO1366_core_53p95M")
+    parser.add_argument("--carbon-source", default="EX_glc__D_e")
+    parser.add_argument("--product", default="succ_c")
+    parser.add_argument("--designs", type=int, default=50)
+    parser.add_argument("--knockouts", type=int, default=3)
+    args = parser.parse_args()
+
+    model = create_test_model(args.model)
+    print(f"{args.model}: {len(model.reactions)} reactions")
+    product = model.add_boundary(
+        model.metabolites.get_by_id(args.product), type="demand"
+    )
+    candidates = [
+        r.id for r in model.reactions if not r.boundary and r.id != args.biomass
+    ]
+    random.seed(42)
+    designs = [
+        random.sample(candidates, args.knockouts) for _ in range(args.designs)
+    ]
+    arguments = (model, designs, product.id, args.carbon_source, args.biomass)
+    before = measure(previous, *arguments) / args.designs
+    after = measure(current, *arguments) / args.designs
+    print(f"previous:  {before * 1000:.1f} ms per design")
+    print(f"evaluator: {after * 1000:.1f} ms per design")
+    print(f"speed-up:  {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
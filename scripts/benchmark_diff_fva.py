@@ -0,0 +1,78 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure how the differential FVA scales with the number of processes.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_diff_fva.py --model ecoli \
+        --biomass Ec_biomass_iJO1366_core_53p95M --carbon-source EX_glc_e \
+        --product succ_c --processes 1 2 3 5
+
+The product is made available through a demand reaction, which stands in for
+a predicted pathway. The results of every run are compared with those of the
+first one. Processes are given whole surface points, so there is no speed-up
+beyond as many processes as there are points.
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+from cobra.test import create_test_model
+from pandas.testing import assert_frame_equal
+
+from metabolic_ninja.worker.designer import differential_fva_optimization
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="textbook")
+    parser.add_argument("--biomass", default="Biomass_Ecoli_core")
+    parser.add_argument("--carbon-source", default="EX_glc__D_e")
+    parser.add_argument("--product", default="succ_c")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    model = create_test_model(args.model)
+    model.biomass = args.biomass
+    model.carbon_source = args.carbon_source
+    # Since the product's demand reaction is part of the model, the stand-in
+    # pathway is never applied.
+    pathway = SimpleNamespace(
+        product=model.add_boundary(
+            model.metabolites.get_by_id(args.product), type="demand"
+        )
+    )
+    reference = None
+    baseline = None
+    for processes in args.processes:
+        start = time.perf_counter()
+        designs = differential_fva_optimization(pathway, model, processes)
+        duration = time.perf_counter() - start
+        if reference is None:
+            reference = designs.data_frame
+            baseline = duration
+        else:
+            assert_frame_equal(designs.data_frame, reference, check_exact=False)
+        print(
+            f"{processes:>3} processes: {duration:.1f} s "
+            f"(speed-up {baseline / duration:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure memory use and time to first byte of exporting many designs.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_export.py --designs 500 --targets 50
+
+Synthetic differential FVA designs are exported the way the export endpoint
+does it. Streaming passes every chunk on, while buffering collects the whole
+archive like a response that is built in memory. Stored files assembles the
+files that the worker stores when a job completes.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from metabolic_ninja.models import DesignJob
+
+
+def make_designs(designs, targets):
+    result = []
+    for index in range(designs):
+        reactions = [f"R{index}_{target}" for target in range(targets)]
+        result.append(
+            {
+                "id": f"design-{index}",
+                "method": "PathwayPredictor+DifferentialFVA",
+                "manipulations": [
+                    {"id": rxn_id, "value": 1.0, "score": 0.5}
+                    for rxn_id in reactions
+                ],
+                "targets": {
+                    rxn_id: {
+                        "name": f"Reaction {rxn_id}",
+                        "subsystem": "Subsystem",
+                        "gpr": "b0001 and b0002",
+                        "definition_of_stoichiometry": "A + B --> C + D",
+                        "knockout": False,
+                        "flux_reversal": False,
+                        "suddenly_essential": True,
+                    }
+                    for rxn_id in reactions
+                },
+            }
+        )
+    return result
+
+
+def measure(designs, buffer, artifacts=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_byte = None
+    chunks = []
+    size = 0
+    for chunk in DesignJob().get_tabular_data(designs, artifacts):
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+        if buffer:
+            chunks.append(chunk)
+    if buffer:
+        b"".join(chunks)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, duration, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--designs", type=int, default=500)
+    parser.add_argument("--targets", type=int, default=50)
+    args = parser.parse_args()
+
+    designs = make_designs(args.designs, args.targets)
+    artifacts = {
+        design["id"]: DesignJob.get_artifacts(design) for design in designs
+    }
+    for label, buffer, stored in (
+        ("streaming", False, None),
+        ("buffering", True, None),
+        ("stored files", False, artifacts),
+    ):
+        first_byte, duration, peak, size = measure(designs, buffer, stored)
+        print(
+            f"{label}: first byte after {first_byte * 1000:.0f} ms, "
+            f"{duration:.1f} s in total, peak memory {peak / 2 ** 20:.1f} MiB "
+            f"({size / 2 ** 20:.1f} MiB archive)"
+        )
+
+
+if __name__ == "__main__":
+    main()
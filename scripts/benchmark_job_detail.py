@@ -0,0 +1,149 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the cost of serving a job with a large result.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_job_detail.py --designs 500 --targets 50
+
+The marshmallow path parses the result like the database driver does for a
+JSONB column, marshals the job and serializes it again. The pass-through path
+receives the result as JSON text and only serializes the other fields of the
+job, into which the text is spliced like the service does. Latency and CPU
+time are given per request, without the database query.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import orjson
+
+from metabolic_ninja.schemas import PredictionJobSchema
+
+
+def make_result(designs, targets):
+    rows = []
+    for index in range(designs):
+        reactions = [f"R{index}_{target}" for target in range(targets)]
+        rows.append(
+            {
+                "id": f"design-{index}",
+                "method": "PathwayPredictor+DifferentialFVA",
+                "knockouts": [],
+                "manipulations": [
+                    {"id": rxn_id, "value": 1.0, "score": 0.5}
+                    for rxn_id in reactions
+                ],
+                "heterologous_reactions": ["MNXR1", "MNXR2"],
+                "synthetic_reactions": [],
+                "exotic_cofactors": [],
+                "fitness": 0.1,
+                "yield": 0.2,
+                "product": 3.0,
+                "biomass": 0.4,
+                "targets": {
+                    rxn_id: {
+                        "name": f"Reaction {rxn_id}",
+                        "subsystem": "Subsystem",
+                        "gpr": "b0001 and b0002",
+                        "definition_of_stoichiometry": "A + B --> C + D",
+                        "knockout": False,
+                        "flux_reversal": False,
+                        "suddenly_essential": True,
+                    }
+                    for rxn_id in reactions
+                },
+            }
+        )
+    return {
+        "diff_fva": rows,
+        "opt_gene": [],
+        "cofactor_swap": [],
+        "reactions": {},
+        "metabolites": {},
+        "target": "DM_vanillin",
+        "progress": {"pathways_done": 1, "pathways_total": 1},
+    }
+
+
+def make_job(result):
+    now = datetime.now(timezone.utc)
+    return SimpleNamespace(
+        id=1,
+        project_id=None,
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=1,
+        aerobic=True,
+        status="SUCCESS",
+        created=now,
+        updated=now,
+        result=result,
+    )
+
+
+def marshmallow_path(job, result_json):
+    job.result = json.loads(result_json)
+    return json.dumps(PredictionJobSchema().dump(job))
+
+
+def pass_through_path(job, result_json):
+    job_json = orjson.dumps(PredictionJobSchema(exclude=("result",)).dump(job))
+    return b'{"result":' + result_json.encode("utf-8") + b"," + job_json[1:]
+
+
+def measure(path, job, result_json, requests):
+    start = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(requests):
+        path(job, result_json)
+    latency = (time.perf_counter() - start) / requests
+    cpu = (time.process_time() - cpu) / requests
+    return latency, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--designs", type=int, default=500)
+    parser.add_argument("--targets", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    result_json = json.dumps(make_result(args.designs, args.targets))
+    job = make_job(None)
+    # Both paths must produce the same document.
+    assert json.loads(marshmallow_path(job, result_json)) == json.loads(
+        pass_through_path(job, result_json)
+    )
+    print(f"result of {len(result_json) / 2 ** 20:.1f} MiB")
+    for label, path in (
+        ("marshmallow", marshmallow_path),
+        ("pass-through", pass_through_path),
+    ):
+        latency, cpu = measure(path, job, result_json, args.requests)
+        print(
+            f"{label}: {latency * 1000:.1f} ms latency, "
+            f"{cpu * 1000:.1f} ms CPU per request"
+        )
+
+
+if __name__ == "__main__":
+    main()
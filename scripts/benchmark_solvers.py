@@ -0,0 +1,105 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time the stages of a design job with every installed solver.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_solvers.py --model textbook --product vanillin \
+        --solvers cplex glpk
+
+The pathways are predicted with the BiGG universal model, which is built or
+loaded first, outside of the timed stages. The differential FVA and co-factor
+swap stages use the first predicted pathway.
+"""
+
+import argparse
+import time
+
+import cameo
+from cobra.test import create_test_model
+from cobra.util.solver import solvers
+
+from metabolic_ninja.universal import UNIVERSAL_SOURCES
+from metabolic_ninja.worker import designer
+
+
+def run_stages(model, product, universal_model, max_predictions):
+    """Return the duration of every stage in seconds."""
+    durations = {}
+    start = time.perf_counter()
+    predictor = cameo.strain_design.pathway_prediction.PathwayPredictor(
+        model, universal_model=universal_model
+    )
+    pathways = predictor.run(
+        product, max_predictions=max_predictions, timeout=120, silent=True
+    )
+    durations["find_pathways"] = time.perf_counter() - start
+    if len(pathways.pathways) == 0:
+        return durations
+    pathway = pathways.pathways[0]
+    with designer.pathway_applied(pathway, model):
+        start = time.perf_counter()
+        designer.differential_fva_optimization(pathway, model)
+        durations["diff_fva"] = time.perf_counter() - start
+    with model:
+        start = time.perf_counter()
+        designs = designer.cofactor_swap_optimization(pathway, model)
+        designer.evaluate_cofactor_swap(
+            designs, pathway, model, "PathwayPredictor+CofactorSwap"
+        )
+        durations["cofactor_swap"] = time.perf_counter() - start
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="textbook")
+    parser.add_argument("--biomass", default="Biomass_Ecoli_core")
+    parser.add_argument("--carbon-source", default="EX_glc__D_e")
+    parser.add_argument("--product", default="vanillin")
+    parser.add_argument("--max-predictions", type=int, default=1)
+    parser.add_argument(
+        "--solvers", nargs="+", default=sorted(solvers), help="default: all"
+    )
+    args = parser.parse_args()
+
+    universal_model = UNIVERSAL_SOURCES[(True, False)]
+    product = cameo.api.design.translate_product_to_universal_reactions_model_metabolite(  # noqa: E501
+        args.product, universal_model
+    )
+    stages = ("find_pathways", "diff_fva", "cofactor_swap")
+    print(f"{'solver':<10}" + "".join(f"{stage:>15}" for stage in stages))
+    for solver in args.solvers:
+        if solver not in solvers:
+            print(f"{solver:<10} not installed")
+            continue
+        model = create_test_model(args.model)
+        model.solver = solver
+        model.biomass = args.biomass
+        model.carbon_source = args.carbon_source
+        durations = run_stages(
+            model, product, universal_model, args.max_predictions
+        )
+        cells = [
+            f"{durations[stage]:.1f} s" if stage in durations else "-"
+            for stage in stages
+        ]
+        print(f"{solver:<10}" + "".join(f"{cell:>15}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
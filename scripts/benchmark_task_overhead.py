@@ -0,0 +1,81 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the per-task overhead of forking a process per task with the pool.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_task_overhead.py --tasks 50 --processes 2
+
+The task itself does nothing but return the number of reactions in the model,
+so the measured time is the overhead of dispatching a task and receiving its
+result.
+"""
+
+import argparse
+import time
+
+from cobra.test import create_test_model
+
+from metabolic_ninja.worker import decorators
+
+
+class BenchmarkJob:
+    """Stand in for a `Job` without requiring a database."""
+
+    def __init__(self, model):
+        self.job_id = 0
+        self.model = model
+
+    def save(self, **kwargs):
+        pass
+
+
+@decorators.task
+def count_reactions(job):
+    return len(job.model.reactions)
+
+
+def measure(job, tasks):
+    start = time.perf_counter()
+    for _ in range(tasks):
+        count_reactions(job)
+    return (time.perf_counter() - start) / tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--model", default="ecoli")
+    args = parser.parse_args()
+
+    job = BenchmarkJob(create_test_model(args.model))
+    fork = measure(job, args.tasks)
+    print(f"fork and pipe: {fork * 1000:.1f} ms per task")
+    decorators.start_worker_pool(args.processes)
+    try:
+        # The first task per process includes sending the job.
+        measure(job, args.processes)
+        pool = measure(job, args.tasks)
+    finally:
+        decorators.stop_worker_pool()
+    print(f"worker pool:   {pool * 1000:.1f} ms per task")
+    print(f"speed-up:      {fork / pool:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
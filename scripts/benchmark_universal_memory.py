@@ -0,0 +1,106 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure loading the universal models and sharing them with child processes.
+
+Run from the repository root with, for example,
+
+    python scripts/benchmark_universal_memory.py --processes 4
+
+The script first loads a universal model the way cameo does and then from the
+cache in `UNIVERSAL_CACHE_DIR`. It then forks processes which read the whole
+model and run a garbage collection, like a task would, and reports how much
+memory each of them does not share with the parent, without and with freezing
+the garbage collector before forking.
+"""
+
+import argparse
+import gc
+import multiprocessing
+import resource
+import time
+
+from cameo.models import universal as cameo_universal
+
+from metabolic_ninja import universal
+
+
+def peak_memory():
+    """Return the peak resident set size of this process in MiB."""
+    # `ru_maxrss` is given in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def private_memory():
+    """Return the memory of this process not shared with any other in MiB."""
+    with open("/proc/self/smaps_rollup") as file_:
+        return (
+            sum(
+                int(line.split()[1])
+                for line in file_
+                if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+            / 1024
+        )
+
+
+def touch(model, results):
+    for reaction in model.reactions:
+        reaction.id
+        for metabolite in reaction.metabolites:
+            metabolite.id
+    gc.collect()
+    results.put(private_memory())
+
+
+def measure(model, processes):
+    results = multiprocessing.Queue()
+    children = [
+        multiprocessing.Process(target=touch, args=(model, results))
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    private = [results.get() for _ in children]
+    for child in children:
+        child.join()
+    return sum(private) / len(private)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--model", default="metanetx_universal_model_bigg_rhea")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    getattr(cameo_universal, args.model).id
+    print(f"load with cameo:  {time.perf_counter() - start:.1f} s")
+    # Make sure the cached form exists before timing it.
+    universal.load_universal_model(args.model)
+    start = time.perf_counter()
+    model = universal.load_universal_model(args.model)
+    print(f"load from cache:  {time.perf_counter() - start:.1f} s")
+    print(f"parent peak:      {peak_memory():.0f} MiB")
+
+    print(f"child private:    {measure(model, args.processes):.0f} MiB")
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+        print(f"... after freeze: {measure(model, args.processes):.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
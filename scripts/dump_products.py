@@ -13,13 +13,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+"""
+Write the product names and the product lookup index to the `data` directory.
+
+Both cover the metabolites of all universal models that jobs may use. Run from
+the repository root whenever the universal models change.
+"""
+
 import json
 
-from cameo.models.universal import metanetx_universal_model_bigg_rhea
+from cameo.models.universal import (
+    metanetx_universal_model_bigg,
+    metanetx_universal_model_bigg_rhea,
+    metanetx_universal_model_rhea,
+)
+
+from metabolic_ninja.products import ProductLookup
 
 
+metabolites = [
+    metabolite
+    for model in (
+        metanetx_universal_model_bigg_rhea,
+        metanetx_universal_model_bigg,
+        metanetx_universal_model_rhea,
+    )
+    for metabolite in model.metabolites
+]
+
 with open("data/products.json", "w") as file_:
     json.dump(
-        [{"name": m.name} for m in metanetx_universal_model_bigg_rhea.metabolites],
+        [{"name": name} for name in dict.fromkeys(m.name for m in metabolites)],
         file_,
     )
+
+ProductLookup.from_metabolites(metabolites).to_json("data/product_index.json")
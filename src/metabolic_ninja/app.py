@@ -59,8 +59,9 @@ def init_app(application, database):
 
     resources.init_app(application)
 
-    # Add CORS information for all resources.
-    CORS(application)
+    # Add CORS information for all resources. Browsers only let clients read
+    # the pagination headers if they are exposed.
+    CORS(application, expose_headers=["X-Next-Cursor", "X-Total-Count"])
 
     # Add readiness check endpoint
     from . import healthz
@@ -0,0 +1,79 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Keep recently exported archives for repeated downloads."""
+
+import os
+
+from .bytes_cache import BytesCache
+
+
+__all__ = ("ArchiveCache", "archive_cache")
+
+
+# The total size of the cached archives in MiB. Zero disables the cache.
+EXPORT_CACHE_SIZE = int(os.environ.get("EXPORT_CACHE_SIZE", 256))
+# The size in MiB of the largest archive that is cached. Larger archives are
+# only streamed.
+EXPORT_CACHE_ARCHIVE_SIZE = int(os.environ.get("EXPORT_CACHE_ARCHIVE_SIZE", 4))
+
+
+class ArchiveCache(BytesCache):
+    """
+    Keep the exported archives of completed jobs in memory.
+
+    The results of a completed job do not change anymore, so an archive of
+    the same predictions can be sent again as it is. Only archives of up to
+    ``max_archive_size`` bytes are cached, such that streaming a large archive
+    never buffers it. The least recently used archives are evicted once the
+    archives exceed ``max_size`` bytes in total.
+    """
+
+    def __init__(self, max_size, max_archive_size):
+        super().__init__(max_size)
+        self.max_archive_size = min(max_size, max_archive_size)
+
+    def put(self, key, data):
+        """Cache the archive under the key unless it is too large."""
+        if len(data) > self.max_archive_size:
+            return False
+        return super().put(key, data)
+
+    def collect(self, key, chunks):
+        """
+        Pass on the chunks of an archive and cache the complete archive.
+
+        The chunks are only kept while the archive does not exceed the size of
+        the largest archive that is cached. An archive that is not sent
+        completely, for example, because the client disconnected, is not
+        cached.
+        """
+        collected = []
+        size = 0
+        for chunk in chunks:
+            if collected is not None:
+                size += len(chunk)
+                if size <= self.max_archive_size:
+                    collected.append(chunk)
+                else:
+                    collected = None
+            yield chunk
+        if collected is not None:
+            self.put(key, b"".join(collected))
+
+
+archive_cache = ArchiveCache(
+    EXPORT_CACHE_SIZE * 2 ** 20, EXPORT_CACHE_ARCHIVE_SIZE * 2 ** 20
+)
@@ -0,0 +1,71 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Keep byte strings in memory up to a total size."""
+
+import threading
+from collections import OrderedDict
+
+
+__all__ = ("BytesCache",)
+
+
+class BytesCache:
+    """
+    Keep byte strings in memory by key.
+
+    The least recently used entries are evicted once the entries exceed
+    ``max_size`` bytes in total. An entry larger than that is not cached. The
+    cache may be shared between threads.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def size(self):
+        """Return the total size of the cached entries in bytes."""
+        with self._lock:
+            return self._size
+
+    def get(self, key):
+        """Return the bytes cached for the key or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        """Cache the bytes under the key and return whether they fit."""
+        if len(data) > self.max_size:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return True
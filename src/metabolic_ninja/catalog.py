@@ -0,0 +1,122 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Share reaction and metabolite definitions among the results of jobs."""
+
+import hashlib
+import json
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import CatalogEntry
+
+
+__all__ = ("definition_hash", "add_definitions", "resolved_result_json")
+
+
+def definition_hash(definition):
+    """Return the hash of the canonical JSON form of a definition."""
+    canonical = json.dumps(definition, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def add_definitions(session, definitions):
+    """
+    Add definitions to the catalog unless they are present already.
+
+    The caller commits the session.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The database session to use.
+    definitions : dict
+        Reaction or metabolite definitions keyed by their identifier.
+
+    Returns
+    -------
+    dict
+        The hash of each definition by identifier, which is stored in job
+        results in place of the definition.
+
+    """
+    references = {
+        identifier: definition_hash(definition)
+        for identifier, definition in definitions.items()
+    }
+    if references:
+        entries = {
+            reference: definitions[identifier]
+            for identifier, reference in references.items()
+        }
+        session.execute(
+            insert(CatalogEntry)
+            .values(
+                [
+                    {"hash": reference, "definition": definition}
+                    for reference, definition in entries.items()
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["hash"])
+        )
+    return references
+
+
+def resolved_result_json(session, job_id):
+    """
+    Return the result of a job as JSON with the referenced definitions.
+
+    PostgreSQL fills in the definitions and returns the result as text, which
+    can be sent as it is without parsing it. Results stored before the
+    catalog existed contain the definitions themselves, which are left as
+    they are. A job without a result yields ``"null"``.
+
+    """
+    row = session.execute(_RESULT_JSON, {"id": job_id}).first()
+    if row is None or row[0] is None:
+        return "null"
+    return row[0]
+
+
+def _resolve(key):
+    """Return the SQL that fills in the definitions of ``result -> key``."""
+    return f"""
+        (
+            SELECT COALESCE(
+                jsonb_object_agg(
+                    entry.key, COALESCE(catalog_entry.definition, entry.value)
+                ),
+                '{{}}'
+            )
+            FROM jsonb_each(COALESCE(result -> '{key}', '{{}}')) AS entry
+            LEFT JOIN catalog_entry
+                ON catalog_entry.hash = entry.value #>> '{{}}'
+        )
+    """
+
+
+_RESULT_JSON = text(
+    f"""
+    SELECT CAST(
+        result || jsonb_build_object(
+            'reactions', {_resolve("reactions")},
+            'metabolites', {_resolve("metabolites")}
+        ) AS text
+    )
+    FROM design_job
+    WHERE id = :id
+    """
+)
@@ -13,12 +13,15 @@
 # limitations under the License.from datetime import datetime
 
 
+import gzip
+import time
 from datetime import datetime, timezone
-from io import BytesIO
-from zipfile import ZipFile
+from io import BytesIO, RawIOBase
+from zipfile import ZipFile, ZipInfo
 
 from flask_sqlalchemy import SQLAlchemy
-from pandas import DataFrame, ExcelWriter
+from openpyxl import Workbook
+from pandas import DataFrame
 from sqlalchemy.dialects import postgresql
 
 
@@ -29,6 +32,32 @@ def tz_aware_now():
     return datetime.now(timezone.utc)
 
 
+class _ChunkedStream(RawIOBase):
+    """Collect the data written to a file until it is passed on."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        """Return and forget the data written since the last call."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_info(filename):
+    """Describe a file of an archive last modified now."""
+    return ZipInfo(filename, date_time=time.localtime()[:6])
+
+
 class TimestampMixin:
 
     created = db.Column(
@@ -57,6 +86,10 @@ class DesignJob(TimestampMixin, db.Model):
     status = db.Column(db.String(8), nullable=False)
     result = db.Column(postgresql.JSONB, nullable=True)
 
+    __table_args__ = (
+        db.Index("ix_design_job_project_id_created", "project_id", "created"),
+    )
+
     def __repr__(self):
         """Return a printable representation."""
         return f"<{self.__class__.__name__} {self.id}>"
@@ -64,32 +97,75 @@ class DesignJob(TimestampMixin, db.Model):
     def is_complete(self):
         return self.status in ("SUCCESS", "FAILURE", "REVOKED")
 
-    def get_tabular_data(self, predictions):
-        memory_file = BytesIO()
-        with ZipFile(memory_file, "w") as zf:
+    def get_tabular_data(self, predictions, artifacts=None):
+        """
+        Yield a zip archive with a CSV and an Excel file per prediction.
+
+        The archive is produced in chunks, one per file, such that memory use
+        does not grow with the number of predictions and the first bytes can
+        be sent right away.
+
+        Parameters
+        ----------
+        predictions : list
+            The predictions to export.
+        artifacts : dict, optional
+            The files of predictions as returned by `get_artifacts` by
+            prediction identifier. The files of other predictions are built
+            here.
+
+        """
+        if artifacts is None:
+            artifacts = {}
+        stream = _ChunkedStream()
+        with ZipFile(stream, "w") as zf:
             for prediction in predictions:
-                if prediction["method"] == "PathwayPredictor+DifferentialFVA":
-                    df = self.get_diff_fva_data(prediction)
-                elif prediction["method"] == "PathwayPredictor+OptGene":
-                    df = self.get_opt_gene_data(prediction)
-                elif prediction["method"] == "PathwayPredictor+CofactorSwap":
-                    df = self.get_cofactor_swap_data(prediction)
-                else:
-                    raise ValueError(
-                        f"Unknown method '{prediction['method']}'."
-                    )
+                files = artifacts.get(prediction["id"])
+                if files is None:
+                    files = self.get_artifacts(prediction)
+                csv, xlsx = files
                 fileName = prediction["method"].split("+")[1]
-                zf.writestr(f"{fileName}-{prediction['id']}.csv", df.to_csv())
-                output = BytesIO()
-                writer = ExcelWriter(output)
-                df.to_excel(writer)
-                writer.save()
                 zf.writestr(
-                    f"{fileName}-{prediction['id']}.xlsx", output.getvalue()
+                    _zip_info(f"{fileName}-{prediction['id']}.csv"),
+                    gzip.decompress(csv),
                 )
-        return memory_file.getvalue()
+                yield stream.pop()
+                zf.writestr(
+                    _zip_info(f"{fileName}-{prediction['id']}.xlsx"), xlsx
+                )
+                yield stream.pop()
+        yield stream.pop()
+
+    @staticmethod
+    def get_artifacts(prediction):
+        """
+        Return the CSV and the Excel file of a prediction.
 
-    def get_diff_fva_data(self, prediction):
+        The CSV file is compressed with gzip. The worker stores both files
+        when a job completes, so that exports only need to assemble them.
+        """
+        if prediction["method"] == "PathwayPredictor+DifferentialFVA":
+            df = DesignJob.get_diff_fva_data(prediction)
+        elif prediction["method"] == "PathwayPredictor+OptGene":
+            df = DesignJob.get_opt_gene_data(prediction)
+        elif prediction["method"] == "PathwayPredictor+CofactorSwap":
+            df = DesignJob.get_cofactor_swap_data(prediction)
+        else:
+            raise ValueError(f"Unknown method '{prediction['method']}'.")
+        csv = gzip.compress(df.to_csv().encode("utf-8"))
+        # Rows of a write-only workbook are written to a temporary file right
+        # away rather than kept in memory.
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(prediction["method"].split("+")[1])
+        sheet.append([None] + list(df.columns))
+        for row in df.itertuples(name=None):
+            sheet.append(row)
+        output = BytesIO()
+        workbook.save(output)
+        return csv, output.getvalue()
+
+    @staticmethod
+    def get_diff_fva_data(prediction):
         result = []
         targets = prediction["targets"]
         manipulations = prediction["manipulations"]
@@ -127,7 +203,8 @@ class DesignJob(TimestampMixin, db.Model):
             ],
         )
 
-    def get_opt_gene_data(self, prediction):
+    @staticmethod
+    def get_opt_gene_data(prediction):
         result = []
         targets = prediction["targets"]
         for gene_id in targets:
@@ -157,7 +234,8 @@ class DesignJob(TimestampMixin, db.Model):
             ],
         )
 
-    def get_cofactor_swap_data(self, prediction):
+    @staticmethod
+    def get_cofactor_swap_data(prediction):
         result = []
         targets = prediction["targets"]
         manipulations = prediction["manipulations"]
@@ -190,3 +268,157 @@ class DesignJob(TimestampMixin, db.Model):
                 "definition_of_stoichiometry",
             ],
         )
+
+
+class DesignPrediction(db.Model):
+    """
+    A single design of a job.
+
+    The designs are also part of the job's result. As rows, they can be looked
+    up, filtered and sorted by indexed queries instead of in Python.
+    """
+
+    # The UUID assigned by the worker.
+    id = db.Column(db.String(36), primary_key=True)
+    job_id = db.Column(
+        db.Integer,
+        db.ForeignKey("design_job.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    method = db.Column(db.String, nullable=False)
+    fitness = db.Column(db.Float, nullable=True)
+    design = db.Column(postgresql.JSONB, nullable=False)
+    # The export files built when the job completed, see
+    # `DesignJob.get_artifacts`.
+    csv = db.Column(db.LargeBinary, nullable=True)
+    xlsx = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            "ix_design_prediction_job_method_fitness",
+            "job_id",
+            "method",
+            fitness.desc().nullslast(),
+        ),
+    )
+
+    def __repr__(self):
+        """Return a printable representation."""
+        return f"<{self.__class__.__name__} {self.id}>"
+
+
+class CatalogEntry(db.Model):
+    """
+    A reaction or metabolite definition referred to by job results.
+
+    Entries are addressed by the hash of their content, such that the results
+    of all jobs share a single copy of every definition, see
+    `metabolic_ninja.catalog`.
+    """
+
+    hash = db.Column(db.String(64), primary_key=True)
+    definition = db.Column(postgresql.JSONB, nullable=False)
+
+    def __repr__(self):
+        """Return a printable representation."""
+        return f"<{self.__class__.__name__} {self.hash}>"
+
+
+class DesignResultCache(db.Model):
+    """
+    Results of completed design jobs by a hash of their inputs.
+
+    Identical jobs are completed by copying a cached result. The key includes
+    the versions of the libraries and universal models that produced the
+    result, so that an upgrade invalidates all existing entries.
+    """
+
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.String, nullable=False, index=True)
+    result = db.Column(postgresql.JSONB, nullable=False)
+    created = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=tz_aware_now
+    )
+    last_used = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=tz_aware_now,
+        index=True,
+    )
+
+    def __repr__(self):
+        """Return a printable representation."""
+        return f"<{self.__class__.__name__} {self.key}>"
+
+
+class PathwayCache(db.Model):
+    """
+    Heterologous pathways predicted for a model and product.
+
+    The pathways are stored as reaction and metabolite definitions that can be
+    turned into pathway objects again. An entry serves requests for up to
+    ``pathway_count`` pathways. One that holds fewer than ``max_predictions``
+    pathways without having timed out holds all there are and serves any
+    request.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String, nullable=False, index=True)
+    model_hash = db.Column(db.String(64), nullable=False)
+    aerobic = db.Column(db.Boolean, nullable=False)
+    bigg = db.Column(db.Boolean, nullable=False)
+    rhea = db.Column(db.Boolean, nullable=False)
+    product_id = db.Column(db.String, nullable=False)
+    max_predictions = db.Column(db.Integer, nullable=False)
+    # The number of predicted pathways.
+    pathway_count = db.Column(db.Integer, nullable=False)
+    # Whether the search for a pathway timed out and ended the prediction.
+    timed_out = db.Column(db.Boolean, nullable=False)
+    pathways = db.Column(postgresql.JSONB, nullable=False)
+    created = db.Column(
+        db.DateTime(timezone=True), nullable=False, default=tz_aware_now
+    )
+    last_used = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=tz_aware_now,
+        index=True,
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_pathway_cache_lookup",
+            "model_hash",
+            "product_id",
+            "aerobic",
+            "bigg",
+            "rhea",
+        ),
+    )
+
+    def __repr__(self):
+        """Return a printable representation."""
+        return f"<{self.__class__.__name__} {self.id}>"
+
+
+class DesignCheckpoint(db.Model):
+    """
+    The pickled result of a completed stage of a running design job.
+
+    Checkpoints are only written and read by the worker, see
+    `metabolic_ninja.worker.checkpoints`.
+    """
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    stage = db.Column(db.String, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=tz_aware_now,
+        index=True,
+    )
+
+    def __repr__(self):
+        """Return a printable representation."""
+        return f"<{self.__class__.__name__} {self.job_id} {self.stage}>"
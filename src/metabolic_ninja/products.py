@@ -0,0 +1,238 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Search and resolve the products that designs can be requested for."""
+
+import bisect
+import hashlib
+import json
+from collections import defaultdict
+
+
+__all__ = ("ProductIndex", "ProductLookup")
+
+
+def _normalize(text):
+    return " ".join(text.casefold().split())
+
+
+def _trigrams(text):
+    """Return the set of character trigrams of the padded text."""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductIndex:
+    """
+    Look up product names by prefix, substring or similarity.
+
+    The index is built once from the list of names. Prefix queries use binary
+    search on the sorted, normalized names. Substring and fuzzy queries use an
+    inverted index of character trigrams to narrow down the candidates.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The product names. Duplicates are ignored.
+
+    """
+
+    # The minimal share of the query's trigrams in a fuzzy match.
+    SIMILARITY_THRESHOLD = 0.3
+
+    def __init__(self, names):
+        # Sort case-insensitively but keep the original spelling for display.
+        self.names = sorted(
+            set(names), key=lambda name: (_normalize(name), name)
+        )
+        self._normalized = [_normalize(name) for name in self.names]
+        self._trigrams = [_trigrams(name) for name in self._normalized]
+        self._postings = defaultdict(set)
+        for position, trigrams in enumerate(self._trigrams):
+            for trigram in trigrams:
+                self._postings[trigram].add(position)
+        self.etag = hashlib.sha256(
+            "\n".join(self.names).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def from_json(cls, path):
+        """Build the index from a JSON list of ``{"name": ...}`` objects."""
+        with open(path) as file_:
+            return cls(product["name"] for product in json.load(file_))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        """Return whether the name is known, ignoring case."""
+        query = _normalize(name)
+        position = bisect.bisect_left(self._normalized, query)
+        return (
+            position < len(self.names) and self._normalized[position] == query
+        )
+
+    def prefix(self, query):
+        """Return the positions of names starting with the query in order."""
+        start = bisect.bisect_left(self._normalized, query)
+        # Every name with the prefix sorts before the prefix followed by the
+        # largest possible code point.
+        stop = bisect.bisect_left(self._normalized, query + "\U0010ffff")
+        return list(range(start, stop))
+
+    def substring(self, query):
+        """Return the positions of names containing the query in order."""
+        # Only the trigrams entirely within the query are certain to occur in
+        # every name containing it; the padded ones at the ends are not.
+        trigrams = {t for t in _trigrams(query) if " " not in (t[0], t[-1])}
+        if trigrams:
+            candidates = set.intersection(
+                *(self._postings.get(t, set()) for t in trigrams)
+            )
+        else:
+            candidates = range(len(self.names))
+        return sorted(
+            position
+            for position in candidates
+            if query in self._normalized[position]
+        )
+
+    def fuzzy(self, query):
+        """Return the positions of names similar to the query, best first."""
+        # Names are ranked by the share of the query's trigrams they contain,
+        # such that long names containing a misspelled word are found, and
+        # then by their overall similarity with the query.
+        query_trigrams = _trigrams(query)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for position in self._postings.get(trigram, ()):
+                shared[position] += 1
+        scored = []
+        for position, count in shared.items():
+            coverage = count / len(query_trigrams)
+            if coverage < self.SIMILARITY_THRESHOLD:
+                continue
+            similarity = count / (
+                len(query_trigrams) + len(self._trigrams[position]) - count
+            )
+            scored.append((-coverage, -similarity, position))
+        scored.sort()
+        return [position for *_, position in scored]
+
+    def search(self, query=None, match="prefix", offset=0, limit=None):
+        """
+        Find product names matching the query.
+
+        Parameters
+        ----------
+        query : str, optional
+            The text to look for. Without a query, all names match.
+        match : {"prefix", "substring", "fuzzy"}, optional
+            How the query is compared with the names. Comparisons ignore case
+            and repeated whitespace.
+        offset : int, optional
+            The number of matches to skip.
+        limit : int, optional
+            The maximum number of names to return.
+
+        Returns
+        -------
+        tuple
+            The total number of matches and the requested page of names.
+
+        """
+        query = _normalize(query or "")
+        if not query:
+            positions = range(len(self.names))
+        else:
+            positions = getattr(self, match)(query)
+        stop = None if limit is None else offset + limit
+        return len(positions), [self.names[i] for i in positions[offset:stop]]
+
+
+class ProductLookup:
+    """
+    Map names and identifiers of products to universal model metabolites.
+
+    Every metabolite is found by its identifier, its name and the identifiers
+    in its annotation. Other annotations, such as the SBO term or the mass,
+    are shared by unrelated metabolites and are not used. Keys are compared
+    ignoring case and repeated whitespace. A key may refer to several
+    metabolites.
+
+    Parameters
+    ----------
+    entries : dict
+        Metabolite identifiers by normalized key.
+
+    """
+
+    # The annotations that identify a metabolite. The universal models of
+    # cameo give the cross-reference and the InChI of each metabolite.
+    IDENTIFIER_ANNOTATIONS = (
+        "source",
+        "InChI",
+        "inchi",
+        "bigg.metabolite",
+        "chebi",
+        "kegg.compound",
+        "metanetx.chemical",
+    )
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    @classmethod
+    def from_metabolites(cls, metabolites):
+        """Build the lookup from cobra metabolites."""
+        entries = {}
+        for metabolite in metabolites:
+            keys = [metabolite.id, metabolite.name]
+            for namespace in cls.IDENTIFIER_ANNOTATIONS:
+                value = metabolite.annotation.get(namespace)
+                if value is None:
+                    continue
+                if isinstance(value, str):
+                    keys.append(value)
+                else:
+                    keys.extend(value)
+            for key in keys:
+                if not key:
+                    continue
+                identifiers = entries.setdefault(_normalize(key), [])
+                if metabolite.id not in identifiers:
+                    identifiers.append(metabolite.id)
+        return cls(entries)
+
+    @classmethod
+    def from_json(cls, path):
+        """Load a lookup written by `to_json`."""
+        with open(path) as file_:
+            return cls(json.load(file_))
+
+    def to_json(self, path):
+        """Write the lookup to a JSON file."""
+        with open(path, "w") as file_:
+            json.dump(self._entries, file_, sort_keys=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return _normalize(name) in self._entries
+
+    def get(self, name):
+        """Return the identifiers of the metabolites known by the name."""
+        return self._entries.get(_normalize(name), [])
@@ -15,33 +15,50 @@
 
 """Implement RESTful API endpoints using resources."""
 
-import json
+import base64
+import hashlib
 import logging
 import os
 import warnings
+from datetime import datetime, timedelta, timezone
 
+import orjson
 import requests
-from flask import g, make_response, request
+from flask import Response, g, jsonify, request, stream_with_context
 from flask_apispec import MethodResource, marshal_with, use_kwargs
 from flask_apispec.extension import FlaskApiSpec
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer
 from sqlalchemy.orm.exc import NoResultFound
+from webargs.flaskparser import abort
 from werkzeug.exceptions import Forbidden, NotFound, Unauthorized
 
 from .app import app
+from .archive_cache import archive_cache
+from .catalog import resolved_result_json
 from .jwt import jwt_require_claim, jwt_required
-from .models import DesignJob, db
+from .models import DesignJob, DesignPrediction, db
+from .products import ProductIndex
 from .rabbitmq import submit_job
 from .schemas import (
+    DesignListRequestSchema,
     JobExportRequestSchema,
+    PredictionJobListRequestSchema,
     PredictionJobRequestSchema,
     PredictionJobSchema,
+    ProductSearchRequestSchema,
 )
 
 
 logger = logging.getLogger(__name__)
 
-with open("data/products.json") as file_:
-    PRODUCT_LIST = json.load(file_)
+# Built once at import, that is, in the gunicorn master process when the app is
+# preloaded and then shared with the workers.
+PRODUCT_INDEX = ProductIndex.from_json("data/products.json")
+
+
+# Serializes everything of a job but its result, see `PredictionJobResource`.
+JOB_WITHOUT_RESULT = PredictionJobSchema(exclude=("result",))
 
 
 def init_app(app):
@@ -56,6 +73,7 @@ def init_app(app):
     docs = FlaskApiSpec(app)
     register("/predictions", PredictionJobsResource)
     register("/predictions/<int:job_id>", PredictionJobResource)
+    register("/predictions/<int:job_id>/designs", DesignListResource)
     register("/predictions/export/<int:job_id>", JobExportResource)
     register("/products", ProductsResource)
 
@@ -73,6 +91,7 @@ class PredictionJobsResource(MethodResource):
         bigg,
         rhea,
         aerobic,
+        solver,
     ):
         """
         Create a design job.
@@ -80,11 +99,15 @@ class PredictionJobsResource(MethodResource):
         :param model_id: A numeric identifier coming from the model-storage
             service.
         :param project_id: Can be ``None`` in which case the job is public.
-        :param product_name:
+        :param product_name: The name or an identifier of the product. Any
+            name is accepted; the worker resolves it and fails the job if it
+            cannot find the product.
         :param max_predictions:
         :param bigg: bool
         :param rhea: bool
         :param aerobic: bool
+        :param solver: The solver to use for this job or ``None`` for the
+            worker's default.
         :return:
         random comment
         """
@@ -140,6 +163,7 @@ class PredictionJobsResource(MethodResource):
             organism_name=organism_name,
             user_name=user_name,
             user_email=user_email,
+            solver=solver,
         )
         return {"id": job.id}, 202
 
@@ -165,23 +189,112 @@ class PredictionJobsResource(MethodResource):
         response.raise_for_status()
         return response.json()
 
+    @use_kwargs(PredictionJobListRequestSchema, locations=["query"])
     @marshal_with(PredictionJobSchema(many=True, exclude=("result",)), 200)
-    def get(self):
-        # Return a list of jobs that the user can see.
-        return DesignJob.query.filter(
+    def get(
+        self,
+        status,
+        project_id,
+        created_after,
+        created_before,
+        order,
+        cursor,
+        limit,
+    ):
+        """
+        List the design jobs that the user can see, ordered by creation.
+
+        Jobs can only be ordered by their creation time, which is indexed, so
+        that every page is fetched by an index scan.
+
+        :param status: Return only jobs with this status.
+        :param project_id: Return only jobs of this project.
+        :param created_after: Return only jobs created at or after this time.
+        :param created_before: Return only jobs created before this time.
+        :param order: ``desc`` (default) for the newest jobs first or ``asc``.
+        :param cursor: Continue after the last job of the previous page, as
+            given by its ``X-Next-Cursor`` header.
+        :param limit: The maximum number of jobs to return, 100 by default
+            and at most 1000.
+        :return: A list of jobs without their results. If there are more
+            jobs, the ``X-Next-Cursor`` header is set.
+        """
+        # The results are large and not part of the listing.
+        query = DesignJob.query.options(defer(DesignJob.result)).filter(
             DesignJob.project_id.in_(g.jwt_claims["prj"])
             | DesignJob.project_id.is_(None)
-        ).all()
+        )
+        if status is not None:
+            query = query.filter(DesignJob.status == status)
+        if project_id is not None:
+            query = query.filter(DesignJob.project_id == project_id)
+        if created_after is not None:
+            query = query.filter(DesignJob.created >= created_after)
+        if created_before is not None:
+            query = query.filter(DesignJob.created < created_before)
+        # The identifier breaks ties between jobs created at the same time, so
+        # that pages neither overlap nor skip jobs.
+        key = tuple_(DesignJob.created, DesignJob.id)
+        if cursor is not None:
+            position = tuple_(*_decode_cursor(cursor))
+            if order == "desc":
+                query = query.filter(key < position)
+            else:
+                query = query.filter(key > position)
+        if order == "desc":
+            query = query.order_by(
+                DesignJob.created.desc(), DesignJob.id.desc()
+            )
+        else:
+            query = query.order_by(DesignJob.created, DesignJob.id)
+        # Fetch one more job to know whether there is another page.
+        jobs = query.limit(limit + 1).all()
+        headers = {}
+        if len(jobs) > limit:
+            jobs = jobs[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(jobs[-1])
+        return jobs, 200, headers
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _encode_cursor(job):
+    """Return the position of the job in a listing as an opaque string."""
+    # Microseconds since the epoch represent the creation time exactly.
+    created = (job.created - EPOCH) // timedelta(microseconds=1)
+    position = f"{created}|{job.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Return the creation time and identifier that a cursor refers to."""
+    try:
+        created, job_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return EPOCH + timedelta(microseconds=int(created)), int(job_id)
+    except ValueError:
+        abort(422, messages={"cursor": [f"Invalid cursor '{cursor}'."]})
 
 
 class PredictionJobResource(MethodResource):
-    @marshal_with(PredictionJobSchema(), 200)
-    @marshal_with(PredictionJobSchema(), 202)
+    # The response is serialized below, the schema only documents it.
+    @marshal_with(PredictionJobSchema(), 200, apply=False)
+    @marshal_with(PredictionJobSchema(), 202, apply=False)
     def get(self, job_id):
+        """
+        Return a design job including its results.
+
+        While a job is running (status ``STARTED``), its result contains the
+        designs of all finished units so far and the ``progress`` counters
+        ``pathways_done`` and ``pathways_total``.
+        """
         job_id = int(job_id)
         try:
             job = (
-                DesignJob.query.filter(DesignJob.id == job_id)
+                DesignJob.query.options(defer(DesignJob.result))
+                .filter(DesignJob.id == job_id)
                 .filter(
                     DesignJob.project_id.in_(g.jwt_claims["prj"])
                     | DesignJob.project_id.is_(None)
@@ -198,12 +311,94 @@ class PredictionJobResource(MethodResource):
                 status = 200
             else:
                 status = 202
-            return job, status
+            # Parsing and marshalling a large result would take most of the
+            # time of a request. PostgreSQL returns the result, including the
+            # reaction and metabolite definitions it refers to, as JSON text,
+            # which is placed as it is at the first key of the serialized job.
+            return Response(
+                _with_result(
+                    orjson.dumps(JOB_WITHOUT_RESULT.dump(job)),
+                    resolved_result_json(db.session, job.id),
+                ),
+                status,
+                mimetype="application/json",
+            )
+
+
+def _with_result(job_json, result_json):
+    """Return the serialized job with the JSON text of its result added."""
+    # The serialized job is an object with at least its identifier, so its
+    # remaining keys follow the result after a comma.
+    return b'{"result":' + result_json.encode("utf-8") + b"," + job_json[1:]
+
+
+class DesignListResource(MethodResource):
+    @use_kwargs(DesignListRequestSchema, locations=["query"])
+    def get(self, job_id, method, offset, limit):
+        """
+        Return the designs of a job by descending fitness.
+
+        :param method: Return only designs of this method, for example,
+            ``PathwayPredictor+OptGene``.
+        :param offset: The number of designs to skip.
+        :param limit: The maximum number of designs to return.
+        :return: A list of designs. The total number of designs is given in
+            the ``X-Total-Count`` header.
+        """
+        visible = (
+            db.session.query(DesignJob.id)
+            .filter(DesignJob.id == job_id)
+            .filter(
+                DesignJob.project_id.in_(g.jwt_claims["prj"])
+                | DesignJob.project_id.is_(None)
+            )
+        )
+        if visible.scalar() is None:
+            return (
+                {"error": f"Cannot find any design job with id {job_id}."},
+                404,
+            )
+        query = db.session.query(DesignPrediction.design).filter(
+            DesignPrediction.job_id == job_id
+        )
+        if method is not None:
+            query = query.filter(DesignPrediction.method == method)
+        total = query.count()
+        query = (
+            query.order_by(DesignPrediction.fitness.desc().nullslast())
+            .offset(offset)
+            .limit(limit)
+        )
+        response = jsonify([design for design, in query])
+        response.headers["X-Total-Count"] = str(total)
+        return response
 
 
 class ProductsResource(MethodResource):
-    def get(self):
-        return PRODUCT_LIST
+    @use_kwargs(ProductSearchRequestSchema, locations=["query"])
+    def get(self, query, match, offset, limit):
+        """
+        Search the names of products that designs can be requested for.
+
+        :param query: Return only names matching this text. Without it, all
+            names are returned.
+        :param match: How to match the query: ``prefix`` (default),
+            ``substring`` or ``fuzzy``. Matching ignores case.
+        :param offset: The number of matching names to skip.
+        :param limit: The maximum number of names to return.
+        :return: A list of ``{"name": ...}`` objects. The total number of
+            matches is given in the ``X-Total-Count`` header.
+        """
+        total, names = PRODUCT_INDEX.search(query, match, offset, limit)
+        response = jsonify([{"name": name} for name in names])
+        response.headers["X-Total-Count"] = str(total)
+        # The products only change with a new deployment, which changes the
+        # entity tag of every response.
+        parameters = f"{PRODUCT_INDEX.etag}|{match}|{offset}|{limit}|{query}"
+        response.set_etag(hashlib.sha256(parameters.encode()).hexdigest())
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
 
 
 class JobExportResource(MethodResource):
@@ -211,8 +406,10 @@ class JobExportResource(MethodResource):
     def get(self, job_id):
         prediction_ids = request.args.getlist("prediction_ids[]")
         try:
+            # The designs are loaded from their own table below.
             job = (
-                DesignJob.query.filter(DesignJob.id == job_id)
+                DesignJob.query.options(defer(DesignJob.result))
+                .filter(DesignJob.id == job_id)
                 .filter(
                     DesignJob.project_id.in_(g.jwt_claims["prj"])
                     | DesignJob.project_id.is_(None)
@@ -223,27 +420,65 @@ class JobExportResource(MethodResource):
             return f"Cannot find any design job with id {job_id}.", 404
         if not job.is_complete():
             return f"Job {job_id} is still in progress.", 400
-        predictions = []
-        for prediction_id in prediction_ids:
-            prediction = next(
-                (
-                    x
-                    for x in job.result["diff_fva"]
-                    + job.result["opt_gene"]
-                    + job.result["cofactor_swap"]
-                    if x["id"] == prediction_id
-                ),
-                None,
+        key = (job.id, tuple(prediction_ids))
+        archive = archive_cache.get(key)
+        if archive is not None:
+            return Response(
+                archive,
+                200,
+                mimetype="application/zip",
+                headers={"Content-Disposition": "attachment"},
+            )
+        rows = {
+            row.id: row
+            for row in db.session.query(
+                DesignPrediction.id,
+                DesignPrediction.method,
+                DesignPrediction.csv,
+                DesignPrediction.xlsx,
             )
-            if not prediction:
+            .filter(DesignPrediction.job_id == job.id)
+            .filter(DesignPrediction.id.in_(prediction_ids))
+        }
+        for prediction_id in prediction_ids:
+            if prediction_id not in rows:
                 return (
                     f"Cannot find any prediction with id {prediction_id} "
                     f"in job {job_id}.",
                     404,
                 )
-            predictions.append(prediction)
-        result = job.get_tabular_data(predictions)
-        response = make_response(result, 200)
-        response.headers["Content-Type"] = "application/zip"
-        response.headers["Content-Disposition"] = "attachment"
-        return response
+        # The worker stores the files of every prediction when the job
+        # completes. Only designs without them are needed to build them here.
+        artifacts = {
+            row.id: (row.csv, row.xlsx)
+            for row in rows.values()
+            if row.csv is not None and row.xlsx is not None
+        }
+        missing = [
+            prediction_id
+            for prediction_id in prediction_ids
+            if prediction_id not in artifacts
+        ]
+        designs = {}
+        if missing:
+            designs = dict(
+                db.session.query(
+                    DesignPrediction.id, DesignPrediction.design
+                ).filter(DesignPrediction.id.in_(missing))
+            )
+        predictions = [
+            designs.get(
+                prediction_id,
+                {"id": prediction_id, "method": rows[prediction_id].method},
+            )
+            for prediction_id in prediction_ids
+        ]
+        chunks = archive_cache.collect(
+            key, job.get_tabular_data(predictions, artifacts)
+        )
+        return Response(
+            stream_with_context(chunks),
+            200,
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment"},
+        )
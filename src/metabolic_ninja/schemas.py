@@ -15,7 +15,7 @@
 
 """Marshmallow schemas for marshalling the API endpoints."""
 
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 
 
 class StrictSchema(Schema):
@@ -36,6 +36,34 @@ class PredictionJobRequestSchema(StrictSchema):
     bigg = fields.Boolean(required=True)
     rhea = fields.Boolean(required=True)
     aerobic = fields.Boolean(required=True)
+    # The worker falls back to its configured solvers if this one is missing.
+    solver = fields.String(
+        missing=None, validate=validate.OneOf(["cplex", "gurobi", "glpk"])
+    )
+
+
+class PredictionJobListRequestSchema(StrictSchema):
+    class Meta:
+        datetimeformat = "iso"
+
+    status = fields.String(
+        missing=None,
+        validate=validate.OneOf(
+            ["PENDING", "STARTED", "SUCCESS", "FAILURE", "REVOKED"]
+        ),
+    )
+    project_id = fields.Integer(missing=None)
+    created_after = fields.DateTime(missing=None)
+    created_before = fields.DateTime(missing=None)
+    order = fields.String(
+        missing="desc", validate=validate.OneOf(["asc", "desc"])
+    )
+    cursor = fields.String(missing=None)
+    # Every listing is paginated, so that its cost does not grow with the
+    # number of jobs.
+    limit = fields.Integer(
+        missing=100, validate=validate.Range(min=1, max=1000)
+    )
 
 
 class PredictionJobSchema(StrictSchema):
@@ -59,3 +87,32 @@ class PredictionJobSchema(StrictSchema):
 
 class JobExportRequestSchema(StrictSchema):
     prediction_ids = fields.List(fields.String())
+
+
+class DesignListRequestSchema(StrictSchema):
+    method = fields.String(
+        missing=None,
+        validate=validate.OneOf(
+            [
+                "PathwayPredictor+DifferentialFVA",
+                "PathwayPredictor+OptGene",
+                "PathwayPredictor+CofactorSwap",
+            ]
+        ),
+    )
+    offset = fields.Integer(missing=0, validate=validate.Range(min=0))
+    limit = fields.Integer(
+        missing=None, validate=validate.Range(min=1, max=10000)
+    )
+
+
+class ProductSearchRequestSchema(StrictSchema):
+    query = fields.String(missing=None)
+    match = fields.String(
+        missing="prefix",
+        validate=validate.OneOf(["prefix", "substring", "fuzzy"]),
+    )
+    offset = fields.Integer(missing=0, validate=validate.Range(min=0))
+    limit = fields.Integer(
+        missing=None, validate=validate.Range(min=1, max=10000)
+    )
@@ -13,11 +13,158 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import logging
+import mmap
+import os
+import pickle
+import resource
+import tempfile
+
+import cameo
+import lazy_object_proxy
 from cameo.models import universal
 
 
+logger = logging.getLogger(__name__)
+
+# Building a universal model from its JSON definition takes a long time. Built
+# models are stored here in pickled form, so that this happens only once per
+# node if the directory is shared among the workers running on it. Since the
+# models are unpickled, the directory must only be accessible to the user
+# running the workers.
+UNIVERSAL_CACHE_DIR = os.environ.get(
+    "UNIVERSAL_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "metabolic-ninja",
+        "universal",
+    ),
+)
+
+
+def _is_private(status):
+    """Return whether a file is owned by us and not writable by others."""
+    return status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+
+def _read_cached(path):
+    """Return the model pickled in the file or None."""
+    try:
+        with open(path, "rb") as file_:
+            if not _is_private(os.fstat(file_.fileno())):
+                logger.warning(
+                    f"Ignoring cached model '{path}' that others can modify."
+                )
+                return None
+            # Unpickle straight from the page cache rather than reading the
+            # file into a buffer first. The unpickled objects are private to
+            # this process all the same; worker processes only share them if
+            # they are loaded before forking, see `preload`.
+            with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return pickle.loads(data)
+    except FileNotFoundError:
+        return None
+    except (
+        pickle.UnpicklingError,
+        EOFError,
+        AttributeError,
+        ValueError,
+    ) as error:
+        # For example, a model pickled by an older version of cobra.
+        logger.warning(
+            f"Ignoring unreadable cached model '{path}'.", exc_info=error
+        )
+        return None
+
+
+def _write_cached(path, model):
+    """Pickle the model to the file."""
+    # Write to a temporary file first, so that concurrently starting workers
+    # never read a partially written model.
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(file_descriptor, "wb") as file_:
+            pickle.dump(model, file_, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _cache_is_private():
+    """Create the cache directory and return whether only we can access it."""
+    try:
+        os.makedirs(UNIVERSAL_CACHE_DIR, mode=0o700, exist_ok=True)
+        status = os.stat(UNIVERSAL_CACHE_DIR)
+    except OSError as error:
+        logger.warning(
+            f"Unable to use the universal model cache "
+            f"'{UNIVERSAL_CACHE_DIR}'.",
+            exc_info=error,
+        )
+        return False
+    if not _is_private(status) or status.st_mode & 0o077:
+        logger.warning(
+            f"Not using the universal model cache '{UNIVERSAL_CACHE_DIR}', "
+            f"which is accessible to others."
+        )
+        return False
+    return True
+
+
+def load_universal_model(name):
+    """
+    Load the named universal model, preferably from the cache.
+
+    The cache is only used if its directory is owned by us and inaccessible to
+    anyone else.
+    """
+    if not _cache_is_private():
+        return getattr(universal, name).__wrapped__
+    path = os.path.join(
+        UNIVERSAL_CACHE_DIR, f"{name}-cameo-{cameo.__version__}.pickle"
+    )
+    model = _read_cached(path)
+    if model is not None:
+        logger.debug(f"Loaded universal model {name} from '{path}'")
+        return model
+    model = getattr(universal, name).__wrapped__
+    try:
+        _write_cached(path, model)
+    except OSError as error:
+        logger.warning(
+            f"Unable to cache universal model {name} in '{path}'.",
+            exc_info=error,
+        )
+    return model
+
+
 UNIVERSAL_SOURCES = {
-    (True, False): universal.metanetx_universal_model_bigg,
-    (True, True): universal.metanetx_universal_model_bigg_rhea,
-    (False, True): universal.metanetx_universal_model_rhea,
+    (True, False): lazy_object_proxy.Proxy(
+        functools.partial(load_universal_model, "metanetx_universal_model_bigg")
+    ),
+    (True, True): lazy_object_proxy.Proxy(
+        functools.partial(
+            load_universal_model, "metanetx_universal_model_bigg_rhea"
+        )
+    ),
+    (False, True): lazy_object_proxy.Proxy(
+        functools.partial(load_universal_model, "metanetx_universal_model_rhea")
+    ),
 }
+
+
+def preload():
+    """
+    Load all universal models.
+
+    The models are otherwise loaded lazily on first access, that is, once in
+    every process that needs them. Loaded before forking, they are shared
+    copy-on-write by all child processes.
+    """
+    for model in UNIVERSAL_SOURCES.values():
+        logger.info(f"Loaded universal model {model.id}")
+    # `ru_maxrss` is given in KiB on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(f"Peak memory after loading universal models: {peak:.0f} MiB")
@@ -0,0 +1,228 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache the results of design jobs and pathway predictions."""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+from uuid import uuid4
+
+import cameo
+import cobra
+from sqlalchemy import and_, not_, or_
+
+from ..models import DesignResultCache, PathwayCache, tz_aware_now
+from .data import db_session
+from .helpers import pathway_from_dict, pathway_to_dict
+
+
+__all__ = (
+    "load_cached_result",
+    "store_result",
+    "load_cached_pathways",
+    "store_pathways",
+)
+
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of cached results. The least recently used ones are
+# evicted first. Zero disables the cache.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 1000))
+# The maximum number of cached pathway predictions. Zero disables the cache.
+PATHWAY_CACHE_SIZE = int(os.environ.get("PATHWAY_CACHE_SIZE", 1000))
+# Increment whenever the design workflow changes in a way that changes
+# results, in order to invalidate all cached results.
+WORKFLOW_VERSION = 2
+# The universal models are distributed with cameo, so its version covers them.
+CACHE_VERSION = (
+    f"workflow={WORKFLOW_VERSION};cameo={cameo.__version__};"
+    f"cobra={cobra.__version__}"
+)
+
+
+def result_cache_key(job):
+    """Return the canonical hash of the inputs of a design job."""
+    inputs = {
+        "version": CACHE_VERSION,
+        "model": job.model_hash,
+        "biomass_reaction_id": job.biomass_reaction_id,
+        "product_name": job.product_name,
+        "max_predictions": job.max_predictions,
+        "aerobic": job.aerobic,
+        "bigg": job.bigg,
+        "rhea": job.rhea,
+        "solver": job.solver,
+    }
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_cached_result(job):
+    """
+    Return a copy of the cached result of an identical job if there is any.
+
+    Every prediction in the copy receives a new identifier.
+    """
+    if RESULT_CACHE_SIZE <= 0 or job.model_hash is None:
+        return None
+    key = result_cache_key(job)
+    with db_session() as session:
+        entry = session.query(DesignResultCache).get(key)
+        if entry is None:
+            return None
+        logger.info(f"Found cached result {key} for job {job.job_id}")
+        entry.last_used = tz_aware_now()
+        result = copy.deepcopy(entry.result)
+        session.commit()
+    for method in ("diff_fva", "opt_gene", "cofactor_swap"):
+        for prediction in result[method]:
+            prediction["id"] = str(uuid4())
+    return result
+
+
+def store_result(job, result):
+    """Cache the result of a job and evict the least recently used results."""
+    if RESULT_CACHE_SIZE <= 0 or job.model_hash is None:
+        return
+    key = result_cache_key(job)
+    with db_session() as session:
+        session.merge(
+            DesignResultCache(
+                key=key,
+                version=CACHE_VERSION,
+                result=result,
+                last_used=tz_aware_now(),
+            )
+        )
+        # Results produced by other versions will never be used again.
+        session.query(DesignResultCache).filter(
+            DesignResultCache.version != CACHE_VERSION
+        ).delete(synchronize_session=False)
+        evicted = (
+            session.query(DesignResultCache.key)
+            .order_by(DesignResultCache.last_used.desc())
+            .offset(RESULT_CACHE_SIZE)
+        )
+        session.query(DesignResultCache).filter(
+            DesignResultCache.key.in_(evicted)
+        ).delete(synchronize_session=False)
+        session.commit()
+
+
+def _pathway_query(session, job, product):
+    return session.query(PathwayCache).filter(
+        PathwayCache.version == CACHE_VERSION,
+        PathwayCache.model_hash == job.model_hash,
+        PathwayCache.product_id == product.id,
+        PathwayCache.aerobic == job.aerobic,
+        PathwayCache.bigg == job.bigg,
+        PathwayCache.rhea == job.rhea,
+    )
+
+
+def _complete_prediction():
+    # A prediction that stopped short of its number of pathways without timing
+    # out found all there are.
+    return and_(
+        not_(PathwayCache.timed_out),
+        PathwayCache.pathway_count < PathwayCache.max_predictions,
+    )
+
+
+def load_cached_pathways(job, product):
+    """
+    Return previously predicted pathways for the job's model and product.
+
+    Pathways are predicted in order of increasing size, so the first ones of a
+    larger prediction are the same as those of a smaller one. A prediction
+    that found fewer pathways than it was asked for without timing out found
+    all there are and serves any job. One that timed out only serves jobs
+    asking for at most as many pathways as it found.
+
+    Returns
+    -------
+    list or None
+        The pathways or None if there are no suitable cached ones.
+
+    """
+    if PATHWAY_CACHE_SIZE <= 0 or job.model_hash is None:
+        return None
+    with db_session() as session:
+        entry = (
+            _pathway_query(session, job, product)
+            .filter(
+                or_(
+                    PathwayCache.pathway_count >= job.max_predictions,
+                    _complete_prediction(),
+                )
+            )
+            .order_by(PathwayCache.pathway_count)
+            .first()
+        )
+        if entry is None:
+            return None
+        logger.info(
+            f"Found {len(entry.pathways)} cached pathways for product "
+            f"{product.id} for job {job.job_id}"
+        )
+        entry.last_used = tz_aware_now()
+        pathways = entry.pathways[: job.max_predictions]
+        session.commit()
+    return [pathway_from_dict(pathway) for pathway in pathways]
+
+
+def store_pathways(job, product, pathways, timed_out):
+    """Cache predicted pathways and evict the least recently used ones."""
+    if PATHWAY_CACHE_SIZE <= 0 or job.model_hash is None:
+        return
+    with db_session() as session:
+        # A prediction of this many pathways supersedes smaller ones unless
+        # they are complete and it is not.
+        superseded = _pathway_query(session, job, product).filter(
+            PathwayCache.pathway_count <= len(pathways)
+        )
+        if timed_out or len(pathways) >= job.max_predictions:
+            superseded = superseded.filter(not_(_complete_prediction()))
+        superseded.delete(synchronize_session=False)
+        session.add(
+            PathwayCache(
+                version=CACHE_VERSION,
+                model_hash=job.model_hash,
+                aerobic=job.aerobic,
+                bigg=job.bigg,
+                rhea=job.rhea,
+                product_id=product.id,
+                max_predictions=job.max_predictions,
+                pathway_count=len(pathways),
+                timed_out=timed_out,
+                pathways=[pathway_to_dict(pathway) for pathway in pathways],
+            )
+        )
+        session.query(PathwayCache).filter(
+            PathwayCache.version != CACHE_VERSION
+        ).delete(synchronize_session=False)
+        evicted = (
+            session.query(PathwayCache.id)
+            .order_by(PathwayCache.last_used.desc())
+            .offset(PATHWAY_CACHE_SIZE)
+        )
+        session.query(PathwayCache).filter(PathwayCache.id.in_(evicted)).delete(
+            synchronize_session=False
+        )
+        session.commit()
@@ -0,0 +1,123 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persist the results of completed workflow stages of a design job."""
+
+import logging
+import pickle
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import DesignCheckpoint, tz_aware_now
+from .data import db_session
+
+
+__all__ = ("Checkpoints",)
+
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoints:
+    """
+    Store the results of completed stages of one design job in the database.
+
+    A message is only acknowledged once its job is done. If the worker is
+    interrupted, the message is delivered again and the job can continue from
+    the stored stages instead of starting over. Stages are accessed like a
+    mapping from stage name to result.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def _query(self, session):
+        return session.query(DesignCheckpoint).filter(
+            DesignCheckpoint.job_id == self.job_id
+        )
+
+    def __contains__(self, stage):
+        with db_session() as session:
+            return (
+                self._query(session)
+                .filter(DesignCheckpoint.stage == stage)
+                .count()
+                > 0
+            )
+
+    def __getitem__(self, stage):
+        with db_session() as session:
+            checkpoint = (
+                self._query(session)
+                .filter(DesignCheckpoint.stage == stage)
+                .one_or_none()
+            )
+            if checkpoint is None:
+                raise KeyError(stage)
+            data = checkpoint.data
+        return pickle.loads(data)
+
+    def __setitem__(self, stage, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = tz_aware_now()
+        with db_session() as session:
+            session.execute(
+                insert(DesignCheckpoint)
+                .values(job_id=self.job_id, stage=stage, data=data, updated=now)
+                .on_conflict_do_update(
+                    index_elements=["job_id", "stage"],
+                    set_={"data": data, "updated": now},
+                )
+            )
+            session.commit()
+
+    def get(self, stage, default=None):
+        try:
+            return self[stage]
+        except KeyError:
+            return default
+        except (pickle.UnpicklingError, EOFError, AttributeError) as error:
+            # For example, a checkpoint written by an older version.
+            logger.warning(
+                f"Ignoring unreadable checkpoint '{stage}'.", exc_info=error
+            )
+            return default
+
+    def clear(self):
+        """Remove all checkpoints of the job."""
+        with db_session() as session:
+            self._query(session).delete(synchronize_session=False)
+            session.commit()
+
+    @staticmethod
+    def prune(max_age):
+        """Remove the checkpoints of jobs untouched for ``max_age`` seconds."""
+        threshold = tz_aware_now() - timedelta(seconds=max_age)
+        with db_session() as session:
+            stale_jobs = [
+                job_id
+                for job_id, in session.query(DesignCheckpoint.job_id)
+                .group_by(DesignCheckpoint.job_id)
+                .having(func.max(DesignCheckpoint.updated) < threshold)
+            ]
+            if not stale_jobs:
+                return
+            logger.info(f"Removing stale checkpoints of jobs {stale_jobs}")
+            session.query(DesignCheckpoint).filter(
+                DesignCheckpoint.job_id.in_(stale_jobs)
+            ).delete(synchronize_session=False)
+            session.commit()
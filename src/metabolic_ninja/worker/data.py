@@ -13,16 +13,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
 import logging
 import os
 from contextlib import contextmanager
 
 import cobra.io
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
 
-from ..models import DesignJob
+from ..catalog import add_definitions
+from ..models import DesignJob, DesignPrediction, tz_aware_now
 from ..universal import UNIVERSAL_SOURCES
+from .model_cache import model_cache
+from .solver import select_solver
 
 
 logger = logging.getLogger(__name__)
@@ -43,6 +49,66 @@ def db_session():
         session.close()
 
 
+def hash_model(model_serialized):
+    """Return a hash of the content of a serialized model."""
+    canonical = json.dumps(
+        model_serialized, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_model(model_serialized, model_hash, solver):
+    """
+    Return the model with its solver set up, reusing a previous deserialization.
+
+    Parameters
+    ----------
+    model_serialized : dict
+        The model in cobrapy's dictionary format.
+    model_hash : str
+        The hash of the serialized model, see `hash_model`.
+    solver : str
+        The name of the solver to use.
+
+    """
+    key = (model_hash, solver)
+    model = model_cache.get(key)
+    if model is not None:
+        logger.debug(f"Using cached model {model_hash}")
+        return model
+    model = cobra.io.model_from_dict(model_serialized)
+    model.solver = solver
+    model_cache.put(key, model)
+    return model
+
+
+def add_predictions(session, job_id, designs):
+    """
+    Store the designs of a job as individual rows.
+
+    Designs that are stored already, for example, because an interrupted job
+    resumed from its checkpoints, are skipped. The caller commits the session.
+    """
+    if not designs:
+        return
+    session.execute(
+        insert(DesignPrediction)
+        .values(
+            [
+                {
+                    "id": design["id"],
+                    "job_id": job_id,
+                    "method": design["method"],
+                    "fitness": design["fitness"],
+                    "design": design,
+                }
+                for design in designs
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+
+
 class Job:
     def __init__(
         self,
@@ -58,13 +124,15 @@ class Job:
         organism_name,
         user_name,
         user_email,
+        model_hash=None,
+        solver=None,
     ):
-        # Configure the model object for cameo.
+        # Configure the model object for cameo. The model is expected to use
+        # the given solver already, see `load_model`.
         self.model = model
         # FIXME (Moritz Beber): We should allow users to specify a medium that
         #  they previously
         # uploaded.
-        self.model.solver = "cplex"
         # FIXME (Moritz Beber): This uses BiGG notation to change the lower
         #  bound of the exchange reaction. Should instead find this using a
         #  combination of metabolites in the `model.exchanges`, MetaNetX
@@ -90,6 +158,12 @@ class Job:
         self.organism_name = organism_name
         self.user_name = user_name
         self.user_email = user_email
+        self.biomass_reaction_id = biomass_reaction_id
+        self.model_hash = model_hash
+        self.solver = solver
+        # The time (as given by `time.time`) by which long-running searches
+        # should end, if any.
+        self.deadline = None
 
     def __repr__(self):
         return (
@@ -97,6 +171,17 @@ class Job:
             f"Looking for {self.product_name} in {self.model}>"
         )
 
+    def __getstate__(self):
+        # The universal model is loaded in every worker process already; don't
+        # send it along with the job.
+        state = self.__dict__.copy()
+        del state["source"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.source = UNIVERSAL_SOURCES[(self.bigg, self.rhea)]
+
     def save(self, **kwargs):
         logger.debug(f"Updating database status of job {self.job_id}")
         with db_session() as session:
@@ -106,11 +191,120 @@ class Job:
             session.add(job)
             session.commit()
 
+    def save_predictions(self, designs):
+        """Store the designs of the job as individual rows."""
+        with db_session() as session:
+            add_predictions(session, self.job_id, designs)
+            session.commit()
+
+    def save_artifacts(self, predictions):
+        """
+        Store the export files of the job's predictions.
+
+        Exports of the job then only assemble these files, see
+        `DesignJob.get_tabular_data`.
+        """
+        if not predictions:
+            return
+        logger.debug(
+            f"Storing export files of {len(predictions)} predictions of job "
+            f"{self.job_id}"
+        )
+        artifacts = []
+        for prediction in predictions:
+            csv, xlsx = DesignJob.get_artifacts(prediction)
+            artifacts.append(
+                {"_id": prediction["id"], "_csv": csv, "_xlsx": xlsx}
+            )
+        table = DesignPrediction.__table__
+        with db_session() as session:
+            session.execute(
+                table.update()
+                .where(table.c.id == bindparam("_id"))
+                .values(csv=bindparam("_csv"), xlsx=bindparam("_xlsx")),
+                artifacts,
+            )
+            session.commit()
+
+    def append_results(self, key, designs, reactions, metabolites, progress):
+        """
+        Add the results of a finished design unit to the stored job result.
+
+        Instead of rewriting the whole result from here, the new designs are
+        appended to the list ``key`` and the references to definitions are
+        merged by PostgreSQL, so that the cost of saving does not grow with the
+        number of results stored so far. The definitions themselves are added
+        to the catalog shared by all jobs and the designs are stored as rows,
+        too.
+
+        Parameters
+        ----------
+        key : str
+            The result list of the design method, e.g., ``"diff_fva"``.
+        designs : list
+            The new result rows.
+        reactions : dict
+            Reaction definitions referred to by the designs.
+        metabolites : dict
+            Metabolite definitions referred to by the designs.
+        progress : dict
+            The current progress counters of the job.
+
+        Returns
+        -------
+        tuple
+            The references to the reaction and the metabolite definitions by
+            identifier as stored in the result.
+
+        """
+        logger.debug(
+            f"Appending {len(designs)} {key} results to job {self.job_id}"
+        )
+        with db_session() as session:
+            reactions = add_definitions(session, reactions)
+            metabolites = add_definitions(session, metabolites)
+            add_predictions(session, self.job_id, designs)
+            session.execute(
+                text(
+                    """
+                    UPDATE design_job
+                    SET updated = :updated,
+                        result = result || jsonb_build_object(
+                            CAST(:key AS text),
+                            COALESCE(result -> CAST(:key AS text), '[]')
+                                || CAST(:designs AS jsonb),
+                            'reactions',
+                            COALESCE(result -> 'reactions', '{}')
+                                || CAST(:reactions AS jsonb),
+                            'metabolites',
+                            COALESCE(result -> 'metabolites', '{}')
+                                || CAST(:metabolites AS jsonb),
+                            'progress',
+                            CAST(:progress AS jsonb)
+                        )
+                    WHERE id = :id
+                    """
+                ),
+                {
+                    "id": self.job_id,
+                    "updated": tz_aware_now(),
+                    "key": key,
+                    "designs": json.dumps(designs),
+                    "reactions": json.dumps(reactions),
+                    "metabolites": json.dumps(metabolites),
+                    "progress": json.dumps(progress),
+                },
+            )
+            session.commit()
+        return reactions, metabolites
+
     @staticmethod
     def deserialize(params):
         logger.debug("Deserializing job parameters")
+        model_hash = hash_model(params["model"]["model_serialized"])
+        solver = select_solver(params.get("solver"))
         return Job(
-            cobra.io.model_from_dict(params["model"]["model_serialized"]),
+            load_model(params["model"]["model_serialized"], model_hash, solver),
             params["model"]["default_biomass_reaction"],
             params["product_name"],
             params["max_predictions"],
@@ -122,4 +316,6 @@ class Job:
             params["organism_name"],
             params["user_name"],
             params["user_email"],
+            model_hash,
+            solver,
         )
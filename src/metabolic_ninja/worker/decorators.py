@@ -14,16 +14,37 @@
 # limitations under the License.
 
 import functools
+import gc
 import logging
+import mmap
 import multiprocessing
 import os
+import pickle
+import queue
+import resource
 import sys
+import tempfile
+import threading
+from collections import OrderedDict
 
 import sentry_sdk
 
 
 logger = logging.getLogger(__name__)
 
+# Task functions by qualified name. Only the name is sent to the worker pool,
+# since the decorated functions themselves cannot be pickled.
+_registry = {}
+# Return values that are larger than this when pickled are passed through a
+# temporary file rather than the pipe.
+PIPE_LIMIT = 16 * 2 ** 20  # bytes
+# Prefer a memory-backed file system for temporary files if there is one.
+PAYLOAD_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+PAYLOAD_PREFIX = "metabolic-ninja-payload-"
+# The worker pool used to execute tasks, see `start_worker_pool`. When no pool
+# has been started, every task is run in a newly forked child process.
+_pool = None
+
 
 class TaskFailedException(Exception):
     """Thrown if a task throws an unhandled exception."""
@@ -35,17 +56,166 @@ def task(function):
     """
     Execute the given function in a child process.
 
-    Use this as a decorator on a function to make sure it's called in a forked
-    process. The return value of the process will be passed through a pipe, and
-    so is subject to the same restrictions[1], namely, the object must be
-    pickleable and not too large (approximately 32 MiB+).
+    Use this as a decorator on a function to make sure it's called in a
+    separate process. If a worker pool was started (see `start_worker_pool`),
+    the function is executed by one of its warm processes. Otherwise, a new
+    process is forked for the call. The return value must be pickleable. Small
+    values are passed back through a pipe, larger ones through a temporary,
+    memory-mapped file (see `Payload`), so there is no limit on their size.
+    Tasks should nevertheless return compact objects, since pickling large
+    object graphs is slow.
+
+    If the child process throws an exception, it will be logged, reported to
+    Sentry, the database status will be updated and `TaskFailedException` will
+    be raised.
+    """
+    name = f"{function.__module__}.{function.__qualname__}"
+    _registry[name] = function
+
+    @functools.wraps(function)
+    def wrapper(job, *args, **kwargs):
+        if _pool is not None:
+            return _pool.run(name, job, args, kwargs)
+        return _fork(function, job, args, kwargs)
 
-    If the child process throws an exception, it will be logged, reported to Sentry, the
-    database status will be updated and `TaskFailedException` will be raised.
+    return wrapper
+
+
+class Payload:
+    """
+    Carry a pickled return value from a child process to its parent.
 
-    [1] https://docs.python.org/3/library/multiprocessing.html#multiprocessing.connection.Connection.send  # noqa
+    Values up to `PIPE_LIMIT` bytes travel with the payload itself. Larger
+    values are written to a temporary file which the parent maps into memory,
+    unpickles and removes. The file is placed in `PAYLOAD_DIR` or, if that is
+    full, in the temporary directory. The name of the file contains the
+    process ID and the start time of the parent, such that `prune` can remove
+    the files that a parent did not live to remove. The start time tells a
+    restarted worker from its predecessor with the same process ID, as is
+    usually the case for process 1 of a container.
     """
 
+    __slots__ = ("data", "path")
+
+    def __init__(self, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) <= PIPE_LIMIT:
+            self.data = data
+            self.path = None
+            return
+        self.data = None
+        self.path = None
+        if PAYLOAD_DIR is not None:
+            try:
+                self._write(data, PAYLOAD_DIR)
+                return
+            except OSError as error:
+                # For example, shared memory is limited to 64 MiB in Docker
+                # containers by default.
+                logger.warning(
+                    f"Unable to write a payload of {len(data)} bytes to "
+                    f"'{PAYLOAD_DIR}'; using the temporary directory instead.",
+                    exc_info=error,
+                )
+        self._write(data, None)
+
+    def _write(self, data, directory):
+        """Write the pickled value to a new file in the directory."""
+        parent = os.getppid()
+        file_descriptor, self.path = tempfile.mkstemp(
+            prefix=f"{PAYLOAD_PREFIX}{parent}-{_start_time(parent)}-",
+            dir=directory,
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file_:
+                file_.write(data)
+        except BaseException:
+            self.discard()
+            raise
+
+    def __getstate__(self):
+        return self.data, self.path
+
+    def __setstate__(self, state):
+        self.data, self.path = state
+
+    def load(self):
+        """Return the value and release any temporary file."""
+        if self.path is None:
+            return pickle.loads(self.data)
+        try:
+            with open(self.path, "rb") as file_:
+                with mmap.mmap(
+                    file_.fileno(), 0, access=mmap.ACCESS_READ
+                ) as buffer:
+                    return pickle.loads(buffer)
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Release any temporary file without loading the value."""
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    @staticmethod
+    def prune(directory=PAYLOAD_DIR):
+        """Remove the files of payloads whose parent process is gone."""
+        if directory is None:
+            directory = tempfile.gettempdir()
+        for entry in os.scandir(directory):
+            if not entry.name.startswith(PAYLOAD_PREFIX):
+                continue
+            try:
+                pid, start_time, _ = entry.name[len(PAYLOAD_PREFIX) :].split(
+                    "-", 2
+                )
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                pass
+            except (ValueError, PermissionError):
+                # Not one of ours or the process belongs to another user.
+                continue
+            else:
+                if start_time == _start_time(int(pid)):
+                    continue
+                # The process ID has been reused by another process.
+            logger.debug(f"Removing orphaned payload '{entry.path}'")
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _start_time(pid):
+    """Return the start time of the process as a string."""
+    # The start time in clock ticks after boot is the 22nd field. The second
+    # field is the command name in parentheses, which may contain anything.
+    try:
+        with open(f"/proc/{pid}/stat") as file_:
+            return file_.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        # Not on Linux. Process IDs are not told apart then.
+        return "0"
+
+
+def _report_failure(job, exception):
+    """Record a failed task in the database, the logs and Sentry."""
+    # Update the job status.
+    job.save(status="FAILURE")
+    logger.exception(exception)
+    sentry_sdk.capture_exception(exception)
+    # Wait for the sentry event to be sent; otherwise we might exit the process
+    # too soon.
+    sentry_sdk.flush()
+
+
+def _fork(function, job, args, kwargs):
+    """Call the function in a newly forked process and return its result."""
+
     def runner(pipe, job, *args, **kwargs):
         # This is the function called in a new process.
         # Sentry needs to be initialized here (in addition to the main process).
@@ -53,39 +223,281 @@ def task(function):
         # Call the wrapped function with the given arguments and pass the
         # return value back through a pipe.
         try:
-            retval = function(job, *args, **kwargs)
+            payload = Payload(function(job, *args, **kwargs))
         except Exception as exception:
             # Send a null value to stop the main process from blocking on
             # receiving.
             pipe.send(None)
-            # Update the job status.
-            job.save(status="FAILURE")
-            logger.exception(exception)
-            sentry_sdk.capture_exception(exception)
-            # Wait for the sentry event to be sent; otherwise we'd exit the
-            # process too soon.
-            sentry_sdk.flush()
+            _report_failure(job, exception)
             sys.exit(-1)
         else:
-            pipe.send(retval)
+            pipe.send(payload)
 
-    @functools.wraps(function)
-    def wrapper(*args, **kwargs):
-        # Create a one-way pipe to pass the return value of the wrapped
-        # function.
-        logger.debug(f"Spawning new process for function: {function}")
-        pipe_in, pipe_out = multiprocessing.Pipe(duplex=False)
-        process = multiprocessing.Process(
-            target=runner, args=(pipe_out,) + args, kwargs=kwargs
+    # Create a one-way pipe to pass the return value of the wrapped function.
+    logger.debug(f"Spawning new process for function: {function}")
+    pipe_in, pipe_out = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=runner, args=(pipe_out, job) + args, kwargs=kwargs
+    )
+    process.start()
+    # Only the child writes to the pipe. Without our copy of its end, receiving
+    # fails instead of blocking forever if the child dies without sending.
+    pipe_out.close()
+    # Hang on receiving data before joining the process. The other way around
+    # seems to end up in a deadlock in some cases.
+    try:
+        payload = pipe_in.recv()
+    except EOFError as error:
+        logger.error(
+            f"Process {process.pid} died while running {function}.",
+            exc_info=error,
         )
-        process.start()
-        # Hang on receiving data before joining the process. The other way
-        # around seems to end up in a deadlock in some cases.
-        retval = pipe_in.recv()
-        process.join()
-        if process.exitcode != 0:
+        job.save(status="FAILURE")
+        sentry_sdk.capture_exception(error)
+        payload = None
+    process.join()
+    pipe_in.close()
+    if process.exitcode != 0 or payload is None:
+        if payload is not None:
+            payload.discard()
+        raise TaskFailedException()
+    # Return the piped data back to the caller.
+    return payload.load()
+
+
+def start_worker_pool(processes, max_tasks=None, max_memory=None):
+    """
+    Start the pool of warm worker processes that execute all tasks.
+
+    The processes are forked from the current one, so everything that is
+    imported and loaded at this point is available to every task without any
+    further cost. Call this after all task functions have been defined.
+
+    Parameters
+    ----------
+    processes : int
+        The number of worker processes.
+    max_tasks : int, optional
+        Replace a worker process after it has completed that many tasks.
+    max_memory : int, optional
+        Replace a worker process once its peak resident set size exceeds that
+        many MiB.
+
+    """
+    global _pool
+    if _pool is not None:
+        raise RuntimeError("The worker pool is already running.")
+    # Exclude everything loaded so far from garbage collection. Otherwise, the
+    # collector in the worker processes touches every object and thereby copies
+    # the memory pages that they share with this process. `gc.freeze` only
+    # exists on Python 3.7+; on older versions, the pages are shared until the
+    # collector runs in a worker process.
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    # Return values of tasks that a previous worker did not receive anymore.
+    Payload.prune()
+    if PAYLOAD_DIR is not None:
+        # Payloads that did not fit into shared memory.
+        Payload.prune(tempfile.gettempdir())
+    _pool = WorkerPool(processes, max_tasks, max_memory)
+
+
+def stop_worker_pool():
+    """Shut down the worker pool, waiting for running tasks to finish."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+def _peak_memory():
+    """Return the peak resident set size of this process in MiB."""
+    # `ru_maxrss` is given in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _private_memory():
+    """Return the memory of this process not shared with any other in MiB."""
+    # Pages inherited from the parent count as shared until they are written.
+    try:
+        with open("/proc/self/smaps_rollup") as file_:
+            return (
+                sum(
+                    int(line.split()[1])
+                    for line in file_
+                    if line.startswith(("Private_Clean:", "Private_Dirty:"))
+                )
+                / 1024
+            )
+    except OSError:
+        # Not on Linux or the kernel is older than 4.14.
+        return float("nan")
+
+
+def _serve(connection, parent_connection, max_tasks, max_memory):
+    """Execute tasks received through the connection until told to stop."""
+    # This end of the pipe belongs to the parent process only. Holding on to
+    # it would prevent us from noticing that the parent went away.
+    parent_connection.close()
+    parent_pid = os.getppid()
+    # Sentry needs to be initialized here (in addition to the main process).
+    sentry_sdk.init(dsn=os.environ.get("SENTRY_DSN"))
+    # Jobs are sent to a worker only once and are then referred to by their ID.
+    # Keep a few of them around since several jobs may be processed at the same
+    # time.
+    jobs = OrderedDict()
+    completed = 0
+    logger.debug(
+        f"Worker process {os.getpid()} started "
+        f"(private memory {_private_memory():.0f} MiB)"
+    )
+    while True:
+        # Periodically check that the parent is still alive, since inherited
+        # pipe ends of sibling processes may keep the connection open.
+        if not connection.poll(10):
+            if os.getppid() != parent_pid:
+                break
+            continue
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        name, job_id, deadline, args, kwargs = message
+        if job_id not in jobs:
+            connection.send(("job", None, False))
+            jobs[job_id] = connection.recv()
+            while len(jobs) > 4:
+                jobs.popitem(last=False)
+        jobs.move_to_end(job_id)
+        job = jobs[job_id]
+        # A job that is delivered again, for example, after the worker was
+        # interrupted, has a new deadline but may still be kept here.
+        job.deadline = deadline
+        try:
+            # The model is shared by all tasks of the job. Run every task
+            # within a model context such that its modifications are reverted.
+            with job.model:
+                retval = _registry[name](job, *args, **kwargs)
+            payload = Payload(retval)
+        except Exception as exception:
+            _report_failure(job, exception)
+            # The state of the process is unknown after a failure, so retire it.
+            connection.send(("error", None, True))
+            break
+        completed += 1
+        retire = (max_tasks is not None and completed >= max_tasks) or (
+            max_memory is not None and _peak_memory() > max_memory
+        )
+        connection.send(("result", payload, retire))
+        if retire:
+            break
+    logger.debug(
+        f"Worker process {os.getpid()} exiting after {completed} tasks "
+        f"(peak memory {_peak_memory():.0f} MiB, private memory "
+        f"{_private_memory():.0f} MiB)"
+    )
+    connection.close()
+
+
+class _Worker:
+    """The parent side of a worker process."""
+
+    def __init__(self, max_tasks, max_memory):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(child_connection, self.connection, max_tasks, max_memory),
+        )
+        self.process.start()
+        # Only the child writes to this end.
+        child_connection.close()
+
+    def run(self, name, job, args, kwargs):
+        """Execute a task and return its status, result and retirement flag."""
+        self.connection.send((name, job.job_id, job.deadline, args, kwargs))
+        status, retval, retire = self.connection.recv()
+        if status == "job":
+            self.connection.send(job)
+            status, retval, retire = self.connection.recv()
+        return status, retval, retire
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join()
+        self.connection.close()
+
+
+class WorkerPool:
+    """
+    Execute tasks in a fixed number of long-lived worker processes.
+
+    Forking a process for every task means paying for its start-up (Sentry
+    initialization, loading universal models, ...) again and again. Instead,
+    the processes of this pool are forked once and then wait for tasks. A
+    worker process is replaced after a task failed, after it has completed
+    ``max_tasks`` tasks or when its peak memory exceeds ``max_memory`` MiB.
+
+    The pool is meant to be shared by all threads of the worker and `run` may
+    be called concurrently; it blocks until a worker process is available.
+    """
+
+    def __init__(self, processes, max_tasks=None, max_memory=None):
+        self._max_tasks = max_tasks
+        self._max_memory = max_memory
+        # Forking must not happen while another thread is in the middle of
+        # setting up a worker, or the new process would inherit its pipe.
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = set()
+        logger.info(f"Starting a pool of {processes} worker processes")
+        for _ in range(processes):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        with self._lock:
+            worker = _Worker(self._max_tasks, self._max_memory)
+            self._workers.add(worker)
+        logger.debug(f"Started worker process {worker.process.pid}")
+        return worker
+
+    def _retire(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop()
+
+    def run(self, name, job, args, kwargs):
+        """Execute a task on the next idle worker process."""
+        worker = self._idle.get()
+        logger.debug(f"Running {name} in worker process {worker.process.pid}")
+        try:
+            status, retval, retire = worker.run(name, job, args, kwargs)
+        except (EOFError, OSError) as error:
+            # The worker process died without reporting back, for example,
+            # because it was killed for using too much memory.
+            logger.error(
+                f"Worker process {worker.process.pid} died while running "
+                f"{name}.",
+                exc_info=error,
+            )
+            job.save(status="FAILURE")
+            sentry_sdk.capture_exception(error)
+            status, retval, retire = "error", None, True
+        if retire:
+            self._retire(worker)
+            worker = self._spawn()
+        self._idle.put(worker)
+        if status == "error":
             raise TaskFailedException()
-        # Return the piped data back to the caller.
-        return retval
+        return retval.load()
 
-    return wrapper
+    def close(self):
+        """Stop all worker processes once they are idle."""
+        with self._lock:
+            count = len(self._workers)
+        for _ in range(count):
+            self._retire(self._idle.get())
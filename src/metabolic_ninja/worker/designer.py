@@ -14,28 +14,67 @@
 # limitations under the License.
 
 import logging
+import time
+from contextlib import contextmanager
 from uuid import uuid4
+from weakref import WeakKeyDictionary
 
 import cameo.core.target
-from cameo.strain_design import DifferentialFVA, OptGene
+from cameo.core.utils import get_reaction_for
+from cameo.flux_analysis.simulation import fba
+from cameo.parallel import MultiprocessingView
+from cameo.strain_design import DifferentialFVA
+from cameo.strain_design.heuristic.evolutionary.archives import (
+    ProductionStrainArchive,
+)
 from cameo.strain_design.heuristic.evolutionary.objective_functions import (
-    biomass_product_coupled_min_yield,
+    biomass_product_coupled_yield,
     product_yield,
 )
+from cameo.strain_design.heuristic.evolutionary.optimization import (
+    GeneKnockoutOptimization,
+)
 from cameo.strain_design.heuristic.evolutionary_based import (
     CofactorSwapOptimization,
+    OptGeneResult,
 )
 from cobra.exceptions import OptimizationError
 from numpy import isnan
+from pandas import DataFrame, concat
 
-from .evaluate import evaluate_biomass_coupled_production, evaluate_production
-from .helpers import find_synthetic_reactions, manipulation_helper
+from .evaluate import StoichiometryChanges
+from .helpers import manipulation_helper
+from .pathway_context import PathwayContext
 
 
 logger = logging.getLogger(__name__)
 
+# The annotation of reactions by model, see `reaction_metadata`.
+_reaction_metadata = WeakKeyDictionary()
+METADATA_COLUMNS = ["name", "subsystem", "gpr", "definition_of_stoichiometry"]
+# The number of points on the surface of the phenotypic phase plane at which
+# the differential FVA compares flux ranges. Excluding the maxima, this
+# corresponds to three evenly spaced designs.
+DIFF_FVA_POINTS = 5
 
-def differential_fva_optimization(pathway, model):
+
+@contextmanager
+def pathway_applied(pathway, model):
+    """
+    Apply the pathway to the model within a context.
+
+    If the pathway is applied already, for example, because the caller wraps
+    both optimization and evaluation in this context, the model is left as is.
+    """
+    if pathway.product.id in model.reactions:
+        yield model
+        return
+    with model:
+        pathway.apply(model)
+        yield model
+
+
+def differential_fva_optimization(pathway, model, processes=1):
     """
     Compare FVA results on the production plane with maximum growth.
 
@@ -45,6 +84,12 @@ def differential_fva_optimization(pathway, model):
         A heterologous pathway identified by cameo.
     model : cobra.Model
         The model under investigation.
+    processes : int, optional
+        The number of processes among which the surface points are
+        distributed. Each process receives its own copy of the model and
+        solver and computes the complete FVA of the points it is given, so
+        there is no use for more processes than `DIFF_FVA_POINTS`. The
+        results are identical to those computed by a single process.
 
     Returns
     -------
@@ -53,19 +98,22 @@ def differential_fva_optimization(pathway, model):
         points on the surface of the phenotypic phase plane.
 
     """
-    with model:
-        pathway.apply(model)
+    with pathway_applied(pathway, model):
         predictor = DifferentialFVA(
             design_space_model=model,
             objective=pathway.product.id,
             variables=[model.biomass],
             normalize_ranges_by=model.biomass,
-            # Excluding the maxima, this corresponds to three evenly spaced
-            # designs.
-            points=5,
+            points=DIFF_FVA_POINTS,
         )
+        processes = min(processes, DIFF_FVA_POINTS)
         try:
-            designs = predictor.run(progress=False)
+            if processes > 1:
+                # The view's pool is shut down again on leaving the context.
+                with MultiprocessingView(processes=processes) as view:
+                    designs = predictor.run(progress=False, view=view)
+            else:
+                designs = predictor.run(progress=False)
         except ZeroDivisionError as error:
             logger.error(
                 "Encountered the following error in DiffFVA.", exc_info=error
@@ -74,36 +122,40 @@ def differential_fva_optimization(pathway, model):
     return designs
 
 
-def evaluate_diff_fva(designs, pathway, model, method):
-    """Evaluate the differential FVA designs."""
+def evaluate_diff_fva(designs, pathway, model, method, context=None):
+    """
+    Evaluate the differential FVA designs.
+
+    A `PathwayContext` built for the pathway and model may be passed in order
+    to share it with other steps.
+    """
     if designs is None:
         return []
     logger.info(
         f"Evaluating {len(designs) - 1} differential FVA surface points."
     )
     results = []
-    with model:
-        pathway.apply(model)
+    with pathway_applied(pathway, model):
+        if context is None:
+            context = PathwayContext(pathway, model)
+        evaluator = context.evaluator
         # The reference point is automatically ignored. Thus four of the
         # original five points remain. The first point in order represents
         # maximum production and zero growth. We ignore the point of lowest
         # production (the last one in order).
+        # All designs share the annotation of all targets, which is filled in
+        # once every target is known.
         reaction_targets = {}
-        for index, design_result in enumerate(list(designs)[:-1]):
-            table = designs.nth_panel(index)
+        targets = []
+        points = list(designs)[:-1]
+        for index, design_result in enumerate(points):
+            # Only the bounds changed by the design are reverted afterwards.
             with model:
                 design_result.apply(model)
-                with model:
-                    production, _, carbon_yield, _ = evaluate_production(
-                        model, pathway.product.id, model.carbon_source
-                    )
-                with model:
-                    growth, bpcy = evaluate_biomass_coupled_production(
-                        model,
-                        pathway.product.id,
-                        model.biomass,
-                        model.carbon_source,
-                    )
+                (
+                    (production, _, carbon_yield, _),
+                    (growth, bpcy),
+                ) = evaluator.evaluate()
             knockouts = {
                 r
                 for r in design_result.targets
@@ -113,19 +165,15 @@ def evaluate_diff_fva(designs, pathway, model, method):
                 manipulation_helper(t)
                 for t in set(design_result.targets).difference(knockouts)
             ]
-            reaction_targets.update(
-                get_target_data(model, table, manipulations, False)
-            )
-            reaction_targets.update(
-                get_target_data(model, table, list(knockouts), True)
-            )
+            targets.extend((index, t["id"], False) for t in manipulations)
+            targets.extend((index, t.id, True) for t in knockouts)
             results.append(
                 {
                     "id": str(uuid4()),
                     "knockouts": list(knockouts),
                     "manipulations": manipulations,
-                    "heterologous_reactions": pathway.reactions,
-                    "synthetic_reactions": find_synthetic_reactions(pathway),
+                    "heterologous_reactions": context.heterologous_reactions,
+                    "synthetic_reactions": context.synthetic_reactions,
                     "fitness": bpcy,
                     "yield": carbon_yield,
                     "product": production,
@@ -134,35 +182,203 @@ def evaluate_diff_fva(designs, pathway, model, method):
                     "targets": reaction_targets,
                 }
             )
+        if targets:
+            columns = ["flux_reversal", "suddenly_essential"]
+            panels = concat(
+                [
+                    designs.nth_panel(index)[columns]
+                    for index in range(len(points))
+                ],
+                keys=range(len(points)),
+                names=["point", "id"],
+            )
+            reaction_targets.update(
+                get_target_data(
+                    model,
+                    panels,
+                    DataFrame(targets, columns=["point", "id", "knockout"]),
+                )
+            )
     return results
 
 
-def opt_gene(pathway, model):
-    with model:
-        pathway.apply(model)
-        predictor = OptGene(model=model, plot=False)
-        designs = predictor.run(
-            target=pathway.product.id,
-            biomass=model.biomass,
-            substrate=model.carbon_source,
+class OptGeneMonitor:
+    """
+    Report the best knockout sets found by OptGene as they improve.
+
+    The monitor keeps the Pareto front of fitness and number of knockouts and
+    logs every candidate that enters it. It is meant to be one of the
+    observers of the evolutionary algorithm, which are called once per
+    generation. After every generation that improved the front, the callback,
+    if any, is called with a copy of it.
+    """
+
+    __name__ = "OptGene Monitor"
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        # The best fitness and knockouts by number of knockouts.
+        self.front = {}
+
+    def reset(self):
+        self.front = {}
+
+    def end(self):
+        # Improvements are reported as they are found.
+        pass
+
+    def _dominated(self, size, fitness):
+        return any(
+            other_size <= size and other_fitness >= fitness
+            for other_size, (other_fitness, _) in self.front.items()
+        )
+
+    def __call__(self, population, num_generations, num_evaluations, args):
+        # Candidates are indices into the representation of knockout targets.
+        representation = args.get("representation")
+        improved = False
+        for individual in population:
+            fitness = individual.fitness
+            size = len(individual.candidate)
+            # Skip designs without production as well as undefined fitness.
+            if not fitness > 0 or self._dominated(size, fitness):
+                continue
+            if representation is None:
+                knockouts = sorted(str(i) for i in individual.candidate)
+            else:
+                knockouts = sorted(
+                    representation[i] for i in individual.candidate
+                )
+            for other_size in [
+                other_size
+                for other_size, (other_fitness, _) in self.front.items()
+                if other_size >= size and other_fitness <= fitness
+            ]:
+                del self.front[other_size]
+            self.front[size] = (fitness, knockouts)
+            improved = True
+            logger.info(
+                f"OptGene: {size} knockouts reach a fitness of {fitness:.4G} "
+                f"after {num_evaluations} evaluations: {', '.join(knockouts)}"
+            )
+        if improved and self.callback is not None:
+            self.callback(dict(self.front))
+
+
+def opt_gene(
+    pathway,
+    model,
+    max_time=2 * 60 * 60,
+    processes=1,
+    seeds=None,
+    callback=None,
+):
+    """
+    Search for gene knockouts that couple production to growth.
+
+    Parameters
+    ----------
+    pathway :
+        A heterologous pathway identified by cameo.
+    model : cobra.Model
+        The model under investigation.
+    max_time : float, optional
+        The time in seconds after which the search ends. The best designs
+        found until then are returned.
+    processes : int, optional
+        The number of processes that evaluate candidate designs in parallel.
+    seeds : list, optional
+        Knockout sets (lists of gene identifiers) that are part of the initial
+        population, for example, the best ones of an interrupted search.
+    callback : callable, optional
+        Called with the Pareto front of fitness and number of knockouts
+        whenever it improves, see `OptGeneMonitor`.
+
+    Returns
+    -------
+    cameo.strain_design.heuristic.evolutionary_based.OptGeneResult or None
+        The designs or None if there was no time to search.
+
+    """
+    if max_time <= 0:
+        logger.warning("No time left to search for OptGene designs.")
+        return None
+    monitor = OptGeneMonitor(callback)
+    start = time.time()
+    with pathway_applied(pathway, model):
+        # This follows `OptGene.run`, which gives no access to the heuristic
+        # optimization in order to observe it.
+        target = get_reaction_for(model, pathway.product.id)
+        biomass = get_reaction_for(model, model.biomass)
+        substrate = get_reaction_for(model, model.carbon_source)
+        objective_function = biomass_product_coupled_yield(
+            biomass, target, substrate
+        )
+        optimization = GeneKnockoutOptimization(
+            model=model,
+            objective_function=objective_function,
+            simulation_method=fba,
+            plot=False,
+        )
+        optimization.archiver = ProductionStrainArchive()
+        optimization.observers.append(monitor)
+        kwargs = dict(
             max_evaluations=int(1e06),
-            max_knockouts=5,
-            max_time=(2, 0, 0),  # (hours, minutes, seconds)
+            pop_size=200,
+            max_size=5,
+            variable_size=True,
+            maximize=True,
+            max_archive_size=50,
+            max_time=max_time,
         )
+        if seeds:
+            # The search continues from these knockout sets. Genes that can no
+            # longer be knocked out are left out.
+            indices = {
+                gene: index
+                for index, gene in enumerate(optimization.representation)
+            }
+            candidates = [
+                sorted(indices[gene] for gene in knockouts if gene in indices)
+                for knockouts in seeds
+            ]
+            kwargs["seeds"] = [
+                candidate for candidate in candidates if candidate
+            ]
+        if processes > 1:
+            # The view's pool is shut down again on leaving the context.
+            with MultiprocessingView(processes=processes) as view:
+                knockouts = optimization.run(view=view, **kwargs)
+        else:
+            knockouts = optimization.run(**kwargs)
+        designs = OptGeneResult(
+            model,
+            knockouts,
+            objective_function,
+            fba,
+            "genes",
+            biomass,
+            target,
+            substrate,
+            optimization.simulation_kwargs,
+        )
+    logger.info(
+        f"OptGene found {len(designs)} designs in "
+        f"{time.time() - start:.0f} seconds."
+    )
     return designs
 
 
-def evaluate_opt_gene(designs, pathway, model, method):
+def evaluate_opt_gene(designs, pathway, model, method, context=None):
     if designs is None:
         return []
     logger.info(f"Evaluating {len(designs)} OptGene designs.")
-    pyield = product_yield(pathway.product, model.carbon_source)
-    bpcy = biomass_product_coupled_min_yield(
-        model.biomass, pathway.product, model.carbon_source
-    )
     results = []
-    with model:
-        pathway.apply(model)
+    with pathway_applied(pathway, model):
+        if context is None:
+            context = PathwayContext(pathway, model)
+        pyield = context.product_yield
+        bpcy = context.biomass_coupled_yield
         for design_result in designs:
             with model:
                 design_result.apply(model)
@@ -216,10 +432,10 @@ def evaluate_opt_gene(designs, pathway, model, method):
                     {
                         "id": str(uuid4()),
                         "knockouts": list(knockouts),
-                        "heterologous_reactions": pathway.reactions,
-                        "synthetic_reactions": find_synthetic_reactions(
-                            pathway
+                        "heterologous_reactions": (
+                            context.heterologous_reactions
                         ),
+                        "synthetic_reactions": context.synthetic_reactions,
                         "fitness": bpc_yield,
                         "yield": p_yield,
                         "product": target_flux,
@@ -249,75 +465,73 @@ def cofactor_swap_optimization(pathway, model):
     return designs
 
 
-def evaluate_cofactor_swap(designs, pathway, model, method):
+def evaluate_cofactor_swap(designs, pathway, model, method, context=None):
     if designs is None:
         return []
     logger.info(f"Evaluating {len(designs)} co-factor swap designs.")
     source_pair = ("nad_c", "nadh_c")
     target_pair = ("nadp_c", "nadph_c")
+    source_a = model.metabolites.get_by_id(source_pair[0])
+    source_b = model.metabolites.get_by_id(source_pair[1])
+    target_a = model.metabolites.get_by_id(target_pair[0])
+    target_b = model.metabolites.get_by_id(target_pair[1])
+    # The pathway was applied by `cofactor_swap_optimization`.
+    if context is None:
+        context = PathwayContext(pathway, model)
+    evaluator = context.evaluator
+    # Many designs share target reactions, so annotate each of them once.
+    annotation = reaction_metadata(
+        model,
+        {
+            rxn_id
+            for targets in designs.data_frame["targets"]
+            for rxn_id in targets
+        },
+    ).to_dict(orient="index")
     results = []
     for design in designs.data_frame.itertuples(index=False):
         manipulations = []
-        # FIXME (Moritz Beber): The model context is currently bugged.
-        #  See https://github.com/opencobra/cobrapy/issues/849
-        #  We need to make a copy.
-        model_tmp = model.copy()
-        source_a = model_tmp.metabolites.get_by_id(source_pair[0])
-        source_b = model_tmp.metabolites.get_by_id(source_pair[1])
-        target_a = model_tmp.metabolites.get_by_id(target_pair[0])
-        target_b = model_tmp.metabolites.get_by_id(target_pair[1])
         reaction_targets = {}
-        for rxn_id in design.targets:
-            rxn = model_tmp.reactions.get_by_id(rxn_id)
-            reaction_targets[rxn_id] = {
-                "name": rxn.name,
-                "subsystem": rxn.subsystem,
-                "gpr": rxn.gene_reaction_rule,
-                "definition_of_stoichiometry": rxn.build_reaction_string(True),
-            }
-            metabolites = rxn.metabolites
-            # Swap from source to target co-factors.
-            if source_a in metabolites:
-                metabolites[target_a] = metabolites[source_a]
-                metabolites[target_b] = metabolites[source_b]
-                metabolites[source_a] = 0
-                metabolites[source_b] = 0
-                manipulations.append(
-                    {"id": rxn_id, "from": source_pair, "to": target_pair}
-                )
-            elif target_a in metabolites:
-                metabolites[source_a] = metabolites[target_a]
-                metabolites[source_b] = metabolites[target_b]
-                metabolites[target_a] = 0
-                metabolites[target_b] = 0
-                manipulations.append(
-                    {"id": rxn_id, "from": target_pair, "to": source_pair}
-                )
-            else:
-                raise KeyError(
-                    f"Neither co-factor swap partner present in "
-                    f"predicted target reaction '{rxn_id}'."
-                )
-            rxn.add_metabolites(metabolites, combine=False)
-        logger.info("Calculating production values.")
-        with model_tmp:
-            prod_flux, _, prod_carbon_yield, _ = evaluate_production(
-                model_tmp, pathway.product.id, model_tmp.carbon_source
-            )
-        logger.info("Calculating biomass coupled production values.")
-        with model_tmp:
-            growth, bpc_yield = evaluate_biomass_coupled_production(
-                model_tmp,
-                pathway.product.id,
-                model_tmp.biomass,
-                model_tmp.carbon_source,
-            )
+        # Only the coefficients of the swapped co-factors change, directly in
+        # the solver problem, so the work per design does not depend on the
+        # size of the model.
+        with StoichiometryChanges(model) as changes:
+            for rxn_id in design.targets:
+                rxn = model.reactions.get_by_id(rxn_id)
+                reaction_targets[rxn_id] = dict(annotation[rxn_id])
+                metabolites = rxn.metabolites
+                # Swap from source to target co-factors.
+                if source_a in metabolites:
+                    swap = (source_a, source_b, target_a, target_b)
+                    manipulations.append(
+                        {"id": rxn_id, "from": source_pair, "to": target_pair}
+                    )
+                elif target_a in metabolites:
+                    swap = (target_a, target_b, source_a, source_b)
+                    manipulations.append(
+                        {"id": rxn_id, "from": target_pair, "to": source_pair}
+                    )
+                else:
+                    raise KeyError(
+                        f"Neither co-factor swap partner present in "
+                        f"predicted target reaction '{rxn_id}'."
+                    )
+                from_a, from_b, to_a, to_b = swap
+                changes.set(rxn, to_a, metabolites[from_a])
+                changes.set(rxn, to_b, metabolites.get(from_b, 0))
+                changes.set(rxn, from_a, 0)
+                changes.set(rxn, from_b, 0)
+            logger.info("Calculating production and growth values.")
+            (
+                (prod_flux, _, prod_carbon_yield, _),
+                (growth, bpc_yield),
+            ) = evaluator.evaluate()
         results.append(
             {
                 "id": str(uuid4()),
                 "manipulations": manipulations,
-                "heterologous_reactions": pathway.reactions,
-                "synthetic_reactions": find_synthetic_reactions(pathway),
+                "heterologous_reactions": context.heterologous_reactions,
+                "synthetic_reactions": context.synthetic_reactions,
                 "fitness": bpc_yield,
                 "yield": prod_carbon_yield,
                 "product": prod_flux,
@@ -329,18 +543,78 @@ def evaluate_cofactor_swap(designs, pathway, model, method):
     return results
 
 
-def get_target_data(model, table, targets, knockout):
-    result = {}
-    for t in targets:
-        rxn_id = t.id if knockout else t["id"]
-        rxn = model.reactions.get_by_id(rxn_id)
-        result[rxn_id] = {
-            "name": rxn.name,
-            "subsystem": rxn.subsystem,
-            "gpr": rxn.gene_reaction_rule,
-            "definition_of_stoichiometry": rxn.build_reaction_string(True),
-            "flux_reversal": bool(table.at[rxn_id, "flux_reversal"]),
-            "suddenly_essential": bool(table.at[rxn_id, "suddenly_essential"]),
-            "knockout": knockout,
+def reaction_metadata(model, reaction_ids):
+    """
+    Return the name, subsystem, GPR and stoichiometry of the given reactions.
+
+    The table is kept per model and only extended by reactions that were not
+    looked up before, so that repeated targets are annotated once.
+    """
+    reaction_ids = list(reaction_ids)
+    table = _reaction_metadata.get(model)
+    if table is None:
+        table = DataFrame(columns=METADATA_COLUMNS)
+    missing = [
+        rxn_id
+        for rxn_id in dict.fromkeys(reaction_ids)
+        if rxn_id not in table.index
+    ]
+    if missing:
+        rows = []
+        for rxn_id in missing:
+            rxn = model.reactions.get_by_id(rxn_id)
+            rows.append(
+                (
+                    rxn.name,
+                    rxn.subsystem,
+                    rxn.gene_reaction_rule,
+                    rxn.build_reaction_string(True),
+                )
+            )
+        missing_table = DataFrame(rows, index=missing, columns=METADATA_COLUMNS)
+        table = concat([table, missing_table])
+        _reaction_metadata[model] = table
+    return table.loc[reaction_ids]
+
+
+def get_target_data(model, panels, targets):
+    """
+    Annotate the reaction targets of differential FVA designs.
+
+    Parameters
+    ----------
+    model : cobra.Model
+        The model that the designs were computed for.
+    panels : pandas.DataFrame
+        The ``flux_reversal`` and ``suddenly_essential`` columns of the
+        surface points indexed by point and reaction identifier.
+    targets : pandas.DataFrame
+        One row per target with the columns ``point``, ``id`` and
+        ``knockout``. Later rows take precedence for the same reaction.
+
+    Returns
+    -------
+    dict
+        The annotation of every target by reaction identifier.
+
+    """
+    if len(targets) == 0:
+        return {}
+    table = (
+        targets.join(panels, on=["point", "id"])
+        .drop_duplicates("id", keep="last")
+        .set_index("id")
+    )
+    table = table.join(reaction_metadata(model, table.index))
+    return {
+        row.Index: {
+            "name": row.name,
+            "subsystem": row.subsystem,
+            "gpr": row.gpr,
+            "definition_of_stoichiometry": row.definition_of_stoichiometry,
+            "flux_reversal": bool(row.flux_reversal),
+            "suddenly_essential": bool(row.suddenly_essential),
+            "knockout": bool(row.knockout),
         }
-    return result
+        for row in table.itertuples()
+    }
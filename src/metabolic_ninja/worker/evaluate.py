@@ -21,36 +21,55 @@ import logging
 from typing import Optional, Tuple
 
 import cobra
+import pandas as pd
 from cameo.strain_design.heuristic.evolutionary.objective_functions import (
     biomass_product_coupled_yield,
     product_yield,
 )
+from cobra.core import Solution
 from cobra.exceptions import OptimizationError
-from cobra.flux_analysis import pfba
 from cobra.flux_analysis.phenotype_phase_plane import (
     reaction_elements,
     reaction_weight,
     total_yield,
 )
 from numpy import isnan
+from optlang.symbolics import Zero
 
 
-__all__ = ("evaluate_production", "evaluate_biomass_coupled_production")
+__all__ = (
+    "DesignEvaluator",
+    "StoichiometryChanges",
+    "evaluate_production",
+    "evaluate_biomass_coupled_production",
+)
 
 
 logger = logging.getLogger(__name__)
 
 
-def evaluate_production(
-    model: cobra.Model, production_id: str, carbon_source_id: str
-) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+class DesignEvaluator:
     """
-    Evaluate the production levels in the specific model conditions.
+    Evaluate production and growth of many designs on one model.
+
+    Designs are applied to and reverted from the model within model contexts,
+    which only changes bounds of the existing problem. The evaluator keeps
+    everything that does not depend on the design, such as the elemental
+    composition of the carbon source and product and the terms of the pFBA
+    objective, and only switches the objective and solves.
+
+    The solver offers no way to solve several problems at once, so the
+    production, growth and pFBA problems of a design are solved one after
+    another. `evaluate` solves them in a single model context, in which the
+    optimal growth constrains the pFBA problem and the objective is restored
+    only once per design. Warm-starting is implicit: since the problem is
+    never rebuilt, the solver starts every solve from the basis of the
+    previous one.
 
     Warnings
     --------
-    This function is expected to be called within a context since it modifies
-    the model's objective.
+    Reactions must not be added to or removed from the model while the
+    evaluator is in use.
 
     Parameters
     ----------
@@ -62,75 +81,285 @@ def evaluate_production(
     carbon_source_id : str
         The identifier of the reaction representing carbon uptake, for example,
         a glucose exchange reaction.
-
-    Returns
-    -------
-    tuple
-        float or None
-            The theoretical maximum production rate if any.
-        float or None
-            The maximal product flux yield if any.
-        float or None
-            The maximal product carbon yield if any.
-        float or None
-            The maximal product yield by weight if any.
+    biomass_id : str, optional
+        The identifier of the reaction representing biomass accumulation, i.e.,
+        growth. Required for `biomass_coupled_production`.
 
     """
-    pyield = product_yield(production_id, carbon_source_id)
-    # Compute the number of weighted carbon atoms.
-    carbon_uptake = model.reactions.get_by_id(carbon_source_id)
-    production = model.reactions.get_by_id(production_id)
-    input_components = [reaction_elements(carbon_uptake)]
-    output_components = reaction_elements(production)
-    # Compute the masses.
-    try:
-        input_weights = [reaction_weight(carbon_uptake)]
-        output_weight = reaction_weight(production)
-    # If the reactions are ill-defined or the metabolite weight is unknown.
-    except (ValueError, TypeError):
-        input_weights = []
-        output_weight = []
-    try:
-        model.objective = production_id
-        solution = model.optimize()
-        production_flux = solution[production_id]
-    except OptimizationError as error:
-        logger.error(
-            "Could not determine production due to a solver error. %r", error
+
+    def __init__(self, model, production_id, carbon_source_id, biomass_id=None):
+        self.model = model
+        self.production_id = production_id
+        self.carbon_source_id = carbon_source_id
+        self.biomass_id = biomass_id
+        self._production = model.reactions.get_by_id(production_id)
+        self._carbon_source = model.reactions.get_by_id(carbon_source_id)
+        self._pyield = product_yield(production_id, carbon_source_id)
+        # Compute the number of weighted carbon atoms.
+        self._input_components = [reaction_elements(self._carbon_source)]
+        self._output_components = reaction_elements(self._production)
+        # Compute the masses.
+        try:
+            self._input_weights = [reaction_weight(self._carbon_source)]
+            self._output_weight = reaction_weight(self._production)
+        # If the reactions are ill-defined or the metabolite weight is unknown.
+        except (ValueError, TypeError):
+            self._input_weights = []
+            self._output_weight = []
+        self._biomass = None
+        self._bpcy = None
+        self._pfba_coefficients = None
+        if biomass_id is not None:
+            self._biomass = model.reactions.get_by_id(biomass_id)
+            self._bpcy = biomass_product_coupled_yield(
+                biomass_id, production_id, carbon_source_id
+            )
+
+    def _solution(self, objective_value):
+        """Return the fluxes needed by the yield functions as a solution."""
+        reactions = [self._production, self._carbon_source]
+        if self._biomass is not None:
+            reactions.append(self._biomass)
+        return Solution(
+            objective_value,
+            "optimal",
+            pd.Series({reaction.id: reaction.flux for reaction in reactions}),
         )
-        production_flux = None
-        production_flux_yield = None
-        production_carbon_yield = None
-        production_mass_yield = None
-    else:
+
+    def evaluate(
+        self,
+    ) -> Tuple[
+        Tuple[
+            Optional[float], Optional[float], Optional[float], Optional[float]
+        ],
+        Tuple[Optional[float], Optional[float]],
+    ]:
+        """
+        Evaluate production and biomass coupled production together.
+
+        This is equivalent to calling `production` and
+        `biomass_coupled_production` but changes the objective one time less.
+
+        Returns
+        -------
+        tuple
+            The results of `production` and `biomass_coupled_production`.
+
+        """
+        with self.model:
+            production = self._production_levels()
+            biomass_coupled = self._biomass_coupled_production_levels()
+        return production, biomass_coupled
+
+    def production(
+        self,
+    ) -> Tuple[
+        Optional[float], Optional[float], Optional[float], Optional[float]
+    ]:
+        """
+        Evaluate the production levels in the current model conditions.
+
+        Returns
+        -------
+        tuple
+            float or None
+                The theoretical maximum production rate if any.
+            float or None
+                The maximal product flux yield if any.
+            float or None
+                The maximal product carbon yield if any.
+            float or None
+                The maximal product yield by weight if any.
+
+        """
+        with self.model:
+            return self._production_levels()
+
+    def _production_levels(self):
+        """Evaluate production, leaving its objective set on the model."""
+        try:
+            self.model.objective = self._production
+            production_flux = self.model.slim_optimize(error_value=None)
+        except OptimizationError as error:
+            logger.error(
+                "Could not determine production due to a solver error. %r",
+                error,
+            )
+            return None, None, None, None
+        solution = self._solution(production_flux)
         try:
-            production_flux_yield = pyield(model, solution, None)
+            production_flux_yield = self._pyield(self.model, solution, None)
         except ZeroDivisionError:
             logger.error("Division by zero in yield calculation.")
             production_flux_yield = None
         production_carbon_yield = total_yield(
-            [solution[carbon_source_id]],
-            input_components,
-            solution[production_id],
-            output_components,
+            [solution[self.carbon_source_id]],
+            self._input_components,
+            production_flux,
+            self._output_components,
         )
         if isnan(production_carbon_yield):
             production_carbon_yield = None
         production_mass_yield = total_yield(
-            [solution[carbon_source_id]],
-            input_weights,
-            solution[production_id],
-            output_weight,
+            [solution[self.carbon_source_id]],
+            self._input_weights,
+            production_flux,
+            self._output_weight,
         )
         if isnan(production_mass_yield):
             production_mass_yield = None
+        return (
+            production_flux,
+            production_flux_yield,
+            production_carbon_yield,
+            production_mass_yield,
+        )
+
+    def biomass_coupled_production(
+        self,
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Evaluate the biomass coupled production levels in the current model.
+
+        Growth is determined by parsimonious FBA as in cobrapy's `pfba`, but
+        the terms of its objective are computed only once.
+
+        Returns
+        -------
+        tuple
+            float or None
+                The theoretical maximum growth rate if any.
+            float or None
+                The maximum biomass coupled product yield if any.
+
+        """
+        with self.model:
+            return self._biomass_coupled_production_levels()
+
+    def _biomass_coupled_production_levels(self):
+        """Evaluate growth, leaving the pFBA problem set up on the model."""
+        if self._biomass is None:
+            raise ValueError("The evaluator needs a biomass reaction.")
+        if self._pfba_coefficients is None:
+            self._pfba_coefficients = {
+                variable: 1.0
+                for reaction in self.model.reactions
+                for variable in (
+                    reaction.forward_variable,
+                    reaction.reverse_variable,
+                )
+            }
+        try:
+            self.model.objective = self._biomass
+            optimum = self.model.slim_optimize(error_value=None)
+            # Fix growth at its optimum and minimize the total flux.
+            self._biomass.lower_bound = min(optimum, self._biomass.upper_bound)
+            self.model.objective = self.model.problem.Objective(
+                Zero, direction="min", sloppy=True, name="_pfba_objective"
+            )
+            self.model.objective.set_linear_coefficients(
+                self._pfba_coefficients
+            )
+            self.model.slim_optimize(error_value=None)
+        except OptimizationError as error:
+            logger.error(
+                "Could not determine biomass coupled production due to a "
+                "solver error. %r",
+                error,
+            )
+            return None, None
+        growth = self._biomass.flux
+        solution = self._solution(growth)
+        try:
+            bpc_yield = self._bpcy(self.model, solution, None)
+        except ZeroDivisionError:
+            logger.error("Division by zero in yield calculation.")
+            bpc_yield = None
+        return growth, bpc_yield
+
+
+class StoichiometryChanges:
+    """
+    Change stoichiometric coefficients in the solver problem only.
+
+    Changing a reaction's metabolites through cobrapy rebuilds the reaction's
+    terms in the problem and cannot reliably be reverted within a model
+    context (https://github.com/opencobra/cobrapy/issues/849). Instead, this
+    updates the coefficients of the reaction's variables in the mass balance
+    constraints of the affected metabolites directly and restores them on
+    `undo`. The cobrapy objects are left untouched, so use this as a context
+    manager around computations that only rely on the solver.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._original = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.undo()
+
+    def set(self, reaction, metabolite, coefficient):
+        """Set the coefficient of the metabolite in the reaction."""
+        key = (reaction.id, metabolite.id)
+        if key not in self._original:
+            self._original[key] = reaction.metabolites.get(metabolite, 0)
+        self._set(reaction, metabolite, coefficient)
+
+    def _set(self, reaction, metabolite, coefficient):
+        self.model.constraints[metabolite.id].set_linear_coefficients(
+            {
+                reaction.forward_variable: coefficient,
+                reaction.reverse_variable: -coefficient,
+            }
+        )
+
+    def undo(self):
+        """Restore all changed coefficients."""
+        for (reaction_id, metabolite_id), coefficient in self._original.items():
+            self._set(
+                self.model.reactions.get_by_id(reaction_id),
+                self.model.metabolites.get_by_id(metabolite_id),
+                coefficient,
+            )
+        self._original.clear()
+
 
-    return (
-        production_flux,
-        production_flux_yield,
-        production_carbon_yield,
-        production_mass_yield,
-    )
+def evaluate_production(
+    model: cobra.Model, production_id: str, carbon_source_id: str
+) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+    """
+    Evaluate the production levels in the specific model conditions.
+
+    Use a `DesignEvaluator` directly when evaluating many designs.
+
+    Parameters
+    ----------
+    model : cobra.Model
+        The constraint-based metabolic model of the production organism.
+    production_id : str
+        The identifier of the reaction representing production, for example,
+        a demand reaction on the compound.
+    carbon_source_id : str
+        The identifier of the reaction representing carbon uptake, for example,
+        a glucose exchange reaction.
+
+    Returns
+    -------
+    tuple
+        float or None
+            The theoretical maximum production rate if any.
+        float or None
+            The maximal product flux yield if any.
+        float or None
+            The maximal product carbon yield if any.
+        float or None
+            The maximal product yield by weight if any.
+
+    """
+    return DesignEvaluator(model, production_id, carbon_source_id).production()
 
 
 def evaluate_biomass_coupled_production(
@@ -142,10 +371,7 @@ def evaluate_biomass_coupled_production(
     """
     Evaluate the biomass coupled production levels in the specific conditions.
 
-    Warnings
-    --------
-    This function is expected to be called within a context since it modifies
-    the model's objective.
+    Use a `DesignEvaluator` directly when evaluating many designs.
 
     Parameters
     ----------
@@ -170,25 +396,6 @@ def evaluate_biomass_coupled_production(
             The maximum biomass coupled product yield if any.
 
     """
-    bpcy = biomass_product_coupled_yield(
-        biomass_id, production_id, carbon_source_id
-    )
-    try:
-        model.objective = biomass_id
-        solution = pfba(model)
-        growth = solution[biomass_id]
-    except OptimizationError as error:
-        logger.error(
-            "Could not determine biomass coupled production due to a solver "
-            "error. %r",
-            error,
-        )
-        growth = None
-        bpc_yield = None
-    else:
-        try:
-            bpc_yield = bpcy(model, solution, None)
-        except ZeroDivisionError:
-            logger.error("Division by zero in yield calculation.")
-            bpc_yield = None
-    return growth, bpc_yield
+    return DesignEvaluator(
+        model, production_id, carbon_source_id, biomass_id
+    ).biomass_coupled_production()
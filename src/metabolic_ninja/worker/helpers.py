@@ -17,11 +17,26 @@
 import logging
 import re
 from operator import itemgetter
+from types import SimpleNamespace
 
 from cameo.core.target import ReactionInversionTarget
+from cameo.strain_design.pathway_prediction.pathway_predictor import (
+    PathwayResult,
+)
+from cobra import DictList
+from cobra.io.dict import (
+    metabolite_from_dict,
+    metabolite_to_dict,
+    reaction_from_dict,
+    reaction_to_dict,
+)
 
 
-__all__ = ("identify_exotic_cofactors",)
+__all__ = (
+    "identify_exotic_cofactors",
+    "pathway_to_dict",
+    "pathway_from_dict",
+)
 
 
 logger = logging.getLogger(__name__)
@@ -214,3 +229,62 @@ def find_synthetic_reactions(pathway):
     # Add the demand reaction for the final product.
     demand_rxns.add(pathway.product)
     return demand_rxns
+
+
+def pathway_to_dict(pathway):
+    """
+    Serialize a predicted heterologous pathway.
+
+    Parameters
+    ----------
+    pathway : cameo.strain_design.pathway_prediction.pathway_predictor.PathwayResult
+        One of the heterologous pathways predicted by cameo.
+
+    Returns
+    -------
+    dict
+        The reaction and metabolite definitions of the pathway in a
+        JSON-compatible form that can be loaded with `pathway_from_dict`.
+
+    """  # noqa: E501
+    metabolites = {}
+
+    def serialize(reactions):
+        result = []
+        for reaction in reactions:
+            for metabolite in reaction.metabolites:
+                if metabolite.id not in metabolites:
+                    metabolites[metabolite.id] = metabolite_to_dict(metabolite)
+            result.append(reaction_to_dict(reaction))
+        return result
+
+    return {
+        "reactions": serialize(pathway.reactions),
+        "exchanges": serialize(pathway.exchanges),
+        "adapters": serialize(pathway.adapters),
+        "product": serialize([pathway.product])[0],
+        "metabolites": list(metabolites.values()),
+    }
+
+
+def pathway_from_dict(data):
+    """Create a pathway that can be applied to a model from its definitions."""
+    # The reactions refer to metabolites by ID and are resolved against this
+    # stand-in for a model. Metabolites are shared among all reactions and are
+    # replaced by the model's own ones upon applying the pathway.
+    lookup = SimpleNamespace(
+        metabolites=DictList(
+            metabolite_from_dict(metabolite)
+            for metabolite in data["metabolites"]
+        )
+    )
+
+    def deserialize(reactions):
+        return [reaction_from_dict(reaction, lookup) for reaction in reactions]
+
+    return PathwayResult(
+        deserialize(data["reactions"]),
+        deserialize(data["exchanges"]),
+        deserialize(data["adapters"]),
+        deserialize([data["product"]])[0],
+    )
@@ -19,12 +19,15 @@ import logging.config
 import os
 import signal
 import sys
-import threading
 
 import pika
 import sentry_sdk
 
+from ..universal import preload
 from . import tasks
+from .checkpoints import Checkpoints
+from .decorators import start_worker_pool, stop_worker_pool
+from .scheduler import JobScheduler, default_slots
 
 
 logger = logging.getLogger(__name__)
@@ -70,37 +73,72 @@ sentry_sdk.integrations.logging.ignore_logger(
     "pika.adapters.blocking_connection"
 )
 
+# The number of jobs that run concurrently. By default, as many as fit the
+# available CPUs, given that every job runs `DESIGN_PROCESSES` processes that
+# may each run `DIFF_FVA_PROCESSES` or `OPT_GENE_PROCESSES` processes, and the
+# available memory, given that every job needs `JOB_MEMORY` MiB.
+JOB_MEMORY = int(os.environ.get("JOB_MEMORY", 4096))
+JOB_SLOTS = int(os.environ.get("JOB_SLOTS", 0)) or default_slots(
+    tasks.DESIGN_PROCESSES
+    * max(tasks.DIFF_FVA_PROCESSES, tasks.OPT_GENE_PROCESSES),
+    JOB_MEMORY,
+)
+# The number of warm processes that execute the tasks of all jobs. A worker
+# process is replaced after `WORKER_MAX_TASKS` tasks or once its peak memory
+# exceeds `WORKER_MAX_MEMORY` MiB.
+WORKER_PROCESSES = int(
+    os.environ.get("WORKER_PROCESSES", JOB_SLOTS * tasks.DESIGN_PROCESSES)
+)
+WORKER_MAX_TASKS = int(os.environ.get("WORKER_MAX_TASKS", 50)) or None
+WORKER_MAX_MEMORY = int(os.environ.get("WORKER_MAX_MEMORY", 0)) or None
+
+# Checkpoints older than this (in seconds) are removed at start-up.
+CHECKPOINT_MAX_AGE = 7 * 24 * 60 * 60
+
 # Whenever a job is received, the work on it will be started in a new thread.
 # This is to allow the RabbitMQ i/o loop to do its thing (like sending
-# heartbeats to the server to keep the connection alive). Started threads are
-# stored in this list, so that we can wait for the threads to complete when
+# heartbeats to the server to keep the connection alive). The scheduler keeps
+# track of the running threads, so that we can wait for them to complete when
 # terminating the application.
-worker_threads = []
+scheduler = JobScheduler(JOB_SLOTS)
 
 
 def on_message(channel, method_frame, header_frame, body, connection):
     """Handle new messages from RabbitMQ."""
     logger.debug(f"Received message {method_frame.delivery_tag}")
     # Start the work in a separate thread, to avoid blocking the pika i/o loop.
-    thread = threading.Thread(
-        target=tasks.design,
-        args=(
-            connection,
-            channel,
-            method_frame.delivery_tag,
-            body,
-            ack_message,
-        ),
+    started = scheduler.start(
+        tasks.design,
+        connection,
+        channel,
+        method_frame.delivery_tag,
+        body,
+        ack_message,
+        key=method_frame.delivery_tag,
     )
-    thread.start()
-    worker_threads.append(thread)
+    if not started:
+        # This should not happen since the prefetch count equals the number of
+        # slots. Return the message to the queue for another worker.
+        logger.warning(
+            f"No free job slot for message {method_frame.delivery_tag}; "
+            f"returning it to the queue."
+        )
+        channel.basic_nack(method_frame.delivery_tag, requeue=True)
 
 
-def ack_message(channel, delivery_tag):
-    """Acknowledge a finished job."""
+def ack_message(channel, delivery_tag, requeue=False):
+    """Acknowledge a finished job or return an unfinished one to the queue."""
+    # Free the job's slot first. The broker may deliver the next message as
+    # soon as it receives the acknowledgement, and that message must find a
+    # free slot.
+    scheduler.release(delivery_tag)
     if channel.is_open:
-        logger.debug(f"ACKing message {delivery_tag}")
-        channel.basic_ack(delivery_tag)
+        if requeue:
+            logger.debug(f"NACKing message {delivery_tag} for redelivery")
+            channel.basic_nack(delivery_tag, requeue=True)
+        else:
+            logger.debug(f"ACKing message {delivery_tag}")
+            channel.basic_ack(delivery_tag)
     else:
         # If the channel was closed for some reason, ignore. That is usually the
         # case if rabbitmq is shutting down and closed the connection while a
@@ -117,6 +155,14 @@ def on_terminate(channel, signum, frame):
 
 
 def main():
+    # Load the universal models and fork the worker processes before connecting
+    # to RabbitMQ, such that the processes share the models with us and are
+    # ready when the first job arrives.
+    preload()
+    # Checkpoints of jobs that were never delivered to this worker again.
+    Checkpoints.prune(CHECKPOINT_MAX_AGE)
+    start_worker_pool(WORKER_PROCESSES, WORKER_MAX_TASKS, WORKER_MAX_MEMORY)
+
     logger.debug("Establishing connection and declaring task queue")
     try:
         connection = pika.BlockingConnection(
@@ -129,13 +175,16 @@ def main():
         logger.warning(
             "AMQPConnectionError: Cannot connect to RabbitMQ. Aborting."
         )
+        stop_worker_pool()
         sys.exit(-1)
 
     channel = connection.channel()
     channel.queue_declare(queue="jobs", durable=True)
-    # Prefetch only a single message, to ensure messages aren't sent to busy
-    # workers.
-    channel.basic_qos(prefetch_count=1)
+    # Prefetch only as many messages as there are job slots, to ensure messages
+    # aren't sent to busy workers. Every running job holds on to its message
+    # until it's done, so free slots and outstanding messages stay in balance.
+    logger.info(f"Running up to {scheduler.slots} jobs concurrently")
+    channel.basic_qos(prefetch_count=scheduler.slots)
     # Pass the connection to the message callback - it'll be needed later to ACK
     # messages.
     callback = functools.partial(on_message, connection=connection)
@@ -154,9 +203,9 @@ def main():
 
     # Wait for any worker threads to complete their jobs, before disconnecting
     # from the RabbitMQ broker.
-    for thread in worker_threads:
-        thread.join()
+    scheduler.join()
 
+    stop_worker_pool()
     connection.close()
 
 
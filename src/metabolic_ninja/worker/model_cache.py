@@ -0,0 +1,65 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Keep deserialized models ready for use by later jobs."""
+
+import logging
+import os
+import pickle
+
+from ..bytes_cache import BytesCache
+
+
+__all__ = ("ModelCache", "model_cache")
+
+
+logger = logging.getLogger(__name__)
+
+# The total size of the cached, pickled models in MiB. Zero disables the cache.
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", 1024))
+
+
+class ModelCache(BytesCache):
+    """
+    Keep pickled models, including their solver problem, in memory.
+
+    Building a model from its dictionary and then setting up its solver
+    problem takes seconds for genome-scale models. Unpickling a model restores
+    the solver problem from the solver's own binary format instead, which is
+    much faster. Every `get` returns a new copy that may be modified freely.
+    The least recently used models are evicted once the pickled models exceed
+    ``max_size`` bytes in total.
+    """
+
+    def get(self, key):
+        """Return a copy of the model cached for the key or None."""
+        data = super().get(key)
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def put(self, key, model):
+        """Cache a copy of the model under the key."""
+        if self.max_size <= 0:
+            return
+        data = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        if not super().put(key, data):
+            logger.debug(
+                f"Not caching model of {len(data)} bytes, which exceeds the "
+                f"cache size."
+            )
+
+
+model_cache = ModelCache(MODEL_CACHE_SIZE * 2 ** 20)
@@ -0,0 +1,81 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Share the design-independent information on a pathway among evaluations."""
+
+from cameo.strain_design.heuristic.evolutionary.objective_functions import (
+    biomass_product_coupled_min_yield,
+    product_yield,
+)
+from cobra.io.dict import metabolite_to_dict, reaction_to_dict
+
+from .evaluate import DesignEvaluator
+from .helpers import find_synthetic_reactions
+
+
+__all__ = ("PathwayContext",)
+
+
+class PathwayContext:
+    """
+    Everything about a pathway that does not depend on the evaluated design.
+
+    Build the context once per pathway, while the pathway is applied to the
+    model (see `designer.pathway_applied`), and share it among all evaluations
+    of that pathway's designs. Then, the work per design is only applying the
+    design and solving.
+
+    Attributes
+    ----------
+    evaluator : DesignEvaluator
+        Evaluates production and growth, keeping the carbon and mass
+        composition of the carbon source and product.
+    heterologous_reactions : list
+        The reactions of the pathway.
+    synthetic_reactions : list
+        The demand reactions for the product and foreign metabolites.
+    product_yield : callable
+        The product yield function as used by cameo's heuristic optimizations.
+    biomass_coupled_yield : callable
+        The minimal biomass-coupled product yield function.
+    reactions : dict
+        The serialized heterologous and synthetic reactions by identifier.
+    metabolites : dict
+        The serialized metabolites of the heterologous reactions by identifier.
+
+    """
+
+    def __init__(self, pathway, model):
+        self.pathway = pathway
+        self.model = model
+        self.evaluator = DesignEvaluator(
+            model, pathway.product.id, model.carbon_source, model.biomass
+        )
+        self.heterologous_reactions = list(pathway.reactions)
+        self.synthetic_reactions = list(find_synthetic_reactions(pathway))
+        self.product_yield = product_yield(pathway.product, model.carbon_source)
+        self.biomass_coupled_yield = biomass_product_coupled_min_yield(
+            model.biomass, pathway.product, model.carbon_source
+        )
+        self.reactions = {
+            reaction.id: reaction_to_dict(reaction)
+            for reaction in self.heterologous_reactions
+            + self.synthetic_reactions
+        }
+        self.metabolites = {
+            metabolite.id: metabolite_to_dict(metabolite)
+            for reaction in self.heterologous_reactions
+            for metabolite in reaction.metabolites
+        }
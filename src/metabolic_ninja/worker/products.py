@@ -0,0 +1,83 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resolve the product of a design job without searching the universal model."""
+
+import logging
+import os
+import threading
+
+from ..products import ProductLookup
+
+
+__all__ = ("resolve_product",)
+
+
+logger = logging.getLogger(__name__)
+
+# Written by `scripts/dump_products.py`.
+PRODUCT_LOOKUP_PATH = "data/product_index.json"
+
+_lock = threading.Lock()
+_lookups = {}
+
+
+def _lookup(source):
+    """Return the product lookup for the universal model."""
+    with _lock:
+        if os.path.isfile(PRODUCT_LOOKUP_PATH):
+            key = PRODUCT_LOOKUP_PATH
+        else:
+            key = source.id
+        if key not in _lookups:
+            if key == PRODUCT_LOOKUP_PATH:
+                _lookups[key] = ProductLookup.from_json(PRODUCT_LOOKUP_PATH)
+            else:
+                # Without a precomputed index, build one from the universal
+                # model, which is loaded in the worker anyway.
+                logger.info(f"Indexing the metabolites of {source.id}")
+                _lookups[key] = ProductLookup.from_metabolites(
+                    source.metabolites
+                )
+        return _lookups[key]
+
+
+def resolve_product(name, source):
+    """
+    Return the universal model's metabolite known by the given name.
+
+    Parameters
+    ----------
+    name : str
+        A name or identifier of the product.
+    source : cobra.Model
+        The universal model of the job.
+
+    Returns
+    -------
+    cobra.Metabolite or None
+        The metabolite or None if the name is not in the index or refers to
+        several metabolites of the universal model. The search of cameo ranks
+        those, so the choice is left to it.
+
+    """
+    identifiers = [
+        identifier
+        for identifier in _lookup(source).get(name)
+        if identifier in source.metabolites
+    ]
+    if len(identifiers) != 1:
+        return None
+    return source.metabolites.get_by_id(identifiers[0])
@@ -0,0 +1,188 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compact representations of design results passed between processes."""
+
+from cobra.io.dict import metabolite_to_dict, reaction_to_dict
+
+
+__all__ = ("DesignRecord", "DesignResults")
+
+
+class DesignRecord:
+    """
+    A single evaluated design holding only identifiers and numbers.
+
+    The attributes correspond to the keys of a design in the job result, see
+    `to_dict`.
+    """
+
+    __slots__ = (
+        "id",
+        "method",
+        "knockouts",
+        "manipulations",
+        "heterologous_reactions",
+        "synthetic_reactions",
+        "exotic_cofactors",
+        "fitness",
+        "yield_",
+        "product",
+        "biomass",
+        "targets",
+    )
+
+    def __init__(
+        self,
+        id,
+        method,
+        knockouts=(),
+        manipulations=(),
+        heterologous_reactions=(),
+        synthetic_reactions=(),
+        exotic_cofactors=(),
+        fitness=None,
+        yield_=None,
+        product=None,
+        biomass=None,
+        targets=None,
+    ):
+        self.id = id
+        self.method = method
+        self.knockouts = list(knockouts)
+        self.manipulations = list(manipulations)
+        self.heterologous_reactions = list(heterologous_reactions)
+        self.synthetic_reactions = list(synthetic_reactions)
+        self.exotic_cofactors = list(exotic_cofactors)
+        self.fitness = fitness
+        self.yield_ = yield_
+        self.product = product
+        self.biomass = biomass
+        self.targets = {} if targets is None else targets
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.id} ({self.method})>"
+
+    def to_dict(self):
+        """Return the design in the format stored in the job result."""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "knockouts": self.knockouts,
+            "manipulations": self.manipulations,
+            "heterologous_reactions": self.heterologous_reactions,
+            "synthetic_reactions": self.synthetic_reactions,
+            "exotic_cofactors": self.exotic_cofactors,
+            "fitness": self.fitness,
+            "yield": self.yield_,
+            "product": self.product,
+            "biomass": self.biomass,
+            "targets": self.targets,
+        }
+
+
+class DesignResults:
+    """
+    The designs of one pathway and method with the definitions they refer to.
+
+    Designs only refer to reactions and metabolites by their identifiers. The
+    full definitions of heterologous and synthetic reactions as well as exotic
+    co-factors are kept once in ``reactions`` and ``metabolites``.
+    """
+
+    __slots__ = ("designs", "reactions", "metabolites")
+
+    def __init__(self, designs, reactions, metabolites):
+        self.designs = designs
+        self.reactions = reactions
+        self.metabolites = metabolites
+
+    def __getstate__(self):
+        return self.designs, self.reactions, self.metabolites
+
+    def __setstate__(self, state):
+        self.designs, self.reactions, self.metabolites = state
+
+    def __len__(self):
+        return len(self.designs)
+
+    @classmethod
+    def from_rows(cls, rows, context=None):
+        """
+        Compact the result rows produced by the designer functions.
+
+        Parameters
+        ----------
+        rows : list
+            Dictionaries describing designs as returned by the designer's
+            ``evaluate_*`` functions. They refer to cobra reactions, metabolites
+            and cameo targets.
+        context : PathwayContext, optional
+            The context the rows were evaluated with. Its serialized reactions
+            and metabolites are used rather than serializing them again.
+
+        """
+        if context is not None and rows:
+            reactions = dict(context.reactions)
+            metabolites = dict(context.metabolites)
+        else:
+            reactions = {}
+            metabolites = {}
+        designs = []
+        for row in rows:
+            for reaction in row.get("heterologous_reactions", []):
+                if reaction.id not in reactions:
+                    reactions[reaction.id] = reaction_to_dict(reaction)
+                for metabolite in reaction.metabolites:
+                    if metabolite.id not in metabolites:
+                        metabolites[metabolite.id] = metabolite_to_dict(
+                            metabolite
+                        )
+            for reaction in row.get("synthetic_reactions", []):
+                if reaction.id not in reactions:
+                    reactions[reaction.id] = reaction_to_dict(reaction)
+            for metabolite in row.get("exotic_cofactors", []):
+                if metabolite.id not in metabolites:
+                    metabolites[metabolite.id] = metabolite_to_dict(metabolite)
+            designs.append(
+                DesignRecord(
+                    id=row["id"],
+                    method=row["method"],
+                    knockouts=[t.id for t in row.get("knockouts", [])],
+                    manipulations=row.get("manipulations", []),
+                    heterologous_reactions=[
+                        r.id for r in row.get("heterologous_reactions", [])
+                    ],
+                    synthetic_reactions=[
+                        r.id for r in row.get("synthetic_reactions", [])
+                    ],
+                    exotic_cofactors=[
+                        m.id for m in row.get("exotic_cofactors", [])
+                    ],
+                    fitness=row["fitness"],
+                    yield_=row["yield"],
+                    product=row["product"],
+                    biomass=row["biomass"],
+                    targets=row["targets"],
+                )
+            )
+        return cls(designs, reactions, metabolites)
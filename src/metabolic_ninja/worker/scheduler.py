@@ -0,0 +1,148 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Run a bounded number of design jobs concurrently."""
+
+import logging
+import os
+import threading
+
+
+__all__ = ("JobScheduler", "default_slots")
+
+
+logger = logging.getLogger(__name__)
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _available_memory():
+    """Return the memory available to this container or machine in bytes."""
+    # Respect the memory limit of the container's control group (v2 or v1).
+    for path in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        try:
+            with open(path) as file_:
+                return int(file_.read().strip())
+        except (OSError, ValueError):
+            # Either there is no such file or the value is "max".
+            continue
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def default_slots(processes_per_job, memory_per_job):
+    """
+    Return the number of jobs that fit on this machine.
+
+    Parameters
+    ----------
+    processes_per_job : int
+        The number of processes that a single job runs concurrently.
+    memory_per_job : int
+        The memory that a single job requires in MiB.
+
+    """
+    by_cpu = _available_cpus() // processes_per_job
+    by_memory = _available_memory() // (memory_per_job * 2 ** 20)
+    return max(1, min(by_cpu, by_memory))
+
+
+class JobScheduler:
+    """
+    Run jobs in threads, using at most a fixed number of slots at a time.
+
+    The RabbitMQ prefetch count should be set to the number of slots. Every
+    running job holds an unacknowledged message, so the broker then only ever
+    delivers as many messages as there are free slots. For that to hold, a
+    job's slot must be released (see `release`) before its message is
+    acknowledged.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._threads = set()
+        # The keys of the jobs holding a slot.
+        self._occupied = set()
+
+    @property
+    def occupied(self):
+        """Return the number of slots in use."""
+        with self._lock:
+            return len(self._occupied)
+
+    def _report(self):
+        logger.info(f"Job slots in use: {len(self._occupied)}/{self.slots}")
+
+    def start(self, target, *args, key=None):
+        """
+        Run the target function in a new thread if a slot is free.
+
+        Parameters
+        ----------
+        target : callable
+            The job, called with the remaining positional arguments.
+        key : hashable, optional
+            Identifies the job's slot for `release`. Without a key, the slot
+            is released once the job returns.
+
+        Returns
+        -------
+        bool
+            Whether the job was started.
+
+        """
+        if key is None:
+            key = object()
+        with self._lock:
+            if len(self._occupied) >= self.slots:
+                return False
+            thread = threading.Thread(
+                target=self._run, args=(key, target) + args
+            )
+            self._threads.add(thread)
+            self._occupied.add(key)
+            self._report()
+        thread.start()
+        return True
+
+    def release(self, key):
+        """Release the slot of a job that is about to finish."""
+        with self._lock:
+            if key in self._occupied:
+                self._occupied.discard(key)
+                self._report()
+
+    def _run(self, key, target, *args):
+        try:
+            target(*args)
+        finally:
+            self.release(key)
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+    def join(self):
+        """Wait for all running jobs to complete."""
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
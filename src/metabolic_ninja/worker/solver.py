@@ -0,0 +1,74 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Select the solver for the models of design jobs."""
+
+import logging
+import os
+
+from cobra.util.solver import solvers
+
+
+__all__ = ("SOLVERS", "select_solver")
+
+
+logger = logging.getLogger(__name__)
+
+# Solvers in order of preference. A job uses the first one that is available,
+# unless it asks for another available one. If none of them is available, an
+# open-source solver serves as a fallback. Pathway prediction and OptGene solve
+# mixed-integer problems, so solvers that only handle LPs are never chosen.
+SOLVERS = [
+    name.strip()
+    for name in os.environ.get("SOLVERS", "cplex,glpk").split(",")
+    if name.strip()
+]
+OPEN_SOURCE_SOLVERS = ("glpk",)
+LP_ONLY_SOLVERS = frozenset(["scipy"])
+
+
+def select_solver(requested=None, preference=None):
+    """
+    Return the name of the solver to set up a job's model with.
+
+    Parameters
+    ----------
+    requested : str, optional
+        The solver asked for by the job.
+    preference : list, optional
+        Solver names in order of preference (default `SOLVERS`).
+
+    Raises
+    ------
+    RuntimeError
+        If no installed solver can solve mixed-integer problems.
+
+    """
+    if preference is None:
+        preference = SOLVERS
+    if requested is not None:
+        if requested in solvers and requested not in LP_ONLY_SOLVERS:
+            return requested
+        logger.warning(
+            f"The requested solver '{requested}' is not available or cannot "
+            f"solve mixed-integer problems. Falling back to the configured "
+            f"solvers."
+        )
+    for name in list(preference) + list(OPEN_SOURCE_SOLVERS):
+        if name in solvers and name not in LP_ONLY_SOLVERS:
+            return name
+    raise RuntimeError(
+        f"None of the solvers {', '.join(preference)} is available."
+    )
@@ -16,34 +16,104 @@
 import functools
 import json
 import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import cameo.api
-from cobra.io.dict import metabolite_to_dict, reaction_to_dict
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Email, Mail, Personalization
 
 from . import designer
+from .cache import (
+    load_cached_pathways,
+    load_cached_result,
+    store_pathways,
+    store_result,
+)
+from .checkpoints import Checkpoints
 from .data import Job
 from .decorators import TaskFailedException, task
+from .pathway_context import PathwayContext
+from .products import resolve_product
+from .results import DesignResults
 
 
 logger = logging.getLogger(__name__)
 
+# The number of design units (one pathway optimized by one method) of a single
+# job that may run concurrently. Every unit runs in its own child process, so
+# this bounds the number of cores that a job occupies.
+DESIGN_PROCESSES = int(os.environ.get("DESIGN_PROCESSES", 1))
+# The number of processes that compute the flux variability analyses of a
+# single differential FVA in parallel. Every process is given whole surface
+# points, so more processes than points would stay idle.
+DIFF_FVA_PROCESSES = min(
+    int(os.environ.get("DIFF_FVA_PROCESSES", 1)), designer.DIFF_FVA_POINTS
+)
+# The time in seconds that OptGene searches for designs for one pathway and the
+# number of processes that evaluate its candidate designs in parallel.
+OPT_GENE_TIME = int(os.environ.get("OPT_GENE_TIME", 15 * 60))
+OPT_GENE_PROCESSES = int(os.environ.get("OPT_GENE_PROCESSES", 1))
+# The time in seconds after the start of a job by which its searches should
+# be completed. OptGene ends early in order to keep to it.
+JOB_TIME_BUDGET = int(os.environ.get("JOB_TIME_BUDGET", 4 * 60 * 60))
+# The time in seconds that the pathway predictor searches for each pathway.
+PATHWAY_TIMEOUT = 120
+# The time in seconds before a job that could neither be completed nor recorded
+# as failed is returned to the queue.
+RETRY_DELAY = 60
+
 
 def design(connection, channel, delivery_tag, body, ack_message):
     """Run the metabolic ninja design workflow."""
     job = Job.deserialize(json.loads(body))
+    job.deadline = time.time() + JOB_TIME_BUDGET
+    # Results of completed stages are stored, such that an interrupted job
+    # whose message is delivered again can continue where it left off.
+    checkpoints = Checkpoints(job.job_id)
+    # Whether the job has either succeeded or been recorded as failed. Only
+    # then are its checkpoints of no further use.
+    finished = False
 
     try:
         job.save(status="STARTED")
 
-        logger.info("Initiating new design workflow")
+        # An identical job may have been completed before.
+        result = _cached_result(job)
+        if result is not None:
+            logger.info("Completing design workflow from cached result")
+            job.save_predictions(_predictions(result))
+            job.save(status="SUCCESS", result=result)
+            _store_artifacts(job, result)
+            finished = True
+            _notify(job)
+            return
 
-        logger.debug("Starting task: Find product")
-        product = find_product(job)
+        logger.info("Initiating new design workflow")
 
-        logger.debug("Starting task: Find pathways")
-        pathways = find_pathways(job, product)
+        product = checkpoints.get("product")
+        if product is None:
+            logger.debug("Starting task: Find product")
+            product = find_product(job)
+            checkpoints["product"] = product
+        else:
+            logger.debug("Resuming with previously found product")
+
+        pathways = checkpoints.get("pathways")
+        if pathways is not None:
+            logger.debug("Resuming with previously found pathways")
+        else:
+            # The same pathways may have been predicted for another job.
+            pathways = _cached_pathways(job, product)
+            if pathways is not None:
+                logger.debug("Using cached pathways")
+        if pathways is None:
+            logger.debug("Starting task: Find pathways")
+            pathways, timed_out = find_pathways(job, product)
+            checkpoints["pathways"] = pathways
+            _cache_pathways(job, product, pathways, timed_out)
 
         optimization_results = {
             "diff_fva": [],
@@ -52,51 +122,96 @@ def design(connection, channel, delivery_tag, body, ack_message):
             "reactions": {},
             "metabolites": {},
             "target": pathways[0].product.id if len(pathways) else "",
+            "progress": {"pathways_done": 0, "pathways_total": len(pathways)},
         }
-
-        for index, pathway in enumerate(pathways, start=1):
-            # Differential FVA
-            logger.debug(
-                f"Starting task: Differential FVA "
-                f"(pathway {index}/{len(pathways)})"
-            )
-            results = diff_fva(job, pathway, "PathwayPredictor+DifferentialFVA")
-            _collect_results(
-                results,
-                optimization_results["reactions"],
-                optimization_results["metabolites"],
-                optimization_results["diff_fva"],
+        # Results are collected per method and keyed by pathway index, so that
+        # they can be merged in a deterministic order once all units are done.
+        collected = {key: {} for key, _, _ in DESIGN_METHODS}
+        # The number of finished design units per pathway.
+        units_done = Counter()
+        # Store the empty result such that partial results can be added to it
+        # as soon as they become available.
+        job.save(result=optimization_results)
+
+        def finish(key, index, results):
+            # The rows are stored under the pathway index such that the final
+            # order of results does not depend on which unit finished first.
+            rows = [design.to_dict() for design in results.designs]
+            collected[key][index] = rows
+            units_done[index] += 1
+            progress = optimization_results["progress"]
+            if units_done[index] == len(DESIGN_METHODS):
+                progress["pathways_done"] += 1
+            # Make the partial results available to users right away. The
+            # result only refers to the shared reaction and metabolite
+            # definitions.
+            reactions, metabolites = job.append_results(
+                key, rows, results.reactions, results.metabolites, progress
             )
+            optimization_results["reactions"].update(reactions)
+            optimization_results["metabolites"].update(metabolites)
 
-            # OptGene
-            # FIXME (Moritz): Disabled for fast test on staging.
-            # logger.debug(f"Starting task: OptGene
-            # (pathway {index}/{len(pathways)})")
-            # results = opt_gene(job, pathway, "PathwayPredictor+OptGene")
-            # _collect_results(
-            #     results,
-            #     optimization_results["reactions"],
-            #     optimization_results["metabolites"],
-            #     optimization_results["opt_gene"],
-            # )
-
-            # Cofactor Swap Optimization
-            logger.debug(
-                f"Starting task: Cofactor Swap "
-                f"(pathway {index}/{len(pathways)})"
-            )
-            results = cofactor_swap(
-                job, pathway, "PathwayPredictor+CofactorSwap"
-            )
-            _collect_results(
-                results,
-                optimization_results["reactions"],
-                optimization_results["metabolites"],
-                optimization_results["cofactor_swap"],
-            )
+        # Every pathway is optimized by every design method. Those units are
+        # independent of each other and each runs in its own child process, so
+        # we may run several of them at the same time.
+        logger.debug(
+            f"Running {len(pathways) * len(DESIGN_METHODS)} design units "
+            f"with up to {DESIGN_PROCESSES} concurrent processes"
+        )
+        with ThreadPoolExecutor(max_workers=DESIGN_PROCESSES) as executor:
+            futures = {}
+            for index, pathway in enumerate(pathways, start=1):
+                for key, function, method in DESIGN_METHODS:
+                    stage = f"{key}-{index}"
+                    results = checkpoints.get(stage)
+                    if results is not None:
+                        logger.debug(
+                            f"Resuming with previous results: {method} "
+                            f"(pathway {index}/{len(pathways)})"
+                        )
+                        finish(key, index, results)
+                        continue
+                    logger.debug(
+                        f"Queueing task: {method} "
+                        f"(pathway {index}/{len(pathways)})"
+                    )
+                    future = executor.submit(
+                        function, job, pathway, method, stage
+                    )
+                    futures[future] = (key, index)
+            try:
+                for future in as_completed(futures):
+                    key, index = futures[future]
+                    results = future.result()
+                    checkpoints[f"{key}-{index}"] = results
+                    finish(key, index, results)
+            except Exception:
+                # Don't start any more units for a failed job. Units that are
+                # already running are waited for when leaving the executor.
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # Partial results were stored in the order in which units finished.
+        # Replace them with the complete results in pathway order.
+        for key, container in collected.items():
+            optimization_results[key] = [
+                row for index in sorted(container) for row in container[index]
+            ]
 
         # Save the results
         job.save(status="SUCCESS", result=optimization_results)
+        # OptGene searches end at the deadline of the job at the latest. A job
+        # that completed after its deadline may thus have had its searches cut
+        # short, and an identical job with more time can find better designs.
+        if time.time() < job.deadline:
+            _cache(job, optimization_results)
+        else:
+            logger.info(
+                "Not caching the result of a job that exceeded its time budget"
+            )
+        _store_artifacts(job, optimization_results)
+        finished = True
 
         _notify(job)
     except TaskFailedException:
@@ -106,15 +221,53 @@ def design(connection, channel, delivery_tag, body, ack_message):
             "Task failed; aborting workflow and restarting consumption "
             "from queue."
         )
+        finished = True
+    except Exception as error:
+        # The workflow itself failed, for example, to read or write its
+        # checkpoints or results.
+        logger.error("Design workflow failed; aborting", exc_info=error)
+        try:
+            job.save(status="FAILURE")
+            finished = True
+        except Exception as error:
+            logger.error(
+                "Unable to record the failure of the job", exc_info=error
+            )
     finally:
-        # Acknowledge the message, whether it failed or not.
+        if finished:
+            # The message is acknowledged below and will not be delivered
+            # again.
+            _clear_checkpoints(checkpoints)
+        else:
+            # Neither the results nor the failure could be stored, for
+            # example, because the database is unavailable. Return the message
+            # to the queue after a while, such that the job continues from its
+            # checkpoints.
+            logger.info(
+                f"Returning the job to the queue in {RETRY_DELAY} seconds"
+            )
+            time.sleep(RETRY_DELAY)
         connection.add_callback_threadsafe(
-            functools.partial(ack_message, channel, delivery_tag)
+            functools.partial(
+                ack_message, channel, delivery_tag, requeue=not finished
+            )
         )
 
 
-@task
 def find_product(job):
+    """Look up the product in the index and search for it if that fails."""
+    product = resolve_product(job.product_name, job.source)
+    if product is not None:
+        logger.debug(f"Resolved product {job.product_name} to {product.id}")
+        return product
+    logger.debug(
+        f"Product {job.product_name} is not indexed or ambiguous; searching"
+    )
+    return search_product(job)
+
+
+@task
+def search_product(job):
     # Find the product name via the cameo designer. In a future far, far away
     # this should be a call to a web service.
     return cameo.api.design.translate_product_to_universal_reactions_model_metabolite(  # noqa: E501
@@ -124,88 +277,179 @@ def find_product(job):
 
 @task
 def find_pathways(job, product):
+    """Return the predicted pathways and whether the prediction timed out."""
     predictor = cameo.strain_design.pathway_prediction.PathwayPredictor(
         job.model, universal_model=job.source
     )
-    return predictor.run(
+    # The predictor stops without saying whether the search for the next
+    # pathway timed out or found nothing, so time it instead.
+    last_found = time.monotonic()
+
+    def found(pathway):
+        nonlocal last_found
+        last_found = time.monotonic()
+
+    pathways = predictor.run(
         product,
         max_predictions=job.max_predictions,
-        timeout=120,  # seconds
+        timeout=PATHWAY_TIMEOUT,
+        callback=found,
         silent=True,
     )
+    timed_out = (
+        len(pathways) < job.max_predictions
+        and time.monotonic() - last_found >= PATHWAY_TIMEOUT
+    )
+    return pathways, timed_out
 
 
 @task
-def diff_fva(job, pathway, method):
-    logger.debug("DiffFVA: Optimizing")
-    designs = designer.differential_fva_optimization(pathway, job.model)
-    logger.debug("DiffFVA: Evaluating")
-    results = designer.evaluate_diff_fva(designs, pathway, job.model, method)
+def diff_fva(job, pathway, method, stage):
+    # Apply the pathway once for both optimization and evaluation.
+    with designer.pathway_applied(pathway, job.model):
+        context = PathwayContext(pathway, job.model)
+        logger.debug("DiffFVA: Optimizing")
+        designs = designer.differential_fva_optimization(
+            pathway, job.model, processes=DIFF_FVA_PROCESSES
+        )
+        logger.debug("DiffFVA: Evaluating")
+        results = designer.evaluate_diff_fva(
+            designs, pathway, job.model, method, context
+        )
     # TODO (Moritz Beber): We disable the evaluation of exotic co-factors for
     #  now. As there is an unresolved bug that will get in the way of the user
     #  optimizeview.
     # results = designer.evaluate_exotic_cofactors(results, pathway, job.model)
-    return results
+    return DesignResults.from_rows(results, context)
 
 
 @task
-def opt_gene(job, pathway, method):
-    logger.debug("OptGene: Optimizing")
-    designs = designer.opt_gene(pathway, job.model)
-    logger.debug("OptGene: Evaluating")
-    results = designer.evaluate_opt_gene(designs, pathway, job.model, method)
+def opt_gene(job, pathway, method, stage):
+    # The best knockout sets are stored as the search improves them, such that
+    # an interrupted search can start from them when the job is resumed.
+    checkpoints = Checkpoints(job.job_id)
+    front_stage = f"{stage}-front"
+    seeds = checkpoints.get(front_stage)
+    if seeds:
+        logger.debug(f"OptGene: Resuming with {len(seeds)} knockout sets")
+
+    def store_front(front):
+        try:
+            checkpoints[front_stage] = [
+                knockouts for _, knockouts in front.values()
+            ]
+        except Exception as error:
+            # The search itself is not affected.
+            logger.warning(
+                "Unable to store the best OptGene designs", exc_info=error
+            )
+
+    # Apply the pathway once for both optimization and evaluation.
+    with designer.pathway_applied(pathway, job.model):
+        context = PathwayContext(pathway, job.model)
+        logger.debug("OptGene: Optimizing")
+        max_time = min(OPT_GENE_TIME, job.deadline - time.time())
+        designs = designer.opt_gene(
+            pathway,
+            job.model,
+            max_time,
+            processes=OPT_GENE_PROCESSES,
+            seeds=seeds,
+            callback=store_front,
+        )
+        logger.debug("OptGene: Evaluating")
+        results = designer.evaluate_opt_gene(
+            designs, pathway, job.model, method, context
+        )
     # TODO (Moritz Beber): We disable the evaluation of exotic co-factors for
     #  now. As there is an unresolved bug that will get in the way of the user
     #  optimizeview.
     # results = designer.evaluate_exotic_cofactors(results, pathway, job.model)
-    return results
+    return DesignResults.from_rows(results, context)
 
 
 @task
-def cofactor_swap(job, pathway, method):
+def cofactor_swap(job, pathway, method, stage):
     logger.debug("Cofactor swap: Optimizing")
     designs = designer.cofactor_swap_optimization(pathway, job.model)
+    # The optimization leaves the pathway applied.
+    context = PathwayContext(pathway, job.model)
     logger.debug("Cofactor swap: Evaluating")
     results = designer.evaluate_cofactor_swap(
-        designs, pathway, job.model, method
+        designs, pathway, job.model, method, context
     )
     # TODO (Moritz Beber): We disable the evaluation of exotic co-factors for
     #  now. As there is an unresolved bug that will get in the way of the user
     #  optimizeview.
     # results = designer.evaluate_exotic_cofactors(results, pathway, job.model)
-    return results
-
-
-def _collect_results(results, reactions, metabolites, container):
-    for row in results:
-        # Move the full reaction and metabolite definitions in a dict keyed by
-        # ID to avoid duplicate definitions.
-        for reaction in row.get("heterologous_reactions", []):
-            reactions[reaction.id] = reaction_to_dict(reaction)
-            for metabolite in reaction.metabolites:
-                metabolites[metabolite.id] = metabolite_to_dict(metabolite)
-        for reaction in row.get("synthetic_reactions", []):
-            reactions[reaction.id] = reaction_to_dict(reaction)
-        for metabolite in row.get("exotic_cofactors", []):
-            metabolites[metabolite.id] = metabolite_to_dict(metabolite)
-
-        # Replace reaction/metabolite references with their IDs in the actual
-        # results.
-        row["knockouts"] = [t.id for t in row.get("knockouts", [])]
-        row["manipulations"] = row.get("manipulations", [])
-        row["heterologous_reactions"] = [
-            r.id for r in row.get("heterologous_reactions", [])
-        ]
-        row["synthetic_reactions"] = [
-            r.id for r in row.get("synthetic_reactions", [])
-        ]
-        row["exotic_cofactors"] = [
-            m.id for m in row.get("exotic_cofactors", [])
-        ]
-
-        # Add the full result row to the appropriate container
-        # (based on method).
-        container.append(row)
+    return DesignResults.from_rows(results, context)
+
+
+# The design methods that are applied to every predicted pathway. Each is
+# called with the job, the pathway, the name of the method and the checkpoint
+# stage under which the results of the unit are stored.
+DESIGN_METHODS = (
+    ("diff_fva", diff_fva, "PathwayPredictor+DifferentialFVA"),
+    ("opt_gene", opt_gene, "PathwayPredictor+OptGene"),
+    ("cofactor_swap", cofactor_swap, "PathwayPredictor+CofactorSwap"),
+)
+
+
+def _cached_result(job):
+    try:
+        return load_cached_result(job)
+    except Exception as error:
+        # Run the job as usual instead.
+        logger.warning("Unable to load a cached result", exc_info=error)
+        return None
+
+
+def _cache(job, result):
+    try:
+        store_result(job, result)
+    except Exception as error:
+        # The job itself is done; a failure to cache its result should not mark
+        # it as failed.
+        logger.warning("Unable to cache the result of the job", exc_info=error)
+
+
+def _predictions(result):
+    return [
+        prediction for key, _, _ in DESIGN_METHODS for prediction in result[key]
+    ]
+
+
+def _store_artifacts(job, result):
+    try:
+        job.save_artifacts(_predictions(result))
+    except Exception as error:
+        # Exports build the files themselves if they are missing.
+        logger.warning(
+            "Unable to store the export files of the job", exc_info=error
+        )
+
+
+def _clear_checkpoints(checkpoints):
+    try:
+        checkpoints.clear()
+    except Exception as error:
+        # They are pruned when the worker starts the next time.
+        logger.warning("Unable to remove the checkpoints", exc_info=error)
+
+
+def _cached_pathways(job, product):
+    try:
+        return load_cached_pathways(job, product)
+    except Exception as error:
+        logger.warning("Unable to load cached pathways", exc_info=error)
+        return None
+
+
+def _cache_pathways(job, product, pathways, timed_out):
+    try:
+        store_pathways(job, product, pathways, timed_out)
+    except Exception as error:
+        logger.warning("Unable to cache the predicted pathways", exc_info=error)
 
 
 def _notify(job):
@@ -0,0 +1,99 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the checkpoints of design jobs."""
+
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from metabolic_ninja.models import DesignCheckpoint
+from metabolic_ninja.worker import checkpoints as checkpoints_module
+from metabolic_ninja.worker.checkpoints import Checkpoints
+
+
+NOW = datetime(2020, 1, 8, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def worker_session(session, monkeypatch):
+    """Let the checkpoints use the session of the test."""
+
+    @contextmanager
+    def db_session():
+        yield session
+
+    monkeypatch.setattr(checkpoints_module, "db_session", db_session)
+    monkeypatch.setattr(checkpoints_module, "tz_aware_now", lambda: NOW)
+    return session
+
+
+def test_get_set(worker_session):
+    checkpoints = Checkpoints(1)
+    assert "product" not in checkpoints
+    assert checkpoints.get("product") is None
+    with pytest.raises(KeyError):
+        checkpoints["product"]
+    checkpoints["product"] = {"id": "MNXM1"}
+    assert "product" in checkpoints
+    assert checkpoints["product"] == {"id": "MNXM1"}
+    checkpoints["product"] = {"id": "MNXM2"}
+    assert checkpoints.get("product") == {"id": "MNXM2"}
+    assert "product" not in Checkpoints(2)
+
+
+def test_get_unreadable(worker_session):
+    worker_session.add(DesignCheckpoint(job_id=1, stage="product", data=b""))
+    worker_session.commit()
+    assert Checkpoints(1).get("product", "default") == "default"
+
+
+def test_clear(worker_session):
+    checkpoints = Checkpoints(1)
+    checkpoints["product"] = 1
+    checkpoints["pathways"] = 2
+    Checkpoints(2)["product"] = 3
+    checkpoints.clear()
+    assert "product" not in checkpoints
+    assert "pathways" not in checkpoints
+    assert Checkpoints(2)["product"] == 3
+
+
+def test_prune(worker_session):
+    day = timedelta(days=1)
+    worker_session.add_all(
+        [
+            # A stale job.
+            DesignCheckpoint(
+                job_id=1, stage="product", data=b"", updated=NOW - 3 * day
+            ),
+            # A job with a recent stage is kept entirely.
+            DesignCheckpoint(
+                job_id=2, stage="product", data=b"", updated=NOW - 3 * day
+            ),
+            DesignCheckpoint(
+                job_id=2, stage="pathways", data=b"", updated=NOW - day
+            ),
+        ]
+    )
+    worker_session.commit()
+    Checkpoints.prune(2 * day.total_seconds())
+    remaining = {
+        (checkpoint.job_id, checkpoint.stage)
+        for checkpoint in worker_session.query(DesignCheckpoint)
+    }
+    assert remaining == {(2, "product"), (2, "pathways")}
@@ -15,10 +15,16 @@
 
 """Test expected functioning of the OpenAPI docs endpoints."""
 
+from io import BytesIO
+from zipfile import ZipFile
 
 import pytest
+from jose import jwt
+from werkzeug.exceptions import NotFound
 
-from metabolic_ninja.models import DesignJob
+from metabolic_ninja.catalog import add_definitions
+from metabolic_ninja.models import DesignJob, DesignPrediction
+from metabolic_ninja.resources import PredictionJobsResource
 
 
 def test_docs(client):
@@ -64,6 +70,51 @@ def test_get_predictions(client, session):
         assert job["created"] == expect.created.isoformat()
 
 
+def test_pagination_headers_are_exposed(app, client, session):
+    """Expect browsers to be allowed to read the pagination headers."""
+    origin = app.config["CORS_ORIGINS"][0]
+    response = client.get("/predictions", headers={"Origin": origin})
+    exposed = response.headers["Access-Control-Expose-Headers"].split(", ")
+    assert set(exposed) == {"X-Next-Cursor", "X-Total-Count"}
+
+
+def test_paginate_predictions(client, session):
+    """Expect pages of jobs that neither overlap nor skip any job."""
+    jobs = [
+        DesignJob(
+            organism_id=1,
+            model_id=2,
+            product_name="vanillin",
+            max_predictions=1,
+            status=status,
+        )
+        for status in ("SUCCESS", "PENDING", "SUCCESS")
+    ]
+    for job in jobs:
+        session.add(job)
+        session.commit()
+    response = client.get("/predictions?limit=2")
+    assert response.status_code == 200
+    first = [job["id"] for job in response.get_json(cache=False)]
+    assert first == [jobs[2].id, jobs[1].id]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/predictions?limit=2&cursor={cursor}")
+    assert [job["id"] for job in response.get_json(cache=False)] == [jobs[0].id]
+    assert "X-Next-Cursor" not in response.headers
+    response = client.get("/predictions?status=SUCCESS&order=asc")
+    assert [job["id"] for job in response.get_json(cache=False)] == [
+        jobs[0].id,
+        jobs[2].id,
+    ]
+    response = client.get("/predictions?limit=1001")
+    assert response.status_code == 422
+    response = client.get("/predictions?cursor=invalid")
+    assert response.status_code == 422
+    assert response.get_json(cache=False) == {
+        "cursor": ["Invalid cursor 'invalid'."]
+    }
+
+
 @pytest.mark.parametrize(
     "status, code",
     [
@@ -97,3 +148,238 @@ def test_get_single_prediction(client, session, status, code):
     assert job["max_predictions"] == expect.max_predictions
     assert job["status"] == expect.status
     assert job["created"] == expect.created.isoformat()
+
+
+def test_get_partial_prediction(client, session):
+    """Expect partial results of a running job to be served."""
+    result = {
+        "diff_fva": [{"id": "a", "method": "PathwayPredictor+DifferentialFVA"}],
+        "opt_gene": [],
+        "cofactor_swap": [],
+        "reactions": {},
+        "metabolites": {},
+        "target": "DM_vanillin",
+        "progress": {"pathways_done": 0, "pathways_total": 2},
+    }
+    expect = DesignJob(
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=2,
+        status="STARTED",
+        result=result,
+    )
+    session.add(expect)
+    session.commit()
+    response = client.get(f"/predictions/{expect.id}")
+    assert response.status_code == 202
+    job = response.get_json(cache=False)
+    assert job["status"] == "STARTED"
+    assert job["result"] == result
+
+
+def test_get_prediction_resolves_definitions(client, session):
+    """Expect the definitions that a result refers to to be filled in."""
+    reaction = {"id": "MNXR1", "name": "Reaction", "metabolites": {"a": -1}}
+    metabolite = {"id": "a", "name": "A", "compartment": "c"}
+    reactions = add_definitions(session, {"MNXR1": reaction})
+    result = {
+        "diff_fva": [],
+        "opt_gene": [],
+        "cofactor_swap": [],
+        "reactions": reactions,
+        # Results stored before the catalog contain the definitions.
+        "metabolites": {"a": metabolite},
+        "target": "DM_vanillin",
+        "progress": {"pathways_done": 1, "pathways_total": 1},
+    }
+    expect = DesignJob(
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=1,
+        status="SUCCESS",
+        result=result,
+    )
+    session.add(expect)
+    session.commit()
+    response = client.get(f"/predictions/{expect.id}")
+    assert response.status_code == 200
+    job = response.get_json(cache=False)
+    assert job["result"]["reactions"] == {"MNXR1": reaction}
+    assert job["result"]["metabolites"] == {"a": metabolite}
+
+
+def test_list_designs(client, session):
+    """Expect the designs of a job ordered by fitness."""
+    job = DesignJob(
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=1,
+        status="SUCCESS",
+    )
+    session.add(job)
+    session.commit()
+    for id, method, fitness in [
+        ("a", "PathwayPredictor+OptGene", 0.1),
+        ("b", "PathwayPredictor+CofactorSwap", 0.3),
+        ("c", "PathwayPredictor+OptGene", 0.2),
+    ]:
+        session.add(
+            DesignPrediction(
+                id=id,
+                job_id=job.id,
+                method=method,
+                fitness=fitness,
+                design={"id": id, "method": method, "fitness": fitness},
+            )
+        )
+    session.commit()
+    response = client.get(f"/predictions/{job.id}/designs")
+    assert response.status_code == 200
+    assert [d["id"] for d in response.get_json(cache=False)] == ["b", "c", "a"]
+    response = client.get(
+        f"/predictions/{job.id}/designs?method=PathwayPredictor%2BOptGene"
+        f"&limit=1"
+    )
+    assert [d["id"] for d in response.get_json(cache=False)] == ["c"]
+    assert response.headers["X-Total-Count"] == "2"
+    response = client.get(f"/predictions/export/{job.id}?prediction_ids[]=x")
+    assert response.status_code == 404
+
+
+def test_export_designs(client, session):
+    """Expect a zip archive with a CSV and an Excel file per design."""
+    job = DesignJob(
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=1,
+        status="SUCCESS",
+    )
+    session.add(job)
+    session.commit()
+    design = {
+        "id": "a",
+        "method": "PathwayPredictor+CofactorSwap",
+        "fitness": 0.1,
+        "manipulations": [
+            {
+                "id": "R1",
+                "from": ["nad_c", "nadh_c"],
+                "to": ["nadp_c", "nadph_c"],
+            }
+        ],
+        "targets": {
+            "R1": {
+                "name": "Reaction",
+                "subsystem": "",
+                "gpr": "",
+                "definition_of_stoichiometry": "A --> B",
+            }
+        },
+    }
+    session.add(
+        DesignPrediction(
+            id="a",
+            job_id=job.id,
+            method=design["method"],
+            fitness=design["fitness"],
+            design=design,
+        )
+    )
+    session.commit()
+    response = client.get(f"/predictions/export/{job.id}?prediction_ids[]=a")
+    assert response.status_code == 200
+    assert response.content_type == "application/zip"
+    archive = ZipFile(BytesIO(response.get_data()))
+    assert archive.namelist() == ["CofactorSwap-a.csv", "CofactorSwap-a.xlsx"]
+    assert "nad_c -> nadp_c" in archive.read("CofactorSwap-a.csv").decode()
+
+
+def test_export_designs_is_cached(client, session):
+    """Expect a repeated export to send the archive of the first one."""
+    job = DesignJob(
+        organism_id=1,
+        model_id=2,
+        product_name="vanillin",
+        max_predictions=1,
+        status="SUCCESS",
+    )
+    session.add(job)
+    session.commit()
+    prediction = DesignPrediction(
+        id="a",
+        job_id=job.id,
+        method="PathwayPredictor+OptGene",
+        fitness=0.1,
+        design={
+            "id": "a",
+            "method": "PathwayPredictor+OptGene",
+            "targets": {},
+        },
+    )
+    session.add(prediction)
+    session.commit()
+    url = f"/predictions/export/{job.id}?prediction_ids[]=a"
+    first = client.get(url).get_data()
+    # The results of a completed job never change, so the archive is sent
+    # without looking at the predictions again.
+    session.delete(prediction)
+    session.commit()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_data() == first
+    response = client.get(f"/predictions/export/{job.id}?prediction_ids[]=b")
+    assert response.status_code == 404
+
+
+def test_accept_unknown_product(app, client, monkeypatch):
+    """Expect a job for a product that is not indexed to be accepted."""
+
+    def retrieve_model_json(model_id, headers):
+        raise NotFound(f"No model with id {model_id}.")
+
+    # The model is retrieved after the request has been validated.
+    monkeypatch.setattr(
+        PredictionJobsResource,
+        "retrieve_model_json",
+        staticmethod(retrieve_model_json),
+    )
+    token = jwt.encode(
+        {"prj": {"1": "write"}}, app.config["JWT_PRIVATE_KEY"], "RS512"
+    )
+    response = client.post(
+        "/predictions",
+        json={
+            "model_id": 2,
+            "organism_id": 1,
+            "project_id": 1,
+            # cameo's search finds the misspelled name.
+            "product_name": "vanilin",
+            "max_predictions": 1,
+            "bigg": True,
+            "rhea": False,
+            "aerobic": True,
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 404
+
+
+def test_search_products(client):
+    """Expect a page of matching products with caching headers."""
+    response = client.get("/products?query=glucose&match=substring&limit=5")
+    assert response.status_code == 200
+    data = response.get_json(cache=False)
+    assert 0 < len(data) <= 5
+    assert all("glucose" in product["name"].lower() for product in data)
+    assert int(response.headers["X-Total-Count"]) >= len(data)
+    assert "max-age" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/products?query=glucose&match=substring&limit=5",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
@@ -0,0 +1,95 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the pathway cache."""
+
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from metabolic_ninja.models import PathwayCache
+from metabolic_ninja.worker import cache
+
+
+@pytest.fixture
+def worker_session(session, monkeypatch):
+    """Let the cache use the session of the test and plain pathways."""
+
+    @contextmanager
+    def db_session():
+        yield session
+
+    monkeypatch.setattr(cache, "db_session", db_session)
+    monkeypatch.setattr(cache, "pathway_to_dict", dict)
+    monkeypatch.setattr(cache, "pathway_from_dict", dict)
+    return session
+
+
+PRODUCT = SimpleNamespace(id="MNXM1")
+
+
+def make_job(max_predictions):
+    return SimpleNamespace(
+        job_id=1,
+        model_hash="model",
+        aerobic=True,
+        bigg=True,
+        rhea=False,
+        max_predictions=max_predictions,
+    )
+
+
+def make_pathways(count):
+    return [{"id": str(index)} for index in range(count)]
+
+
+def test_larger_prediction_serves_smaller_jobs(worker_session):
+    cache.store_pathways(make_job(4), PRODUCT, make_pathways(4), False)
+    assert cache.load_cached_pathways(make_job(2), PRODUCT) == make_pathways(2)
+    assert cache.load_cached_pathways(make_job(4), PRODUCT) == make_pathways(4)
+    assert cache.load_cached_pathways(make_job(5), PRODUCT) is None
+
+
+def test_timed_out_prediction_is_incomplete(worker_session):
+    # The prediction of up to four pathways found only two before the timeout.
+    cache.store_pathways(make_job(4), PRODUCT, make_pathways(2), True)
+    assert cache.load_cached_pathways(make_job(4), PRODUCT) is None
+    assert cache.load_cached_pathways(make_job(3), PRODUCT) is None
+    assert cache.load_cached_pathways(make_job(2), PRODUCT) == make_pathways(2)
+
+
+def test_complete_prediction_serves_any_job(worker_session):
+    # The prediction of up to four pathways found the only two there are.
+    cache.store_pathways(make_job(4), PRODUCT, make_pathways(2), False)
+    assert cache.load_cached_pathways(make_job(4), PRODUCT) == make_pathways(2)
+    assert cache.load_cached_pathways(make_job(9), PRODUCT) == make_pathways(2)
+    assert cache.load_cached_pathways(make_job(1), PRODUCT) == make_pathways(1)
+
+
+def test_larger_prediction_supersedes_smaller_ones(worker_session):
+    cache.store_pathways(make_job(4), PRODUCT, make_pathways(2), True)
+    cache.store_pathways(make_job(3), PRODUCT, make_pathways(3), False)
+    entries = worker_session.query(PathwayCache).all()
+    assert [entry.pathway_count for entry in entries] == [3]
+
+
+def test_complete_prediction_is_kept(worker_session):
+    cache.store_pathways(make_job(4), PRODUCT, make_pathways(2), False)
+    cache.store_pathways(make_job(2), PRODUCT, make_pathways(2), False)
+    entries = worker_session.query(PathwayCache).all()
+    assert sorted(entry.max_predictions for entry in entries) == [2, 4]
+    assert cache.load_cached_pathways(make_job(5), PRODUCT) == make_pathways(2)
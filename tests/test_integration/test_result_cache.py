@@ -0,0 +1,107 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the result cache."""
+
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+from metabolic_ninja.models import DesignResultCache
+from metabolic_ninja.worker import cache
+
+
+@pytest.fixture
+def worker_session(session, monkeypatch):
+    """Let the cache use the session of the test."""
+
+    @contextmanager
+    def db_session():
+        yield session
+
+    monkeypatch.setattr(cache, "db_session", db_session)
+    # Strictly increasing times such that the order of use is unambiguous.
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    ticks = count()
+    monkeypatch.setattr(
+        cache, "tz_aware_now", lambda: start + timedelta(seconds=next(ticks))
+    )
+    return session
+
+
+def make_job(product_name):
+    return SimpleNamespace(
+        job_id=1,
+        model_hash="model",
+        biomass_reaction_id="BIOMASS",
+        product_name=product_name,
+        max_predictions=1,
+        aerobic=True,
+        bigg=True,
+        rhea=False,
+        solver="glpk",
+    )
+
+
+def make_result():
+    return {
+        "diff_fva": [{"id": "a", "method": "PathwayPredictor+DifferentialFVA"}],
+        "opt_gene": [{"id": "b", "method": "PathwayPredictor+OptGene"}],
+        "cofactor_swap": [],
+        "reactions": {},
+        "metabolites": {},
+    }
+
+
+def test_hit_gets_new_prediction_ids(worker_session):
+    job = make_job("vanillin")
+    cache.store_result(job, make_result())
+    result = cache.load_cached_result(job)
+    assert [p["method"] for p in result["diff_fva"] + result["opt_gene"]] == [
+        "PathwayPredictor+DifferentialFVA",
+        "PathwayPredictor+OptGene",
+    ]
+    assert result["diff_fva"][0]["id"] != "a"
+    assert result["opt_gene"][0]["id"] != "b"
+    # The cached result itself is unchanged.
+    assert cache.load_cached_result(job)["diff_fva"][0]["id"] not in (
+        "a",
+        result["diff_fva"][0]["id"],
+    )
+
+
+def test_miss(worker_session):
+    cache.store_result(make_job("vanillin"), make_result())
+    assert cache.load_cached_result(make_job("succinate")) is None
+
+
+def test_least_recently_used_results_are_evicted(worker_session, monkeypatch):
+    monkeypatch.setattr(cache, "RESULT_CACHE_SIZE", 2)
+    first, second, third = (
+        make_job(name) for name in ("vanillin", "succinate", "lactate")
+    )
+    cache.store_result(first, make_result())
+    cache.store_result(second, make_result())
+    # Using the first result makes the second one the least recently used.
+    assert cache.load_cached_result(first) is not None
+    cache.store_result(third, make_result())
+    assert worker_session.query(DesignResultCache).count() == 2
+    assert cache.load_cached_result(second) is None
+    assert cache.load_cached_result(first) is not None
+    assert cache.load_cached_result(third) is not None
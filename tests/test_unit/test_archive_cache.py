@@ -0,0 +1,50 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the archive cache."""
+
+
+from metabolic_ninja.archive_cache import ArchiveCache
+
+
+def test_collect_caches_complete_archive():
+    cache = ArchiveCache(2 ** 10, 2 ** 10)
+    chunks = list(cache.collect("key", iter([b"ab", b"cd"])))
+    assert chunks == [b"ab", b"cd"]
+    assert cache.get("key") == b"abcd"
+
+
+def test_collect_skips_large_archive():
+    cache = ArchiveCache(2 ** 10, 3)
+    chunks = iter([b"ab", b"cd", b"ef"])
+    assert list(cache.collect("key", chunks)) == [b"ab", b"cd", b"ef"]
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_collect_skips_incomplete_archive():
+    cache = ArchiveCache(2 ** 10, 2 ** 10)
+    stream = cache.collect("key", iter([b"ab", b"cd"]))
+    assert next(stream) == b"ab"
+    # The client disconnects and the response closes the stream.
+    stream.close()
+    assert cache.get("key") is None
+
+
+def test_archive_size_is_bounded_by_cache_size():
+    cache = ArchiveCache(3, 2 ** 10)
+    assert cache.max_archive_size == 3
+    assert not cache.put("key", b"abcd")
+    assert cache.put("key", b"abc")
@@ -0,0 +1,46 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the size-bounded byte cache."""
+
+
+from metabolic_ninja.bytes_cache import BytesCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = BytesCache(2 ** 10)
+    assert cache.put("a", b"a" * 400)
+    assert cache.put("b", b"b" * 400)
+    cache.get("a")
+    assert cache.put("c", b"c" * 400)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a" * 400
+    assert len(cache) == 2
+    assert cache.size == 800
+
+
+def test_replacing_an_entry_updates_the_size():
+    cache = BytesCache(2 ** 10)
+    cache.put("a", b"a" * 400)
+    cache.put("a", b"a" * 100)
+    assert len(cache) == 1
+    assert cache.size == 100
+
+
+def test_oversized_entries_are_not_cached():
+    cache = BytesCache(10)
+    assert not cache.put("a", b"a" * 11)
+    assert len(cache) == 0
+    assert cache.size == 0
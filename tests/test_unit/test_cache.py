@@ -0,0 +1,62 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the cache key of design job results."""
+
+
+from types import SimpleNamespace
+
+import pytest
+
+from metabolic_ninja.worker.cache import result_cache_key
+
+
+def make_job(**kwargs):
+    inputs = {
+        "model_hash": "model",
+        "biomass_reaction_id": "BIOMASS",
+        "product_name": "vanillin",
+        "max_predictions": 4,
+        "aerobic": True,
+        "bigg": True,
+        "rhea": False,
+        "solver": "glpk",
+        "job_id": 1,
+        "user_email": "user@example.com",
+    }
+    inputs.update(kwargs)
+    return SimpleNamespace(**inputs)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"model_hash": "other"},
+        {"biomass_reaction_id": "OTHER"},
+        {"product_name": "succinate"},
+        {"max_predictions": 5},
+        {"aerobic": False},
+        {"bigg": False},
+        {"rhea": True},
+        {"solver": "cplex"},
+    ],
+)
+def test_inputs_change_key(change):
+    assert result_cache_key(make_job(**change)) != result_cache_key(make_job())
+
+
+def test_job_details_do_not_change_key():
+    job = make_job(job_id=2, user_email="other@example.com")
+    assert result_cache_key(job) == result_cache_key(make_job())
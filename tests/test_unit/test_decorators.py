@@ -0,0 +1,304 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the worker pool that executes tasks."""
+
+
+import os
+import pickle
+import subprocess
+
+import pytest
+from cobra import Reaction
+from cobra.test import create_test_model
+
+from metabolic_ninja.worker import decorators
+from metabolic_ninja.worker.decorators import (
+    Payload,
+    TaskFailedException,
+    WorkerPool,
+    task,
+)
+
+
+class Job:
+    """Stand in for a design job that records how often it is sent."""
+
+    def __init__(self, job_id=1, model=None):
+        self.job_id = job_id
+        self.model = create_test_model("textbook") if model is None else model
+        self.status = None
+        self.pickled = 0
+        self.deadline = None
+
+    def __getstate__(self):
+        self.pickled += 1
+        return {
+            "job_id": self.job_id,
+            "model": self.model,
+            "deadline": self.deadline,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, status=None, pickled=0)
+
+    def save(self, **kwargs):
+        self.status = kwargs["status"]
+
+
+@task
+def add(job, a, b=0):
+    return os.getpid(), a + b
+
+
+@task
+def deadline(job):
+    return job.deadline
+
+
+@task
+def fail(job):
+    raise RuntimeError("Task failed.")
+
+
+@task
+def crash(job):
+    os._exit(1)
+
+
+@task
+def modify_model(job):
+    model = job.model
+    model.reactions.PGI.bounds = (0, 0)
+    model.genes.b1241.knock_out()
+    model.objective = model.reactions.ATPM
+    model.add_reactions([Reaction("NEW")])
+    model.add_boundary(model.metabolites.glc__D_e, type="sink")
+    return model.slim_optimize()
+
+
+@task
+def large_result(job, size):
+    return b"x" * size
+
+
+@task
+def describe_model(job):
+    return describe(job.model)
+
+
+def describe(model):
+    return (
+        sorted(reaction.id for reaction in model.reactions),
+        {reaction.id: reaction.bounds for reaction in model.reactions},
+        str(model.objective.expression),
+        round(model.slim_optimize(), 6),
+    )
+
+
+@pytest.fixture
+def payload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(decorators, "PAYLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(decorators, "PIPE_LIMIT", 2 ** 10)
+    return tmp_path
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    pools = []
+
+    def make_pool(processes=1, max_tasks=None):
+        pool = WorkerPool(processes, max_tasks)
+        pools.append(pool)
+        monkeypatch.setattr(decorators, "_pool", pool)
+        return pool
+
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+
+def test_task_result(make_pool):
+    make_pool()
+    pid, result = add(Job(), 1, b=2)
+    assert result == 3
+    assert pid != os.getpid()
+
+
+def test_job_is_sent_once(make_pool):
+    make_pool()
+    job = Job()
+    first, _ = add(job, 1)
+    second, _ = add(job, 2)
+    assert first == second
+    assert job.pickled == 1
+
+
+def test_redelivered_job_has_new_deadline(make_pool):
+    make_pool()
+    assert deadline(Job()) is None
+    # The same job delivered again is not sent to the worker process again,
+    # but its new deadline is.
+    job = Job()
+    job.deadline = 1000.0
+    assert deadline(job) == 1000.0
+    assert job.pickled == 0
+
+
+def test_failed_task(make_pool):
+    make_pool()
+    job = Job()
+    before, _ = add(job, 1)
+    with pytest.raises(TaskFailedException):
+        fail(job)
+    # The worker process that failed is replaced.
+    after, _ = add(job, 1)
+    assert after != before
+
+
+def test_worker_retires_after_max_tasks(make_pool):
+    make_pool(max_tasks=2)
+    job = Job()
+    pids = [add(job, index)[0] for index in range(3)]
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_crashed_worker_is_replaced(make_pool):
+    pool = make_pool(processes=2)
+    job = Job()
+    with pytest.raises(TaskFailedException):
+        crash(job)
+    assert job.status == "FAILURE"
+    assert len(pool._workers) == 2
+    assert add(job, 1, b=1)[1] == 2
+
+
+def test_model_changes_do_not_leak(make_pool):
+    make_pool()
+    job = Job()
+    expected = describe(job.model)
+    modify_model(job)
+    # The next task of the same job runs in the same process on the same
+    # model and must see it unchanged.
+    assert describe_model(job) == expected
+
+
+def test_small_payload(payload_dir):
+    payload = pickle.loads(pickle.dumps(Payload({"a": [1, 2]})))
+    assert payload.path is None
+    assert payload.load() == {"a": [1, 2]}
+    assert list(payload_dir.iterdir()) == []
+
+
+def test_large_payload(payload_dir):
+    value = b"x" * 2 ** 11
+    payload = pickle.loads(pickle.dumps(Payload(value)))
+    assert payload.data is None
+    assert os.path.isfile(payload.path)
+    assert payload.load() == value
+    assert list(payload_dir.iterdir()) == []
+
+
+def test_discarded_payload(payload_dir):
+    payload = Payload(b"x" * 2 ** 11)
+    payload.discard()
+    payload.discard()
+    assert list(payload_dir.iterdir()) == []
+
+
+def test_unreadable_payload_is_removed(payload_dir):
+    payload = Payload(b"x" * 2 ** 11)
+    with open(payload.path, "wb") as file_:
+        file_.write(b"garbage")
+    with pytest.raises(pickle.UnpicklingError):
+        payload.load()
+    assert list(payload_dir.iterdir()) == []
+
+
+def test_unwritable_payload_is_removed(payload_dir, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device.")
+
+    monkeypatch.setattr(decorators.os, "fdopen", fail)
+    with pytest.raises(OSError):
+        Payload(b"x" * 2 ** 11)
+    assert list(payload_dir.iterdir()) == []
+
+
+def test_full_payload_dir(payload_dir, tmp_path_factory, monkeypatch):
+    temporary = tmp_path_factory.mktemp("temporary")
+    monkeypatch.setattr(decorators.tempfile, "tempdir", str(temporary))
+    fdopen = os.fdopen
+
+    def fail_in_payload_dir(file_descriptor, *args):
+        if os.readlink(f"/proc/self/fd/{file_descriptor}").startswith(
+            str(payload_dir)
+        ):
+            raise OSError("No space left on device.")
+        return fdopen(file_descriptor, *args)
+
+    monkeypatch.setattr(decorators.os, "fdopen", fail_in_payload_dir)
+    payload = Payload(b"x" * 2 ** 11)
+    assert list(payload_dir.iterdir()) == []
+    assert os.path.dirname(payload.path) == str(temporary)
+    assert payload.load() == b"x" * 2 ** 11
+    assert list(temporary.iterdir()) == []
+
+
+def test_unwritable_task_result(make_pool, payload_dir, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device.")
+
+    # Patch before the worker processes are forked.
+    monkeypatch.setattr(decorators.os, "fdopen", fail)
+    make_pool()
+    job = Job()
+    with pytest.raises(TaskFailedException):
+        large_result(job, 2 ** 12)
+    # The failure is reported and the pool replaces the worker process.
+    assert add(job, 1)[1] == 1
+
+
+def test_forked_task_result(payload_dir, monkeypatch):
+    monkeypatch.setattr(decorators, "_pool", None)
+    assert large_result(Job(), 2 ** 12) == b"x" * 2 ** 12
+    with pytest.raises(TaskFailedException):
+        crash(Job())
+
+
+def test_orphaned_payloads_are_pruned(payload_dir):
+    # The parent of this payload, the test runner, is alive.
+    kept = Payload(b"x" * 2 ** 11)
+    finished = subprocess.Popen(["true"])
+    finished.wait()
+    orphan = payload_dir / f"{decorators.PAYLOAD_PREFIX}{finished.pid}-0-x"
+    orphan.write_bytes(b"")
+    # The parent of this payload had the same process ID as the test runner,
+    # like a container's process 1 before the container restarted.
+    reused = payload_dir / f"{decorators.PAYLOAD_PREFIX}{os.getppid()}-1-x"
+    reused.write_bytes(b"")
+    other = payload_dir / "other"
+    other.write_bytes(b"")
+    Payload.prune(str(payload_dir))
+    assert sorted(path.name for path in payload_dir.iterdir()) == sorted(
+        [os.path.basename(kept.path), "other"]
+    )
+
+
+def test_large_task_result(make_pool, payload_dir):
+    make_pool()
+    assert large_result(Job(), 2 ** 12) == b"x" * 2 ** 12
+    assert list(payload_dir.iterdir()) == []
@@ -0,0 +1,241 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the scheduling of the design units of a job."""
+
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from metabolic_ninja.worker import tasks
+from metabolic_ninja.worker.decorators import TaskFailedException
+from metabolic_ninja.worker.results import DesignRecord, DesignResults
+
+
+class FakeJob:
+    job_id = 1
+
+    def __init__(self):
+        self.saved = []
+        self.appended = []
+
+    def save(self, **kwargs):
+        self.saved.append(kwargs)
+
+    def append_results(self, key, rows, reactions, metabolites, progress):
+        self.appended.append([row["id"] for row in rows])
+        return reactions, metabolites
+
+
+class FakeCheckpoints(dict):
+    instances = []
+
+    def __init__(self, job_id):
+        super().__init__()
+        self.cleared = False
+        self.instances.append(self)
+
+    def clear(self):
+        super().clear()
+        self.cleared = True
+
+
+class FakeConnection:
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+
+def unit(key):
+    def run(job, pathway, method, stage):
+        return DesignResults(
+            [DesignRecord(f"{key}-{pathway.index}", method)], {}, {}
+        )
+
+    return run
+
+
+@pytest.fixture
+def job(monkeypatch):
+    job = FakeJob()
+    monkeypatch.setattr(
+        tasks, "Job", SimpleNamespace(deserialize=lambda data: job)
+    )
+    FakeCheckpoints.instances = []
+    monkeypatch.setattr(tasks, "Checkpoints", FakeCheckpoints)
+    monkeypatch.setattr(tasks, "_cached_result", lambda job: None)
+    monkeypatch.setattr(tasks, "_cached_pathways", lambda job, product: None)
+    monkeypatch.setattr(tasks, "find_product", lambda job: "product")
+    for name in ("_cache_pathways", "_cache", "_store_artifacts", "_notify"):
+        monkeypatch.setattr(tasks, name, lambda *args: None)
+    return job
+
+
+def set_pathways(monkeypatch, count):
+    pathways = [
+        SimpleNamespace(index=index, product=SimpleNamespace(id="product"))
+        for index in range(1, count + 1)
+    ]
+    monkeypatch.setattr(
+        tasks, "find_pathways", lambda job, product: (pathways, False)
+    )
+
+
+def run_design(requeue=False):
+    acknowledged = []
+    tasks.design(
+        FakeConnection(),
+        "channel",
+        "tag",
+        "{}",
+        lambda channel, tag, requeue: acknowledged.append((tag, requeue)),
+    )
+    assert acknowledged == [("tag", requeue)]
+
+
+def test_results_in_pathway_order(job, monkeypatch):
+    set_pathways(monkeypatch, 2)
+    second_stored = threading.Event()
+    append_results = job.append_results
+
+    def append_and_signal(key, rows, *args):
+        stored = append_results(key, rows, *args)
+        if [row["id"] for row in rows] == ["diff_fva-2"]:
+            second_stored.set()
+        return stored
+
+    def first_waits(job, pathway, method, stage):
+        # The unit of the first pathway finishes after the results of the
+        # second have been stored.
+        if pathway.index == 1:
+            assert second_stored.wait(10)
+        return unit("diff_fva")(job, pathway, method, stage)
+
+    job.append_results = append_and_signal
+
+    monkeypatch.setattr(tasks, "DESIGN_PROCESSES", 4)
+    monkeypatch.setattr(
+        tasks,
+        "DESIGN_METHODS",
+        (
+            ("diff_fva", first_waits, "DiffFVA"),
+            ("opt_gene", unit("opt_gene"), "OptGene"),
+        ),
+    )
+    run_design()
+    diff_fva = [ids for ids in job.appended if ids[0].startswith("diff")]
+    assert diff_fva == [["diff_fva-2"], ["diff_fva-1"]]
+    final = job.saved[-1]
+    assert final["status"] == "SUCCESS"
+    result = final["result"]
+    assert [row["id"] for row in result["diff_fva"]] == [
+        "diff_fva-1",
+        "diff_fva-2",
+    ]
+    assert [row["id"] for row in result["opt_gene"]] == [
+        "opt_gene-1",
+        "opt_gene-2",
+    ]
+    assert result["progress"] == {"pathways_done": 2, "pathways_total": 2}
+
+
+def test_failed_unit_cancels_the_rest(job, monkeypatch):
+    set_pathways(monkeypatch, 3)
+    calls = []
+
+    def fail(job, pathway, method, stage):
+        calls.append(pathway.index)
+        if pathway.index == 1:
+            raise TaskFailedException()
+        return unit("diff_fva")(job, pathway, method, stage)
+
+    def slow(job, pathway, method, stage):
+        calls.append(pathway.index)
+        # Leave the failure enough time to be noticed.
+        time.sleep(0.2)
+        return unit("opt_gene")(job, pathway, method, stage)
+
+    monkeypatch.setattr(tasks, "DESIGN_PROCESSES", 1)
+    monkeypatch.setattr(
+        tasks,
+        "DESIGN_METHODS",
+        (("diff_fva", fail, "DiffFVA"), ("opt_gene", slow, "OptGene")),
+    )
+    run_design()
+    # The single worker thread may have picked up the next unit before the
+    # failure was noticed, but none of the others are started.
+    assert calls[0] == 1
+    assert len(calls) <= 2
+    assert all(saved.get("status") != "SUCCESS" for saved in job.saved)
+
+
+def test_failed_workflow_is_recorded(job, monkeypatch):
+    set_pathways(monkeypatch, 1)
+
+    def fail(job, pathways, *args):
+        raise RuntimeError("The database went away.")
+
+    job.append_results = fail
+    monkeypatch.setattr(
+        tasks, "DESIGN_METHODS", (("diff_fva", unit("diff_fva"), "DiffFVA"),)
+    )
+    run_design()
+    assert job.saved[-1] == {"status": "FAILURE"}
+    assert FakeCheckpoints.instances[0].cleared
+
+
+def test_unrecorded_failure_is_requeued(job, monkeypatch):
+    set_pathways(monkeypatch, 1)
+
+    def fail(**kwargs):
+        raise RuntimeError("The database went away.")
+
+    job.save = fail
+    monkeypatch.setattr(tasks, "RETRY_DELAY", 0)
+    run_design(requeue=True)
+    # The job continues from its checkpoints when it is delivered again.
+    assert not FakeCheckpoints.instances[0].cleared
+
+
+def test_failure_after_finished_units_is_requeued(job, monkeypatch):
+    set_pathways(monkeypatch, 1)
+    save = job.save
+
+    def fail_after_units(**kwargs):
+        if job.appended:
+            raise RuntimeError("The database went away.")
+        save(**kwargs)
+
+    def fail(job, pathway, method, stage):
+        raise RuntimeError("The unit failed in the worker thread.")
+
+    job.save = fail_after_units
+    monkeypatch.setattr(tasks, "RETRY_DELAY", 0)
+    monkeypatch.setattr(tasks, "DESIGN_PROCESSES", 1)
+    # The first unit finishes and its results are stored before the second
+    # one fails and the failure cannot be recorded.
+    monkeypatch.setattr(
+        tasks,
+        "DESIGN_METHODS",
+        (
+            ("diff_fva", unit("diff_fva"), "DiffFVA"),
+            ("opt_gene", fail, "OptGene"),
+        ),
+    )
+    run_design(requeue=True)
+    assert job.appended == [["diff_fva-1"]]
+    assert not FakeCheckpoints.instances[0].cleared
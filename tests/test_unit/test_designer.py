@@ -0,0 +1,103 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the designer helpers."""
+
+
+from types import SimpleNamespace
+
+from cameo.strain_design.heuristic.evolutionary_based import OptGeneResult
+from cobra import Metabolite, Model, Reaction
+from cobra.test import create_test_model
+from pandas import DataFrame, concat
+
+from metabolic_ninja.worker import designer
+
+
+def test_opt_gene_reports_designs(monkeypatch):
+    monitors = []
+
+    class Monitor(designer.OptGeneMonitor):
+        def __init__(self, callback=None):
+            super().__init__(callback)
+            self.generations = 0
+            monitors.append(self)
+
+        def __call__(self, population, num_generations, num_evaluations, args):
+            self.generations = num_generations
+            super().__call__(population, num_generations, num_evaluations, args)
+
+    monkeypatch.setattr(designer, "OptGeneMonitor", Monitor)
+    model = create_test_model("textbook")
+    model.biomass = "Biomass_Ecoli_core"
+    model.carbon_source = "EX_glc__D_e"
+    # The product is exported by the model already, so there is nothing to add.
+    pathway = SimpleNamespace(product=SimpleNamespace(id="EX_ac_e"))
+    fronts = []
+    # The search starts from a knockout set of a previous search.
+    seeds = [["b0351", "b1241"]]
+    designs = designer.opt_gene(
+        pathway, model, max_time=10, seeds=seeds, callback=fronts.append
+    )
+    assert isinstance(designs, OptGeneResult)
+    assert len(designs) > 0
+    (monitor,) = monitors
+    assert monitor.generations > 0
+    assert monitor.front
+    assert fronts[-1] == monitor.front
+    assert all(fitness > 0 for fitness, _ in monitor.front.values())
+    assert all(
+        set(knockouts) <= {gene.id for gene in model.genes}
+        for _, knockouts in monitor.front.values()
+    )
+
+
+def test_get_target_data_prefers_later_points():
+    model = Model("model")
+    metabolite = Metabolite("a_c", name="A")
+    for rxn_id in ("R1", "R2"):
+        reaction = Reaction(rxn_id, name=f"Reaction {rxn_id}")
+        reaction.add_metabolites({metabolite: -1})
+        model.add_reactions([reaction])
+    panels = concat(
+        [
+            DataFrame(
+                {"flux_reversal": [1, 0], "suddenly_essential": [0, 1]},
+                index=["R1", "R2"],
+            ),
+            DataFrame(
+                {"flux_reversal": [0, 0], "suddenly_essential": [1, 0]},
+                index=["R1", "R2"],
+            ),
+        ],
+        keys=range(2),
+        names=["point", "id"],
+    )
+    targets = DataFrame(
+        [(0, "R1", False), (0, "R2", True), (1, "R1", True)],
+        columns=["point", "id", "knockout"],
+    )
+    result = designer.get_target_data(model, panels, targets)
+    assert result["R1"] == {
+        "name": "Reaction R1",
+        "subsystem": "",
+        "gpr": "",
+        "definition_of_stoichiometry": "A --> ",
+        "flux_reversal": False,
+        "suddenly_essential": True,
+        "knockout": True,
+    }
+    assert result["R2"]["suddenly_essential"] is True
+    assert result["R2"]["knockout"] is True
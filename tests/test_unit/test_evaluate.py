@@ -0,0 +1,107 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the design evaluation."""
+
+
+import pytest
+from cobra.flux_analysis import pfba
+from cobra.test import create_test_model
+
+from metabolic_ninja.worker.evaluate import (
+    DesignEvaluator,
+    StoichiometryChanges,
+)
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = create_test_model("textbook")
+    model.add_boundary(model.metabolites.succ_c, type="demand")
+    return model
+
+
+@pytest.fixture(scope="module")
+def evaluator(model):
+    return DesignEvaluator(
+        model, "DM_succ_c", "EX_glc__D_e", "Biomass_Ecoli_core"
+    )
+
+
+def test_production(model, evaluator):
+    with model:
+        model.objective = "DM_succ_c"
+        expected = model.slim_optimize()
+    production, flux_yield, carbon_yield, _ = evaluator.production()
+    assert production == pytest.approx(expected)
+    # Both yields are scaled to the carbon atoms of succinate and glucose. They
+    # exceed one, since succinate production fixes carbon dioxide.
+    assert flux_yield == pytest.approx(expected * 4 / (10 * 6), rel=1e-4)
+    assert carbon_yield == pytest.approx(flux_yield, rel=1e-4)
+
+
+def test_biomass_coupled_production(model, evaluator):
+    with model:
+        model.objective = "Biomass_Ecoli_core"
+        solution = pfba(model)
+    growth, _ = evaluator.biomass_coupled_production()
+    assert growth == pytest.approx(solution["Biomass_Ecoli_core"])
+
+
+def test_designs_are_reverted(model, evaluator):
+    objective = str(model.objective.expression)
+    with model:
+        model.reactions.EX_glc__D_e.lower_bound = 0
+        assert evaluator.production() == (None, None, None, None)
+        assert evaluator.biomass_coupled_production() == (None, None)
+    assert str(model.objective.expression) == objective
+    assert evaluator.production()[0] > 0
+
+
+def test_evaluate(model, evaluator):
+    objective = str(model.objective.expression)
+    production, biomass_coupled = evaluator.evaluate()
+    assert production == pytest.approx(evaluator.production())
+    assert biomass_coupled == pytest.approx(
+        evaluator.biomass_coupled_production()
+    )
+    assert str(model.objective.expression) == objective
+    assert model.reactions.Biomass_Ecoli_core.lower_bound == 0
+
+
+def test_stoichiometry_changes_are_undone(model):
+    reaction = model.reactions.GAPD
+    nad = model.metabolites.nad_c
+    nadp = model.metabolites.nadp_c
+    variable = reaction.forward_variable
+    expected = model.slim_optimize()
+    with StoichiometryChanges(model) as changes:
+        changes.set(reaction, nadp, reaction.metabolites[nad])
+        changes.set(reaction, nad, 0)
+        coefficients = model.constraints["nadp_c"].get_linear_coefficients(
+            [variable]
+        )
+        assert coefficients[variable] == reaction.metabolites[nad]
+        # The cobrapy objects remain unchanged.
+        assert nadp not in reaction.metabolites
+    coefficients = model.constraints["nad_c"].get_linear_coefficients(
+        [variable]
+    )
+    assert coefficients[variable] == reaction.metabolites[nad]
+    coefficients = model.constraints["nadp_c"].get_linear_coefficients(
+        [variable]
+    )
+    assert coefficients[variable] == 0
+    assert model.slim_optimize() == pytest.approx(expected)
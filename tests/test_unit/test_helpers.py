@@ -256,3 +256,26 @@ def test_identify_exotic_cofactors(model, pathway, exotic_cofactors):
     assert {
         m.id for m in helpers.identify_exotic_cofactors(pathway, model)
     } == exotic_cofactors
+
+
+@pytest.mark.parametrize(
+    "pathway",
+    [
+        "straight_pathway",
+        "straight_pathway_with_cofactors",
+        "straight_pathway_with_cofactors_and_adapters",
+    ],
+    indirect=["pathway"],
+)
+def test_pathway_serialization(pathway):
+    loaded = helpers.pathway_from_dict(helpers.pathway_to_dict(pathway))
+    for attribute in ("reactions", "exchanges", "adapters"):
+        expected = getattr(pathway, attribute)
+        observed = getattr(loaded, attribute)
+        assert [r.id for r in observed] == [r.id for r in expected]
+        for rxn_obs, rxn_exp in zip(observed, expected):
+            assert rxn_obs.bounds == rxn_exp.bounds
+            assert {m.id: c for m, c in rxn_obs.metabolites.items()} == {
+                m.id: c for m, c in rxn_exp.metabolites.items()
+            }
+    assert loaded.product.id == pathway.product.id
@@ -0,0 +1,51 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the model cache."""
+
+
+from metabolic_ninja.worker.model_cache import ModelCache
+
+
+def test_get_returns_copies():
+    cache = ModelCache(2 ** 20)
+    model = {"id": "model", "reactions": ["A", "B"]}
+    cache.put("key", model)
+    copy = cache.get("key")
+    assert copy == model
+    copy["reactions"].append("C")
+    assert cache.get("key") == model
+
+
+def test_missing_key():
+    assert ModelCache(2 ** 20).get("key") is None
+
+
+def test_least_recently_used_models_are_evicted():
+    cache = ModelCache(2 ** 10)
+    cache.put("a", "a" * 400)
+    cache.put("b", "b" * 400)
+    cache.get("a")
+    cache.put("c", "c" * 400)
+    assert len(cache) == 2
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.size <= 2 ** 10
+
+
+def test_oversized_models_are_not_cached():
+    cache = ModelCache(10)
+    cache.put("a", "a" * 100)
+    assert len(cache) == 0
@@ -0,0 +1,147 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the product search."""
+
+
+import pytest
+from cobra import Metabolite, Model
+
+from metabolic_ninja.products import ProductIndex, ProductLookup
+from metabolic_ninja.worker import products
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ProductIndex(
+        [
+            "L-lactate",
+            "D-lactate",
+            "lactose",
+            "Lactaldehyde",
+            "D-glucose",
+            "glucose 6-phosphate",
+            "ATP",
+            "ATP",
+        ]
+    )
+
+
+def test_duplicates_are_removed(index):
+    assert len(index) == 7
+
+
+def test_all_names_without_query(index):
+    total, names = index.search()
+    assert total == 7
+    assert names[0] == "ATP"
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("lact", ["Lactaldehyde", "lactose"]),
+        ("LACT", ["Lactaldehyde", "lactose"]),
+        ("glucose  6", ["glucose 6-phosphate"]),
+        ("xyz", []),
+    ],
+)
+def test_prefix(index, query, expected):
+    assert index.search(query)[1] == expected
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("lactate", ["D-lactate", "L-lactate"]),
+        ("ucos", ["D-glucose", "glucose 6-phosphate"]),
+        ("tp", ["ATP"]),
+    ],
+)
+def test_substring(index, query, expected):
+    assert index.search(query, match="substring")[1] == expected
+
+
+def test_fuzzy(index):
+    total, names = index.search("glukose", match="fuzzy")
+    assert set(names) == {"D-glucose", "glucose 6-phosphate"}
+
+
+def test_pagination(index):
+    total, names = index.search("lact", match="substring", offset=1, limit=2)
+    assert total == 4
+    assert names == ["L-lactate", "Lactaldehyde"]
+
+
+def test_index_contains(index):
+    assert "d-GLUCOSE" in index
+    assert "glucose" not in index
+
+
+@pytest.fixture(scope="module")
+def lookup():
+    vanillin = Metabolite("MNXM1", name="Vanillin")
+    vanillin.annotation = {
+        "bigg.metabolite": "vanln",
+        "chebi": ["CHEBI:18346"],
+        "sbo": "SBO:0000247",
+        "mass": "152.1473",
+    }
+    lactate = Metabolite("MNXM2", name="L-lactate")
+    other = Metabolite("MNXM3", name="L-lactate")
+    other.annotation = {"source": "bigg:lac__L", "sbo": "SBO:0000247"}
+    return ProductLookup.from_metabolites([vanillin, lactate, other])
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("vanillin", ["MNXM1"]),
+        ("MNXM1", ["MNXM1"]),
+        ("vanln", ["MNXM1"]),
+        ("chebi:18346", ["MNXM1"]),
+        ("L-lactate", ["MNXM2", "MNXM3"]),
+        ("bigg:lac__L", ["MNXM3"]),
+        ("SBO:0000247", []),
+        ("152.1473", []),
+        ("unknown", []),
+    ],
+)
+def test_lookup(lookup, name, expected):
+    assert lookup.get(name) == expected
+    assert (name in lookup) == bool(expected)
+
+
+def test_lookup_round_trip(lookup, tmp_path):
+    path = str(tmp_path / "product_index.json")
+    lookup.to_json(path)
+    loaded = ProductLookup.from_json(path)
+    assert len(loaded) == len(lookup)
+    assert loaded.get("Vanillin") == ["MNXM1"]
+
+
+def test_resolve_product(lookup, monkeypatch):
+    monkeypatch.setattr(products, "_lookups", {"universal": lookup})
+    monkeypatch.setattr(products, "PRODUCT_LOOKUP_PATH", "missing.json")
+    source = Model("universal")
+    source.add_metabolites(
+        [Metabolite(identifier) for identifier in ("MNXM1", "MNXM2", "MNXM3")]
+    )
+    assert products.resolve_product("vanln", source).id == "MNXM1"
+    # The search of cameo decides between several metabolites of the name.
+    assert products.resolve_product("L-lactate", source) is None
+    source.remove_metabolites([source.metabolites.MNXM3])
+    assert products.resolve_product("L-lactate", source).id == "MNXM2"
+    assert products.resolve_product("unknown", source) is None
@@ -0,0 +1,97 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the compact design results passed between processes."""
+
+
+import pickle
+from types import SimpleNamespace
+
+from cobra import Metabolite, Reaction
+
+from metabolic_ninja.worker.results import DesignRecord, DesignResults
+
+
+def make_row(id, heterologous, synthetic, cofactors):
+    return {
+        "id": id,
+        "method": "PathwayPredictor+OptGene",
+        "knockouts": [SimpleNamespace(id="PGI")],
+        "manipulations": [],
+        "heterologous_reactions": heterologous,
+        "synthetic_reactions": synthetic,
+        "exotic_cofactors": cofactors,
+        "fitness": 0.5,
+        "yield": 0.2,
+        "product": 1.0,
+        "biomass": 0.1,
+        "targets": {"PGI": {"name": "PGI"}},
+    }
+
+
+def test_record_round_trip():
+    record = DesignRecord(
+        "a", "PathwayPredictor+OptGene", knockouts=["PGI"], fitness=0.5
+    )
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy.to_dict() == record.to_dict()
+    assert copy.to_dict()["yield"] is None
+    assert copy.to_dict()["targets"] == {}
+
+
+def test_from_rows():
+    a = Metabolite("a_c")
+    b = Metabolite("b_c")
+    cofactor = Metabolite("nadp_c")
+    heterologous = Reaction("MNXR1")
+    heterologous.add_metabolites({a: -1, b: 1})
+    synthetic = Reaction("DM_b_c")
+    synthetic.add_metabolites({b: -1})
+    rows = [
+        make_row("1", [heterologous], [synthetic], [cofactor]),
+        make_row("2", [heterologous], [], []),
+    ]
+    results = pickle.loads(pickle.dumps(DesignResults.from_rows(rows)))
+    assert len(results) == 2
+    assert set(results.reactions) == {"MNXR1", "DM_b_c"}
+    assert set(results.metabolites) == {"a_c", "b_c", "nadp_c"}
+    design = results.designs[0].to_dict()
+    assert design["knockouts"] == ["PGI"]
+    assert design["heterologous_reactions"] == ["MNXR1"]
+    assert design["synthetic_reactions"] == ["DM_b_c"]
+    assert design["exotic_cofactors"] == ["nadp_c"]
+    assert design["yield"] == 0.2
+    assert results.designs[1].to_dict()["synthetic_reactions"] == []
+
+
+def test_from_rows_uses_context():
+    heterologous = Reaction("MNXR1")
+    heterologous.add_metabolites({Metabolite("a_c"): -1})
+    context = SimpleNamespace(
+        reactions={"MNXR1": {"id": "MNXR1", "from": "context"}},
+        metabolites={"a_c": {"id": "a_c", "from": "context"}},
+    )
+    results = DesignResults.from_rows(
+        [make_row("1", [heterologous], [], [])], context
+    )
+    assert results.reactions["MNXR1"]["from"] == "context"
+    assert results.metabolites["a_c"]["from"] == "context"
+
+
+def test_from_no_rows():
+    results = DesignResults.from_rows([], SimpleNamespace())
+    assert len(results) == 0
+    assert results.reactions == {}
+    assert results.metabolites == {}
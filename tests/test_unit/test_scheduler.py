@@ -0,0 +1,63 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test expected functioning of the job scheduler."""
+
+
+import threading
+
+from metabolic_ninja.worker.scheduler import JobScheduler, default_slots
+
+
+def test_slots_are_bounded():
+    scheduler = JobScheduler(2)
+    release = threading.Event()
+    assert scheduler.start(release.wait)
+    assert scheduler.start(release.wait)
+    assert not scheduler.start(release.wait)
+    assert scheduler.occupied == 2
+    release.set()
+    scheduler.join()
+    assert scheduler.occupied == 0
+
+
+def test_slots_are_freed_after_failure():
+    def fail():
+        raise RuntimeError("Job failed.")
+
+    scheduler = JobScheduler(1)
+    assert scheduler.start(fail)
+    scheduler.join()
+    assert scheduler.occupied == 0
+    assert scheduler.start(lambda: None)
+    scheduler.join()
+
+
+def test_slots_are_released_by_key():
+    scheduler = JobScheduler(1)
+    release = threading.Event()
+    assert scheduler.start(release.wait, key="tag")
+    # The job is still running, but its message is about to be acknowledged.
+    scheduler.release("tag")
+    assert scheduler.occupied == 0
+    assert scheduler.start(lambda: None)
+    release.set()
+    scheduler.join()
+    assert scheduler.occupied == 0
+
+
+def test_default_slots():
+    assert default_slots(1, 1) >= 1
+    assert default_slots(10 ** 6, 1) == 1
@@ -0,0 +1,62 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the selection of the solver."""
+
+
+import pytest
+
+from metabolic_ninja.worker import solver
+
+
+@pytest.fixture
+def installed(monkeypatch):
+    monkeypatch.setattr(solver, "solvers", {"glpk": None, "gurobi": None})
+
+
+def test_requested_solver(installed):
+    assert solver.select_solver("gurobi", ["cplex", "glpk"]) == "gurobi"
+
+
+def test_preferred_solver(installed):
+    assert solver.select_solver(None, ["cplex", "glpk", "gurobi"]) == "glpk"
+
+
+def test_unavailable_requested_solver(installed):
+    assert solver.select_solver("cplex", ["gurobi"]) == "gurobi"
+
+
+def test_open_source_fallback(installed):
+    assert solver.select_solver(None, ["cplex"]) == "glpk"
+
+
+@pytest.mark.parametrize(
+    "requested, preference", [("scipy", ["cplex"]), (None, ["scipy"])]
+)
+def test_lp_only_solver(monkeypatch, requested, preference):
+    monkeypatch.setattr(solver, "solvers", {"glpk": None, "scipy": None})
+    assert solver.select_solver(requested, preference) == "glpk"
+
+
+def test_lp_only_fallback(monkeypatch):
+    monkeypatch.setattr(solver, "solvers", {"scipy": None})
+    with pytest.raises(RuntimeError):
+        solver.select_solver(None, ["cplex"])
+
+
+def test_no_solver(monkeypatch):
+    monkeypatch.setattr(solver, "solvers", {})
+    with pytest.raises(RuntimeError):
+        solver.select_solver()
@@ -0,0 +1,81 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the cache of the universal models."""
+
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from metabolic_ninja import universal
+
+
+class Source:
+    """Stand in for cameo's lazily loaded universal model."""
+
+    def __init__(self, model):
+        self._model = model
+        self.calls = 0
+
+    @property
+    def __wrapped__(self):
+        self.calls += 1
+        return self._model
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    source = Source({"id": "universal"})
+    monkeypatch.setattr(universal, "universal", SimpleNamespace(model=source))
+    monkeypatch.setattr(
+        universal, "UNIVERSAL_CACHE_DIR", str(tmp_path / "universal")
+    )
+    return source
+
+
+def test_model_is_built_once(source):
+    assert universal.load_universal_model("model") == {"id": "universal"}
+    assert universal.load_universal_model("model") == {"id": "universal"}
+    assert source.calls == 1
+    assert os.stat(universal.UNIVERSAL_CACHE_DIR).st_mode & 0o777 == 0o700
+
+
+def test_shared_directory_is_not_used(source):
+    os.makedirs(universal.UNIVERSAL_CACHE_DIR)
+    os.chmod(universal.UNIVERSAL_CACHE_DIR, 0o777)
+    universal.load_universal_model("model")
+    universal.load_universal_model("model")
+    assert source.calls == 2
+    assert os.listdir(universal.UNIVERSAL_CACHE_DIR) == []
+
+
+def test_writable_model_is_not_used(source):
+    universal.load_universal_model("model")
+    (name,) = os.listdir(universal.UNIVERSAL_CACHE_DIR)
+    os.chmod(os.path.join(universal.UNIVERSAL_CACHE_DIR, name), 0o666)
+    assert universal.load_universal_model("model") == {"id": "universal"}
+    assert source.calls == 2
+
+
+def test_unreadable_model_is_rebuilt(source):
+    universal.load_universal_model("model")
+    (name,) = os.listdir(universal.UNIVERSAL_CACHE_DIR)
+    path = os.path.join(universal.UNIVERSAL_CACHE_DIR, name)
+    with open(path, "wb") as file_:
+        file_.write(b"garbage")
+    assert universal.load_universal_model("model") == {"id": "universal"}
+    assert source.calls == 2